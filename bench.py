@@ -0,0 +1,71 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from simulation import MetabolicSimulation
+
+
+def write_synthetic_network(folder, n_reactions=1000, n_metabolites=300, seed=0):
+    """
+    Write a random reaction network (YAML files + initial pool) into folder.
+
+    Returns:
+        tuple[str, str]: (reaction_folder, pool_file)
+    """
+    rng = np.random.default_rng(seed)
+    folder = Path(folder)
+    rxn_dir = folder / "reactions"
+    rxn_dir.mkdir(parents=True, exist_ok=True)
+    names = [f"M{i}" for i in range(n_metabolites)]
+    for j in range(n_reactions):
+        n_sub = 0 if j % 50 == 0 else int(rng.integers(1, 4))
+        n_prod = int(rng.integers(1, 4))
+        picked = rng.choice(n_metabolites, size=n_sub + n_prod, replace=False)
+        data = {
+            "name": f"R{j}",
+            "capacity": 1.0,
+            "substrates": {names[i]: int(rng.integers(1, 3)) for i in picked[:n_sub]},
+            "products": {names[i]: int(rng.integers(1, 3)) for i in picked[n_sub:]},
+        }
+        with open(rxn_dir / f"R{j:04d}.yaml", "w", encoding="utf-8") as f:
+            yaml.safe_dump(data, f)
+    pool_file = folder / "pool.yaml"
+    with open(pool_file, "w", encoding="utf-8") as f:
+        yaml.safe_dump({m: float(rng.uniform(0.5, 10.0)) for m in names}, f)
+    return str(rxn_dir), str(pool_file)
+
+
+def bench_compiled(n_reactions=1000, steps=200, auto_adjust=True):
+    """Compare the reaction loop against the compiled stoichiometry engine."""
+    with tempfile.TemporaryDirectory() as tmp:
+        reaction_folder, pool_file = write_synthetic_network(tmp, n_reactions=n_reactions)
+        timings = {}
+        sims = {}
+        for compiled in (False, True):
+            sim = MetabolicSimulation(reaction_folder, pool_file, auto_adjust=auto_adjust, compiled=compiled)
+            t0 = time.perf_counter()
+            sim.run(steps=steps)
+            timings[compiled] = time.perf_counter() - t0
+            sims[compiled] = sim
+    identical = all(sims[False].history[k] == sims[True].history[k] for k in sims[False].history)
+    speedup = timings[False] / timings[True]
+    print(f"[compiled] {n_reactions} reactions x {steps} steps: loop {timings[False]:.3f} s, "
+          f"compiled {timings[True]:.3f} s, speedup {speedup:.1f}x, identical={identical}")
+    return speedup
+
+
+BENCHMARKS = {
+    "compiled": bench_compiled,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the YAML-driven MetabolicSimulation")
+    parser.add_argument("names", nargs="*", default=list(BENCHMARKS), help=f"benchmarks to run: {', '.join(BENCHMARKS)}")
+    args = parser.parse_args()
+    for name in args.names:
+        BENCHMARKS[name]()
@@ -18,13 +18,17 @@ Features:
  - Per-metabolite PNGs + combined grid PNG; optional CSV export
 """
 
+import argparse
 import json
 import math
 import os
+import time
+from collections.abc import Mapping
 from dataclasses import dataclass, field
 from typing import Dict, Tuple, List, Callable, Any
 
 import numpy as np
+import scipy.sparse as sp
 from scipy.integrate import solve_ivp
 import matplotlib.pyplot as plt
 from PIL import Image
@@ -336,6 +340,242 @@ def make_rhs(reactions: List[Reaction],
     return rhs
 
 
+# -------------------------
+# Compiled RHS: index arrays + sparse stoichiometry + analytic Jacobian
+# -------------------------
+class _ConcView(Mapping):
+    """
+    Read-only {metabolite: concentration} view over the state vector, so that
+    hormones_fn / clearance_fn can be called without building a dict.
+    With track=True every key looked up is recorded in `accessed`.
+    """
+
+    def __init__(self, y: np.ndarray, index: Dict[str, int], track: bool = False):
+        self.y = y
+        self.index = index
+        self.track = track
+        self.accessed = set()
+
+    def __getitem__(self, key):
+        if self.track:
+            self.accessed.add(key)
+        return float(self.y[self.index[key]])
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+
+class CompiledRHS:
+    """
+    Array form of make_rhs for solve_ivp.
+
+    Every rate-law factor of the form X^n / (K^n + X^n) (substrate saturation,
+    transport) or K^n / (K^n + X^n) (product inhibition, feedback) is stored in
+    padded (reactions x factors) index arrays; temperature / pH terms and
+    factors on metabolites outside the network are folded into a per-reaction
+    constant. Stoichiometry is a sparse (metabolites x reactions) matrix, so
+    dy/dt = S @ v + food - clearance.
+
+    `sparsity` is the Jacobian pattern (for jac_sparsity=) and `jac` the
+    analytic Jacobian of the Hill / Michaelis-Menten rate law. The hormone and
+    clearance callables are treated as black boxes: the metabolites they read
+    are detected once on construction and their (few) derivatives are taken by
+    finite differences.
+    """
+    EPS = 1e-12
+    MAX_RATE = 100.0
+
+    def __init__(self,
+                 reactions: List[Reaction],
+                 metabolites: List[str],
+                 food_fn: Callable[[float], Dict[str, float]],
+                 clearance_fn: Callable[[Dict[str, float]], Dict[str, float]],
+                 hormones_fn: Callable[[Dict[str, float], float], Dict[str, float]],
+                 env: Dict[str, float]):
+        self.reactions = reactions
+        self.metabolites = list(metabolites)
+        self.index = {m: i for i, m in enumerate(self.metabolites)}
+        self.food_fn = food_fn
+        self.clearance_fn = clearance_fn
+        self.hormones_fn = hormones_fn
+        n_met, n_rxn = len(self.metabolites), len(reactions)
+
+        T = env.get("T", 37.0)
+        pH = env.get("pH", 7.4)
+        const = np.array([float(r.k_max) * r.Q10 ** ((T - 37.0) / 10.0)
+                          * math.exp(-((pH - r.pH_opt)**2) / (2.0 * r.sigma_pH**2)) for r in reactions])
+
+        # (reaction, metabolite, K, n, is_saturation) for every concentration-dependent factor
+        factors: List[List[Tuple[int, float, float, bool]]] = [[] for _ in reactions]
+        for j, r in enumerate(reactions):
+            entries = [(s, float(r.Km.get(s, 1e-6)), float(r.Hill.get(s, 1.0)), True) for s in r.inputs]
+            entries += [(p, float(Ki), float(r.Ki_Hill.get(p, 1.0)), False) for p, Ki in r.Ki.items()]
+            if r.transport_Vmax > 0 and len(r.inputs) > 0:
+                entries.append((next(iter(r.inputs.keys())), float(r.transport_Km), 1.0, True))
+            entries += [(x, float(Ki_val), float(m), False) for x, (Ki_val, m) in r.feedback_params.items()]
+            for name, K, n, sat in entries:
+                if name in self.index:
+                    factors[j].append((self.index[name], K**n, n, sat))
+                elif not sat:
+                    # metabolite outside the network reads as 0: inhibition factor is constant
+                    const[j] *= K**n / (K**n + self.EPS)
+                else:
+                    const[j] = 0.0
+        self.const = const
+
+        width = max([len(f) for f in factors] + [1])
+        self.f_met = np.zeros((n_rxn, width), dtype=np.intp)
+        self.f_Kn = np.ones((n_rxn, width))
+        self.f_n = np.ones((n_rxn, width))
+        self.f_sat = np.zeros((n_rxn, width), dtype=bool)
+        self.f_valid = np.zeros((n_rxn, width), dtype=bool)
+        for j, fs in enumerate(factors):
+            for k, (i, Kn, n, sat) in enumerate(fs):
+                self.f_met[j, k], self.f_Kn[j, k], self.f_n[j, k] = i, Kn, n
+                self.f_sat[j, k] = sat
+                self.f_valid[j, k] = True
+
+        self.hormone_names = sorted({h for r in reactions for h in r.hormone_factors})
+        self.hormone_coef = np.zeros((n_rxn, len(self.hormone_names)))
+        for j, r in enumerate(reactions):
+            for h, coef in r.hormone_factors.items():
+                self.hormone_coef[j, self.hormone_names.index(h)] = float(coef)
+        self.hormone_rxn = np.flatnonzero(self.hormone_coef.any(axis=1))
+
+        rows, cols, vals = [], [], []
+        for j, r in enumerate(reactions):
+            for s, sto in r.inputs.items():
+                rows.append(self.index[s]); cols.append(j); vals.append(-float(sto))
+            for p, sto in r.outputs.items():
+                rows.append(self.index[p]); cols.append(j); vals.append(float(sto))
+        self.S = sp.csr_matrix((vals, (rows, cols)), shape=(n_met, n_rxn))
+
+        # detect which metabolites the hormone / clearance callables read
+        probe = _ConcView(np.zeros(n_met), self.index, track=True)
+        if hormones_fn is not None and len(self.hormone_names):
+            hormones_fn(probe, 0.0)
+        self.hormone_deps = np.array(sorted(self.index[m] for m in probe.accessed if m in self.index), dtype=np.intp)
+        probe.accessed = set()
+        clear_rows = []
+        if clearance_fn is not None:
+            clear_rows = [self.index[m] for m in clearance_fn(probe) if m in self.index]
+        self.clearance_deps = np.array(sorted(self.index[m] for m in probe.accessed if m in self.index), dtype=np.intp)
+        self.clearance_rows = np.array(sorted(clear_rows), dtype=np.intp)
+
+        # Jacobian pattern: rate-law and hormone dependencies projected through |S|, plus clearance
+        dv = sp.csr_matrix((np.ones(int(self.f_valid.sum())),
+                            (np.nonzero(self.f_valid)[0], self.f_met[self.f_valid])), shape=(n_rxn, n_met))
+        if len(self.hormone_deps) and len(self.hormone_rxn):
+            hr, hd = np.meshgrid(self.hormone_rxn, self.hormone_deps, indexing="ij")
+            dv = dv + sp.csr_matrix((np.ones(hr.size), (hr.ravel(), hd.ravel())), shape=(n_rxn, n_met))
+        pattern = abs(self.S) @ dv
+        if len(self.clearance_rows) and len(self.clearance_deps):
+            cr, cd = np.meshgrid(self.clearance_rows, self.clearance_deps, indexing="ij")
+            pattern = pattern + sp.csr_matrix((np.ones(cr.size), (cr.ravel(), cd.ravel())), shape=(n_met, n_met))
+        self.sparsity = (pattern != 0).astype(np.int8).tocsc()
+        self.nfev = 0
+        self.njev = 0
+
+    def _hormone_factor(self, view: _ConcView, t: float) -> np.ndarray:
+        if not len(self.hormone_names):
+            return np.ones(len(self.reactions))
+        hormones = self.hormones_fn(view, t)
+        h = np.array([hormones.get(name, 0.0) for name in self.hormone_names])
+        return np.prod(1.0 + self.hormone_coef * h, axis=1)
+
+    def _factors(self, y: np.ndarray):
+        X = np.maximum(y[self.f_met], 0.0)
+        Xn = X**self.f_n
+        den = self.f_Kn + Xn + self.EPS
+        f = np.where(self.f_sat, Xn, self.f_Kn) / den
+        return np.where(self.f_valid, f, 1.0), X, den
+
+    def rates(self, t: float, y: np.ndarray) -> np.ndarray:
+        """Reaction rates v (mM/min), same as [r.rate(conc, hormones, env) for r in reactions]."""
+        f, _, _ = self._factors(y)
+        v = self.const * f.prod(axis=1) * self._hormone_factor(_ConcView(y, self.index), t)
+        v = np.where(np.isfinite(v), v, 0.0)
+        return np.clip(v, 0.0, self.MAX_RATE)
+
+    def _flux(self, t: float, view: _ConcView) -> np.ndarray:
+        dy = np.zeros(len(self.metabolites))
+        if self.food_fn is not None:
+            for m, flux in self.food_fn(t).items():
+                i = self.index.get(m)
+                if i is not None:
+                    dy[i] += float(flux)
+        if self.clearance_fn is not None:
+            for m, flux in self.clearance_fn(view).items():
+                i = self.index.get(m)
+                if i is not None:
+                    dy[i] -= float(flux)
+        return dy
+
+    def __call__(self, t: float, y: np.ndarray) -> np.ndarray:
+        self.nfev += 1
+        return self.S @ self.rates(t, y) + self._flux(t, _ConcView(y, self.index))
+
+    def jac(self, t: float, y: np.ndarray) -> sp.csc_matrix:
+        self.njev += 1
+        n_met, n_rxn = len(self.metabolites), len(self.reactions)
+        f, X, den = self._factors(y)
+        H = self._hormone_factor(_ConcView(y, self.index), t)
+        raw = self.const * f.prod(axis=1) * H
+        active = np.isfinite(raw) & (raw >= 0.0) & (raw < self.MAX_RATE)
+
+        # d f / d X: zero where y < 0 is clipped by max(X, 0), right derivative at X = 0
+        pos = X > 0
+        dXn = np.where(pos, self.f_n * np.where(pos, X, 1.0)**(self.f_n - 1.0), np.where(self.f_n == 1.0, 1.0, 0.0))
+        df = np.where(self.f_sat, dXn * (self.f_Kn + self.EPS), -self.f_Kn * dXn) / den**2
+        df = np.where(self.f_valid & (y[self.f_met] >= 0), df, 0.0)
+
+        # product of the other factors of each reaction, robust to a zero factor
+        zero = f == 0.0
+        nz = zero.sum(axis=1, keepdims=True)
+        pnz = np.where(zero, 1.0, f).prod(axis=1, keepdims=True)
+        others = np.where(zero, np.where(nz == 1, pnz, 0.0), np.where(nz == 0, pnz, 0.0) / np.where(zero, 1.0, f))
+        scale = np.where(active, self.const * H, 0.0)[:, None]
+        dv = sp.csr_matrix(((scale * others * df)[self.f_valid], (np.nonzero(self.f_valid)[0], self.f_met[self.f_valid])),
+                           shape=(n_rxn, n_met))
+
+        if len(self.hormone_deps) and len(self.hormone_rxn):
+            base = np.where(active, self.const * f.prod(axis=1), 0.0)[self.hormone_rxn]
+            cols, vals = [], []
+            for i in self.hormone_deps:
+                h = 1e-7 * max(abs(y[i]), 1.0)
+                yp = y.copy()
+                yp[i] += h
+                dH = (self._hormone_factor(_ConcView(yp, self.index), t) - H)[self.hormone_rxn] / h
+                cols.append(np.full(len(self.hormone_rxn), i))
+                vals.append(base * dH)
+            dv = dv + sp.csr_matrix((np.concatenate(vals), (np.tile(self.hormone_rxn, len(cols)), np.concatenate(cols))),
+                                    shape=(n_rxn, n_met))
+        J = self.S @ dv
+
+        if len(self.clearance_deps) and len(self.clearance_rows):
+            rows, cols, vals = [], [], []
+            base = self._clearance(y)
+            for i in self.clearance_deps:
+                h = 1e-7 * max(abs(y[i]), 1.0)
+                yp = y.copy()
+                yp[i] += h
+                d = (self._clearance(yp) - base)[self.clearance_rows] / h
+                rows.append(self.clearance_rows); cols.append(np.full(len(d), i)); vals.append(-d)
+            J = J + sp.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(n_met, n_met))
+        return J.tocsc()
+
+    def _clearance(self, y: np.ndarray) -> np.ndarray:
+        out = np.zeros(len(self.metabolites))
+        for m, flux in self.clearance_fn(_ConcView(y, self.index)).items():
+            i = self.index.get(m)
+            if i is not None:
+                out[i] += float(flux)
+        return out
+
+
 # -------------------------
 # Simple hormone model
 # -------------------------
@@ -401,7 +641,8 @@ def save_timecourse_csv(time_vec: np.ndarray, conc_hist: np.ndarray, metabolites
 def main(reaction_json_path: str = "reaction_parameters.json",
          realistic_initial: Dict[str, float] = None,
          t_max_min: float = 1440.0,
-         dt_out_min: float = 1.0):
+         dt_out_min: float = 1.0,
+         compiled: bool = True):
     # load reactions
     reactions = load_reactions(reaction_json_path)
 
@@ -422,13 +663,19 @@ def main(reaction_json_path: str = "reaction_parameters.json",
     y0 = np.array([init_pool[m] for m in metabolites], dtype=float)
 
     # build RHS
-    rhs = make_rhs(reactions,
-                   metabolites,
+    # build RHS (compiled: index arrays + analytic sparse Jacobian; otherwise the dict-based reference)
+    rhs_args = dict(
                 #    food_fn=meal_input_gaussian,
                    food_fn=meal_input_three_meals,
                    clearance_fn=default_clearance,
                    hormones_fn=simple_hormone_model,
                    env={"T": 37.0, "pH": 7.4})
+    if compiled:
+        rhs = CompiledRHS(reactions, metabolites, **rhs_args)
+        jac_kwargs = {"jac": rhs.jac}
+    else:
+        rhs = make_rhs(reactions, metabolites, **rhs_args)
+        jac_kwargs = {}
 
     # time span
     t_span = (0.0, t_max_min)
@@ -436,7 +683,7 @@ def main(reaction_json_path: str = "reaction_parameters.json",
     t_eval = np.arange(0.0, t_max_min + dt_out_min, dt_out_min)
 
     # Solve stiff ODE with BDF (backward differentiation) method
-    sol = solve_ivp(fun=rhs, t_span=t_span, y0=y0, method='BDF', t_eval=t_eval, atol=1e-6, rtol=1e-6)
+    sol = solve_ivp(fun=rhs, t_span=t_span, y0=y0, method='BDF', t_eval=t_eval, atol=1e-6, rtol=1e-6, **jac_kwargs)
 
     if not sol.success:
         print("WARNING: solver failed:", sol.message)
@@ -457,6 +704,9 @@ def main(reaction_json_path: str = "reaction_parameters.json",
     # compute rates time series (expensive but useful)
     rate_time_series = []
     for idx, t in enumerate(time_vec):
+        if compiled:
+            rate_time_series.append(rhs.rates(t, conc_hist[idx]))
+            continue
         conc_at_t = {m: float(conc_hist[idx, i]) for i, m in enumerate(metabolites)}
         hormones = simple_hormone_model(conc_at_t, t)
         rates = [r.rate(conc_at_t, hormones, {"T": 37.0, "pH": 7.4}) for r in reactions]
@@ -476,8 +726,106 @@ def main(reaction_json_path: str = "reaction_parameters.json",
     print("Saved sample_reaction_rates.png")
 
 
+# -------------------------
+# Benchmark: reference RHS vs compiled RHS (+ sparsity / analytic Jacobian)
+# -------------------------
+def synthetic_reactions(n_metabolites: int = 300, n_reactions: int = 450, seed: int = 0) -> List[Reaction]:
+    """
+    Random network with the same rate-law features as reaction_parameters.json.
+    Metabolite 0 is "Glucose" (fed by the meal model); reactions mostly flow
+    from lower to higher indices and every metabolite has a slow outflow.
+    """
+    rng = np.random.default_rng(seed)
+    names = ["Glucose"] + [f"M{i:04d}" for i in range(1, n_metabolites)]
+    sink = ["Sink"]
+    log_uniform = lambda lo, hi: float(10 ** rng.uniform(np.log10(lo), np.log10(hi)))
+    reactions = []
+    for j in range(n_reactions):
+        if j < n_metabolites:
+            inputs = [names[j]]
+            outputs = [names[min(j + 1 + int(rng.integers(0, 5)), n_metabolites - 1)]] if j < n_metabolites - 1 else sink
+        else:
+            a = int(rng.integers(0, n_metabolites - 1))
+            inputs = list({names[a], names[int(rng.integers(0, n_metabolites))]})[:int(rng.integers(1, 3))]
+            outputs = [names[min(a + 1 + int(rng.integers(0, 10)), n_metabolites - 1)]]
+        other = lambda: names[int(rng.integers(0, n_metabolites))]
+        reactions.append(Reaction(
+            id=f"S{j:04d}", name=f"synthetic {j}",
+            inputs={s: 1 for s in inputs}, outputs={p: 1 for p in outputs},
+            k_max=log_uniform(0.01, 2.0),
+            Km={s: log_uniform(1e-3, 1.0) for s in inputs},
+            Hill={s: float(rng.choice([1.0, 1.0, 2.0])) for s in inputs},
+            Ki={other(): log_uniform(0.1, 5.0)} if rng.random() < 0.1 else {},
+            Ki_Hill={},
+            transport_Vmax=0.5 if rng.random() < 0.1 else 0.0,
+            transport_Km=log_uniform(0.05, 1.0),
+            hormone_factors={str(rng.choice(["insulin", "glucagon"])): float(rng.uniform(0.2, 0.6))} if rng.random() < 0.3 else {},
+            feedback_params={other(): [log_uniform(0.5, 5.0), 2]} if rng.random() < 0.1 else {},
+        ))
+    return reactions
+
+
+def benchmark(reaction_json_path: str = "reaction_parameters.json",
+              n_metabolites: int = 300,
+              n_reactions: int = 450,
+              t_max_min: float = 1440.0):
+    """
+    BDF over t_max_min minutes with the three-meal input for each RHS/Jacobian
+    variant; reports wall-clock, RHS evaluations (including finite-difference
+    Jacobian columns) and the max deviation from the reference trajectory.
+    """
+    networks = {
+        os.path.basename(reaction_json_path): load_reactions(reaction_json_path),
+        f"synthetic {n_metabolites}x{n_reactions}": synthetic_reactions(n_metabolites, n_reactions),
+    }
+    args = dict(food_fn=meal_input_three_meals, clearance_fn=default_clearance,
+                hormones_fn=simple_hormone_model, env={"T": 37.0, "pH": 7.4})
+    t_eval = np.arange(0.0, t_max_min + 1.0, 1.0)
+    for label, reactions in networks.items():
+        metabolites = collect_metabolites(reactions)
+        y0 = np.zeros(len(metabolites))
+        reference = make_rhs(reactions, metabolites, **args)
+        calls = [0]
+
+        def counted(t, y):
+            calls[0] += 1
+            return reference(t, y)
+
+        compiled = CompiledRHS(reactions, metabolites, **args)
+        variants = [
+            ("dict RHS, dense FD jac", counted, {}),
+            ("compiled RHS, dense FD jac", compiled, {}),
+            ("compiled RHS, jac_sparsity", compiled, {"jac_sparsity": compiled.sparsity}),
+            ("compiled RHS, analytic jac", compiled, {"jac": compiled.jac}),
+        ]
+        print(f"{label}: {len(metabolites)} metabolites, {len(reactions)} reactions, "
+              f"jacobian nnz {compiled.sparsity.nnz}/{len(metabolites)**2}")
+        y_ref = None
+        for name, fun, kwargs in variants:
+            calls[0] = compiled.nfev = compiled.njev = 0
+            t0 = time.perf_counter()
+            sol = solve_ivp(fun=fun, t_span=(0.0, t_max_min), y0=y0, method='BDF', t_eval=t_eval,
+                            atol=1e-6, rtol=1e-6, **kwargs)
+            elapsed = time.perf_counter() - t0
+            if y_ref is None:
+                y_ref = sol.y
+            err = np.max(np.abs(sol.y - y_ref)) / max(np.max(np.abs(y_ref)), 1e-12)
+            print(f"  {name:<28s} {elapsed:8.2f} s  rhs evals {calls[0] + compiled.nfev:7d}  "
+                  f"jac {sol.njev:4d}  max rel diff {err:.1e}{'' if sol.success else '  FAILED: ' + sol.message}")
+
+
 if __name__ == "__main__":
-    main(reaction_json_path="reaction_parameters.json",
-         realistic_initial=None,
-         t_max_min=1440.0,
-         dt_out_min=1.0)
+    parser = argparse.ArgumentParser(description="Stiff liver metabolism simulator")
+    parser.add_argument("--reference", action="store_true", help="use the dict-based RHS with finite-difference Jacobian")
+    parser.add_argument("--bench", action="store_true", help="compare RHS / Jacobian variants instead of running the simulation")
+    parser.add_argument("--synthetic", type=int, nargs=2, default=[300, 450], metavar=("METABOLITES", "REACTIONS"),
+                        help="size of the synthetic network used by --bench")
+    args = parser.parse_args()
+    if args.bench:
+        benchmark("reaction_parameters.json", *args.synthetic)
+    else:
+        main(reaction_json_path="reaction_parameters.json",
+             realistic_initial=None,
+             t_max_min=1440.0,
+             dt_out_min=1.0,
+             compiled=not args.reference)
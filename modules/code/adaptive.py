@@ -0,0 +1,197 @@
+import math
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+import rule_based
+from schedule import Plan, Schedule, as_inject
+from simulate import MetabolicEnvironment
+from simulate_ode import LiverODE, _inject_changes
+
+
+class _LiverModel:
+    # 主模型：沿用 LiverODE 的向量场（代谢物 + 信号，时间单位为步），所有分量非负
+    def __init__(self, env: MetabolicEnvironment):
+        self.env = env
+        self.ode = LiverODE(env)
+        self.lower = np.zeros(self.ode.size)
+        self.upper = np.full(self.ode.size, np.inf)
+
+    @property
+    def nfev(self) -> int:
+        return self.ode.nfev
+
+    def pack(self) -> np.ndarray:
+        return self.ode.pack()
+
+    def unpack(self, y: np.ndarray) -> None:
+        self.ode.unpack(y)
+
+    def rhs(self, y: np.ndarray) -> np.ndarray:
+        return self.ode.rhs(0.0, y)
+
+    def parameters(self) -> np.ndarray:
+        return self.ode.parameters()
+
+    def probe(self, inject: Callable[[Any, int], None], k: int, y: np.ndarray) -> bool:
+        self.ode.unpack(y)
+        return _inject_changes(self.env, inject, k)
+
+    def frame(self, segments, minutes: int, steps_per_hour: float) -> pd.DataFrame:
+        # 第 i 行为第 i + 1 步注入前的状态；速率同定步长引擎，取自产生该行的一步（第 i 步注入后的状态），
+        # 未触发的反应沿用上一次记录的值
+        m = self.ode
+        grid = np.arange(minutes, dtype=float)
+        Y, P = _sample(segments, grid + 1.0, False)
+        R, Q = _sample(segments, grid[:len(Y)], True)
+        P = np.vstack(P) if len(P) else np.empty((0, len(m.parameter_names)))
+        _, rates = m.batch_tendency(R, np.vstack(Q)) if len(R) else (None, {})
+        columns = {k: Y[:, i] for i, k in enumerate(m.metabolite_names + m.signal_names)}
+        columns.update({k: P[:, i] for i, k in enumerate(m.parameter_names)})
+        columns.update({f"rate_{k}": pd.Series(v).ffill().to_numpy() for k, v in rates.items() if not np.isnan(v).all()})
+        columns["time"] = np.arange(len(Y)) / steps_per_hour
+        return pd.DataFrame(columns)
+
+
+class _RuleBasedModel:
+    # 规则模型：dx/dt = RuleBasedLiverSystem 一步的增量，状态为全部代谢物，按 METABOLITE_BOUNDS 截断
+    def __init__(self, env: rule_based.MetabolicEnvironment):
+        self.env = env
+        self.system = rule_based.RuleBasedLiverSystem(env)
+        self.names = self.system.metabolite_names
+        self.lower, self.upper = rule_based.compile_bounds(self.names)
+        self.nfev = 0
+
+    def pack(self) -> np.ndarray:
+        m = self.env.metabolites
+        return np.array([m[k] for k in self.names], dtype=np.float64)
+
+    def unpack(self, y: np.ndarray) -> None:
+        self.env.metabolites.update(zip(self.names, y.tolist()))
+
+    def rhs(self, y: np.ndarray) -> np.ndarray:
+        self.nfev += 1
+        self.unpack(y)
+        return self.system.evaluate()
+
+    def parameters(self) -> Dict[str, Any]:
+        return dict(self.env.parameters)
+
+    def probe(self, inject: Callable[[Any, int], None], k: int, y: np.ndarray) -> bool:
+        self.unpack(y)
+        before = (dict(self.env.metabolites), dict(self.env.parameters))
+        inject(self.env, k)
+        return (self.env.metabolites, self.env.parameters) != before
+
+    def frame(self, segments, minutes: int, steps_per_hour: float) -> pd.DataFrame:
+        # 第 i 行为第 i 步注入后的状态；列顺序同 MetabolicEnvironment.record：time, 代谢物, 参数
+        Y, P = _sample(segments, np.arange(minutes, dtype=float), True)
+        columns: Dict[str, Any] = {"time": np.arange(len(Y)) / steps_per_hour}
+        columns.update({k: Y[:, i] for i, k in enumerate(self.names)})
+        for k in P[0] if P else self.env.parameters:
+            columns[k] = [p[k] for p in P]
+        return pd.DataFrame(columns)
+
+
+def _sample(segments: List[Tuple[List[float], List[np.ndarray], Any]], grid: np.ndarray,
+            right_limit: bool) -> Tuple[np.ndarray, List[Any]]:
+    # 每段为两次注入之间的接受点；注入时刻取注入前（左极限）或注入后（右极限）的值
+    rows, params = [], []
+    for ts, ys, p in segments:
+        lo, hi = ts[0], ts[-1]
+        sel = grid[(grid >= lo) & (grid < hi)] if right_limit else grid[(grid > lo) & (grid <= hi)]
+        if len(sel) == 0:
+            continue
+        ys = np.array(ys)
+        rows.append(np.column_stack([np.interp(sel, ts, ys[:, i]) for i in range(ys.shape[1])]))
+        params.extend([p] * len(sel))
+    return (np.vstack(rows) if rows else np.empty((0, len(segments[0][1][0])))), params
+
+
+def run_adaptive(
+    env: Union[MetabolicEnvironment, rule_based.MetabolicEnvironment],
+    minutes: int,
+    inject: Union[Schedule, Callable[[Any, int], None]] = None,
+    rtol: float = 1e-2,
+    atol: float = 1e-6,
+    h_max: int = 120,
+    steps_per_hour: float = 60.0,
+) -> pd.DataFrame:
+    """自适应步长推进 minutes 步，结果重采样到定步长引擎的输出网格上。
+
+    跟踪的是定步长引擎本身的离散映射 x_{n+1} = x_n + G(x_n)（G 为引擎一步的真实增量），而不是其连续化的 ODE：
+    步长 h 取整数步，一次前进 x + h * G(x)，h = 1 时与定步长引擎的一步完全相同。
+    把 h 步合成一步的误差约为 h(h-1)/2 * |ΔG|（ΔG 为增量每步的变化，由相邻两次求值差出），
+    按 atol + rtol * |x| 归一化，超过 1 则以更小的步长重做；每个接受步只求值一次增量。
+    稳态阶段步长增长到 h_max，餐后等快速变化阶段自动退回单位步长。
+    inject 为 Schedule 时步进精确落在各事件步上；普通回调则在每个跨过的整数步以插值状态探测，
+    首个改变状态/参数的步截断并从注入后的状态继续。
+    env 为 rule_based.MetabolicEnvironment 时推进规则模型（第 i 行为第 i 步注入后的状态，同 run_simulation），
+    否则推进主模型（第 i 行为第 i + 1 步注入前的状态，同 env.to_frame()）；time 列均为 i / steps_per_hour。
+    attrs 中记录 nfev（增量求值次数）、steps（接受步数）、rejected（拒绝次数）。
+    """
+    model = _RuleBasedModel(env) if isinstance(env, rule_based.MetabolicEnvironment) else _LiverModel(env)
+    inject = as_inject(inject, env, minutes)
+    known = isinstance(inject, Plan)
+    events = [k for k in inject.steps if 0 < k < minutes] if known else []
+    if inject:
+        inject(env, 0)
+    y, t, h = model.pack(), 0, 1
+    g = model.rhs(y)
+    segments = [([float(t)], [y], model.parameters())]
+    steps = rejected = 0
+    ei = 0
+
+    def restart(at: int) -> None:
+        # 注入改变了状态：从注入后的状态开新段，增量重新求值
+        nonlocal y, g
+        y = model.pack()
+        g = model.rhs(y)
+        segments.append(([float(at)], [y], model.parameters()))
+
+    while t < minutes:
+        nxt = events[ei] if ei < len(events) else minutes
+        hh = min(h, h_max, nxt - t)
+        y1 = np.clip(y + hh * g, model.lower, model.upper)
+        g1 = model.rhs(y1)
+        # 每步增量变化量（归一化）；h 步合成一步的误差约为 h(h-1)/2 倍
+        d = float(np.max(np.abs(g1 - g) / (hh * (atol + rtol * np.maximum(np.abs(y), np.abs(y1))))))
+        err = 0.5 * hh * (hh - 1) * d
+        # 下一步取满足 h(h-1)/2 * d <= 0.8 的最大整数步长，至多放大 5 倍
+        fit = int(0.5 * (1.0 + math.sqrt(1.0 + 6.4 / d))) if d > 0.0 else h_max
+        if err > 1.0:
+            rejected += 1
+            h = max(1, min(fit, hh - 1))
+            continue
+        steps += 1
+        h = max(1, min(fit, 5 * hh, h_max))
+        ts, ys, _ = segments[-1]
+        stop = None
+        if inject and not known:
+            for k in range(t + 1, min(t + hh, minutes - 1) + 1):
+                yk = y + (y1 - y) * ((k - t) / hh)
+                if model.probe(inject, k, yk):
+                    stop = k
+                    break
+        if stop is not None:
+            ts.append(float(stop))
+            ys.append(yk)
+            t = stop
+            restart(t)
+            continue
+        t += hh
+        ts.append(float(t))
+        ys.append(y1)
+        y, g = y1, g1
+        if known and t == nxt and nxt < minutes:
+            model.unpack(y)
+            inject(env, nxt)
+            restart(t)
+            ei += 1
+    model.unpack(y)
+    df = model.frame(segments, minutes, steps_per_hour)
+    df.attrs["nfev"] = model.nfev
+    df.attrs["steps"] = steps
+    df.attrs["rejected"] = rejected
+    return df
@@ -0,0 +1,819 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from history import write_memmap_header
+from schedule import as_inject
+from simulate import MetabolicEnvironment
+
+
+# LiverMetabolismSystem 中所有 recordRate 的反应名称（批量历史记录的固定列）
+RATE_NAMES = [
+    "nampt_Salvage", "deNovoNADSynthesis", "lactateFermentation", "ketogenesis", "oxidativePhosphorylation",
+    "cytosolicATPase_load", "hexokinase_or_glucokinase", "glycolysis_middle_steps", "pyruvateKinase_step",
+    "betaOxidation", "fattyAcidSynthesis", "deNovoLipogenesis", "lipidTransport", "adiposeLipolysis",
+    "aminoAcidCatabolism", "aminoAcidSynthesisTransport", "pgm_G6P_to_G1P", "udpGlucoseSynthesis",
+    "glycogenSynthaseStep", "branchingEnzymeStep", "glycogenPhosphorylaseStep", "debranchingEnzymeStep",
+    "g1p_to_g6p", "cps1_Ammonia_to_CarbamoylPhosphate", "otc_CarbamoylPhosphate_to_Citrulline",
+    "ass1_Citrulline_to_ASP_Argininosuccinate", "asl_Argininosuccinate_to_Arginine_Fumarate",
+    "bileAcidSynthesis", "plasmaProteinSynthesis", "coagulationFactorSynthesis", "phaseI_OxRed",
+    "phaseII_Conjugation", "ethanol_ADH", "acetaldehyde_ALDH", "acetate_to_acetylcoa", "bilirubinUGT",
+]
+
+
+def _min(*xs):
+    out = xs[0]
+    for x in xs[1:]:
+        out = np.minimum(out, x)
+    return out
+
+
+def _max(*xs):
+    out = xs[0]
+    for x in xs[1:]:
+        out = np.maximum(out, x)
+    return out
+
+
+class BatchMetabolicEnvironment:
+    """N 个患者的环境：代谢物/信号/参数均为 (N, k) 数组，列顺序与 MetabolicEnvironment 一致。
+
+    getX 返回长度 N 的列，setX 接受标量或长度 N 的数组，因此大多数 inject(env, t)
+    回调（加法、setParameter）可以不加修改地用于批量环境；使用内置 max/min 的回调需改为
+    np.maximum/np.minimum。
+    """
+
+    def __init__(self, n: int, base: MetabolicEnvironment = None):
+        base = base if base is not None else MetabolicEnvironment()
+        self.n = int(n)
+        self.metabolite_names = list(base.metabolites)
+        self.signal_names = list(base.signals)
+        self.parameter_names = list(base.parameters)
+        self.metabolite_index = {k: i for i, k in enumerate(self.metabolite_names)}
+        self.signal_index = {k: i for i, k in enumerate(self.signal_names)}
+        self.parameter_index = {k: i for i, k in enumerate(self.parameter_names)}
+        self.metabolites = np.tile(np.array([float(v) for v in base.metabolites.values()]), (self.n, 1))
+        self.signals = np.tile(np.array([float(v) for v in base.signals.values()]), (self.n, 1))
+        self.parameters = np.tile(np.array([float(v) for v in base.parameters.values()]), (self.n, 1))
+        self.current_rates: Dict[str, np.ndarray] = {}
+        self.history_columns: List[str] = []
+        self._history: Optional[np.ndarray] = None
+        self._history_len = 0
+        self._history_file: Optional[Tuple[str, Dict[str, Any]]] = None
+
+    @classmethod
+    def from_parameters(cls, n: int, base: MetabolicEnvironment = None, **parameters) -> "BatchMetabolicEnvironment":
+        env = cls(n, base)
+        for name, value in parameters.items():
+            env.setParameter(name, value)
+        return env
+
+    @classmethod
+    def from_environments(cls, envs: Sequence[MetabolicEnvironment]) -> "BatchMetabolicEnvironment":
+        env = cls(len(envs), envs[0])
+        for i, e in enumerate(envs):
+            env.metabolites[i] = [float(e.metabolites[k]) for k in env.metabolite_names]
+            env.signals[i] = [float(e.signals[k]) for k in env.signal_names]
+            env.parameters[i] = [float(e.parameters[k]) for k in env.parameter_names]
+        return env
+
+    def getMetabolite(self, name: str, compartment: str = None) -> np.ndarray:
+        return self.metabolites[:, self.metabolite_index[name]]
+
+    def setMetabolite(self, name: str, value, compartment: str = None) -> None:
+        self.metabolites[:, self.metabolite_index[name]] = np.maximum(value, 0.0)
+
+    def getSignal(self, name: str) -> np.ndarray:
+        return self.signals[:, self.signal_index[name]]
+
+    def setSignal(self, name: str, value) -> None:
+        self.signals[:, self.signal_index[name]] = np.maximum(value, 0.0)
+
+    def getParameter(self, name: str) -> np.ndarray:
+        return self.parameters[:, self.parameter_index[name]]
+
+    def setParameter(self, name: str, value) -> None:
+        self.parameters[:, self.parameter_index[name]] = np.asarray(value, dtype=float)
+
+    def writeOutputs(self, outputs: Dict[str, Any]) -> None:
+        for k, v in outputs.items():
+            i = self.metabolite_index[k]
+            self.metabolites[:, i] = np.maximum(self.metabolites[:, i] + v, 0.0)
+
+    # --- 历史记录：(steps, N, columns) ---
+    def reserve_history(self, steps: int, columns: Sequence[str] = None, dtype=np.float64, path: str = None,
+                        dt: float = None, start: float = None) -> None:
+        """预分配 (steps, N, 列) 的历史数组。
+
+        给定 path 时历史直接写入 numpy.memmap 文件（附 <path>.json 头，dtype 可取 np.float32 减半），
+        队列规模超出内存时使用；运行结束后调用 flush_history()，再用 history.load_results(path, patient=i) 打开。
+        """
+        if columns is None:
+            columns = self.metabolite_names + self.signal_names + self.parameter_names + [f"rate_{k}" for k in RATE_NAMES] + ["time"]
+        self.history_columns = list(columns)
+        shape = (int(steps), self.n, len(self.history_columns))
+        if path is None:
+            self._history = np.full(shape, np.nan, dtype=dtype)
+            self._history_file = None
+        else:
+            self._history_file = (path, {"dt": dt, "start": start})
+            self._history = self._map_history(path, (max(shape[0], 1),) + shape[1:], dtype)
+        self._history_len = 0
+        sources = []
+        for c in self.history_columns:
+            if c in self.metabolite_index:
+                sources.append(("m", self.metabolite_index[c]))
+            elif c in self.signal_index:
+                sources.append(("s", self.signal_index[c]))
+            elif c in self.parameter_index:
+                sources.append(("p", self.parameter_index[c]))
+            elif c.startswith("rate_"):
+                sources.append(("r", c[len("rate_"):]))
+            elif c == "time":
+                sources.append(("t", None))
+            else:
+                raise KeyError(f"Unknown history column: {c}")
+        self._history_sources = sources
+        if path is not None:
+            self.flush_history()
+
+    @staticmethod
+    def _map_history(path: str, shape: Tuple[int, ...], dtype, keep: int = 0) -> np.memmap:
+        # 按新形状重新映射（保留前 keep 行），新增行填 NaN
+        dtype = np.dtype(dtype)
+        with open(path, "r+b" if keep else "wb") as f:
+            f.truncate(int(np.prod(shape)) * dtype.itemsize)
+        data = np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+        data[keep:] = np.nan
+        return data
+
+    def flush_history(self) -> None:
+        """memmap 历史：把已写入的行刷到磁盘并更新 JSON 头（头中的行数即可读取的行数）。"""
+        if self._history_file is None:
+            return
+        path, meta = self._history_file
+        self._history.flush()
+        write_memmap_header(path, self.history_columns, self._history.dtype, (self._history_len,) + self._history.shape[1:], **meta)
+
+    def update_history(self, t) -> None:
+        if self._history is None:
+            self.reserve_history(64)
+        if self._history_len >= self._history.shape[0]:
+            shape = (2 * self._history.shape[0],) + self._history.shape[1:]
+            if self._history_file is not None:
+                self._history.flush()
+                dtype = self._history.dtype
+                self._history = None
+                self._history = self._map_history(self._history_file[0], shape, dtype, keep=self._history_len)
+            else:
+                grown = np.full(shape, np.nan, dtype=self._history.dtype)
+                grown[:self._history_len] = self._history
+                self._history = grown
+        row = self._history[self._history_len]
+        arrays = {"m": self.metabolites, "s": self.signals, "p": self.parameters}
+        for j, (kind, key) in enumerate(self._history_sources):
+            if kind == "r":
+                v = self.current_rates.get(key)
+                if v is not None:
+                    row[:, j] = v
+            elif kind == "t":
+                row[:, j] = t
+            else:
+                row[:, j] = arrays[kind][:, key]
+        self._history_len += 1
+        self.current_rates.clear()
+
+    def to_array(self) -> np.ndarray:
+        if self._history is None:
+            return np.empty((0, self.n, 0))
+        return self._history[:self._history_len]
+
+    def column(self, name: str) -> np.ndarray:
+        return self.to_array()[:, :, self.history_columns.index(name)]
+
+    def to_frame(self, patient: int) -> pd.DataFrame:
+        return pd.DataFrame(self.to_array()[:, patient, :], columns=list(self.history_columns))
+
+
+class _BatchPool:
+    # 与 ResourcePool 语义一致：读快照、累加输出增量、信号后写覆盖先写
+    def __init__(self, env: BatchMetabolicEnvironment):
+        self.env = env
+        self.parameter_overrides: Dict[str, np.ndarray] = {}
+        self.outputs: Dict[str, Any] = {}
+        self.signal_updates: Dict[str, np.ndarray] = {}
+        self.rates: Dict[str, np.ndarray] = {}
+
+    def write_output(self, outputs: Dict[str, Any], mask) -> None:
+        for k, v in outputs.items():
+            if mask is not None:
+                v = np.where(mask, v, 0.0)
+            self.outputs[k] = self.outputs.get(k, 0.0) + v
+
+    def set_signal(self, name: str, value, mask) -> None:
+        value = np.maximum(value, 0.0)
+        prev = self.signal_updates.get(name)
+        if mask is not None:
+            value = np.where(mask, value, np.nan if prev is None else prev)
+        self.signal_updates[name] = np.broadcast_to(value, (self.env.n,))
+
+    def set_metabolite_abs(self, name: str, new_value, mask) -> None:
+        delta = np.maximum(new_value, 0.0) - self.env.getMetabolite(name)
+        self.write_output({name: delta}, mask)
+
+    def record_rate(self, name: str, rate, mask) -> None:
+        if mask is not None:
+            rate = np.where(mask, rate, self.rates.get(name, np.nan))
+        self.rates[name] = np.broadcast_to(np.asarray(rate, dtype=float), (self.env.n,))
+
+
+class BatchResourceEnv:
+    def __init__(self, pool: _BatchPool, mask=None):
+        self.pool = pool
+        self.mask = mask
+
+    def masked(self, mask) -> "BatchResourceEnv":
+        return BatchResourceEnv(self.pool, mask if self.mask is None else (self.mask & mask))
+
+    def getMetabolite(self, name: str, compartment: str = None) -> np.ndarray:
+        return self.pool.env.getMetabolite(name)
+
+    def getSignal(self, name: str) -> np.ndarray:
+        return self.pool.env.getSignal(name)
+
+    def getParameter(self, name: str) -> np.ndarray:
+        v = self.pool.parameter_overrides.get(name)
+        return self.pool.env.getParameter(name) if v is None else v
+
+    def setMetabolite(self, name: str, value, compartment: str = None) -> None:
+        self.pool.set_metabolite_abs(name, value, self.mask)
+
+    def setSignal(self, name: str, value) -> None:
+        self.pool.set_signal(name, value, self.mask)
+
+    def setParameter(self, name: str, value) -> None:
+        value = np.asarray(value, dtype=float)
+        if self.mask is not None:
+            value = np.where(self.mask, value, self.getParameter(name))
+        self.pool.parameter_overrides[name] = np.broadcast_to(value, (self.pool.env.n,))
+
+    def writeOutputs(self, outputs: Dict[str, Any]) -> None:
+        self.pool.write_output(outputs, self.mask)
+
+    def recordRate(self, name: str, rate) -> None:
+        self.pool.record_rate(name, rate, self.mask)
+
+
+class BatchCtx:
+    def __init__(self, env: BatchResourceEnv, rate_modifier=1.0):
+        self.env = env
+        self.rate_modifier = rate_modifier
+
+    def under(self, mask) -> "BatchCtx":
+        return BatchCtx(self.env.masked(mask), self.rate_modifier)
+
+    def applyAction(self, action: str, payload: Any = None) -> None:
+        if action == "downscale_rates":
+            self.rate_modifier = payload if payload is not None else 0.5
+
+    def write(self, outputs: Dict[str, Any]) -> None:
+        self.env.writeOutputs(outputs)
+
+
+def _post(ctx: BatchCtx) -> np.ndarray:
+    return np.where(ctx.env.getParameter("is_postprandial") != 0.0, 1.0, 0.0)
+
+
+def _merge(*outs: Dict[str, Any]) -> Dict[str, Any]:
+    outputs = {}
+    for o in outs:
+        for k, v in o.items():
+            outputs[k] = outputs.get(k, 0.0) + v
+    return outputs
+
+
+# --- 反应函数：与 simulate.py 中同名函数逐一对应，按患者向量化 ---
+
+def hexokinase_or_glucokinase(ctx: BatchCtx) -> Dict[str, Any]:
+    insulin = ctx.env.getSignal("insulin")
+    ins_sens = ctx.env.getParameter("insulin_sensitivity")
+    glucose = ctx.env.getMetabolite("glucose")
+    atp = ctx.env.getMetabolite("atp")
+    rate = ctx.rate_modifier * _max(0.0, _min(glucose, atp)) * (0.01 + 0.05 * insulin * ins_sens)
+    ctx.env.setMetabolite("glucose", glucose - rate)
+    ctx.env.setMetabolite("atp", atp - rate * 0.2)
+    ctx.env.recordRate("hexokinase_or_glucokinase", rate)
+    return {"glycogen": 0.0}
+
+def pgm_G6P_to_G1P(ctx: BatchCtx) -> Dict[str, Any]:
+    g6p = _min(ctx.env.getMetabolite("glucose"), 2.0)
+    ctx.env.recordRate("pgm_G6P_to_G1P", g6p)
+    return {"glucose": -g6p, "glycogen": 0.0}
+
+def udpGlucoseSynthesis(ctx: BatchCtx) -> Dict[str, Any]:
+    atp = ctx.env.getMetabolite("atp")
+    glucose = ctx.env.getMetabolite("glucose")
+    rate = ctx.rate_modifier * _min(glucose, atp * 0.5) * 0.02
+    ctx.env.recordRate("udpGlucoseSynthesis", rate)
+    return {"glucose": -rate, "atp": -rate * 0.2}
+
+def glycogenSynthaseStep(ctx: BatchCtx) -> Dict[str, Any]:
+    insulin = ctx.env.getSignal("insulin")
+    ins_sens = ctx.env.getParameter("insulin_sensitivity")
+    glucose = ctx.env.getMetabolite("glucose")
+    atp = ctx.env.getMetabolite("atp")
+    rate = ctx.rate_modifier * (0.01 + 0.05 * insulin * ins_sens) * _min(glucose, atp)
+    ctx.env.recordRate("glycogenSynthaseStep", rate)
+    return {"glucose": -rate, "glycogen": rate, "atp": -rate * 0.1, "adp": rate * 0.1}
+
+def branchingEnzymeStep(ctx: BatchCtx) -> Dict[str, Any]:
+    glycogen = ctx.env.getMetabolite("glycogen")
+    rate = ctx.rate_modifier * _min(glycogen, 1.0) * 0.01
+    ctx.env.recordRate("branchingEnzymeStep", rate)
+    return {"glycogen": rate * 0.0}
+
+def glycogenPhosphorylaseStep(ctx: BatchCtx) -> Dict[str, Any]:
+    glucagon = ctx.env.getSignal("glucagon")
+    ep = ctx.env.getSignal("epinephrine")
+    glycogen = ctx.env.getMetabolite("glycogen")
+    rate = ctx.rate_modifier * (0.02 + 0.04 * glucagon + 0.08 * ep) * glycogen
+    ctx.env.recordRate("glycogenPhosphorylaseStep", rate)
+    return {"glycogen": -rate, "glucose": rate}
+
+def debranchingEnzymeStep(ctx: BatchCtx) -> Dict[str, Any]:
+    glycogen = ctx.env.getMetabolite("glycogen")
+    rate = ctx.rate_modifier * _min(glycogen, 1.0) * 0.01
+    ctx.env.recordRate("debranchingEnzymeStep", rate)
+    return {"glycogen": -rate * 0.1, "glucose": rate * 0.1}
+
+def g1p_to_g6p(ctx: BatchCtx) -> Dict[str, Any]:
+    ctx.env.recordRate("g1p_to_g6p", 0.0)
+    return {"glucose": 0.0}
+
+def glycolysis_middle_steps(ctx: BatchCtx) -> Dict[str, Any]:
+    glucose = ctx.env.getMetabolite("glucose")
+    nad_plus = ctx.env.getMetabolite("nad_plus")
+    adp = ctx.env.getMetabolite("adp")
+    o2 = ctx.env.getMetabolite("oxygen")
+    rate = ctx.rate_modifier * _min(glucose, nad_plus * 0.5, adp * 0.5) * 0.05
+    lact_frac = np.where(o2 < 50.0, 0.8, 0.5)
+    ctx.env.recordRate("glycolysis_middle_steps", rate)
+    return {"glucose": -rate, "nadh": rate, "nad_plus": -rate, "atp": rate, "adp": -rate, "lactate": rate * lact_frac}
+
+def pyruvateKinase_step(ctx: BatchCtx) -> Dict[str, Any]:
+    ctx.env.recordRate("pyruvateKinase_step", 0.0)
+    return {"atp": 0.0}
+
+def fattyAcidSynthesis(ctx: BatchCtx) -> Dict[str, Any]:
+    insulin = ctx.env.getSignal("insulin")
+    ins_sens = ctx.env.getParameter("insulin_sensitivity")
+    acetyl = ctx.env.getMetabolite("acetyl_coa")
+    nadph = ctx.env.getMetabolite("nadph")
+    atp = ctx.env.getMetabolite("atp")
+    rate = ctx.rate_modifier * (0.01 + 0.05 * insulin * ins_sens) * _min(acetyl, nadph * 0.5, atp * 0.5)
+    ctx.env.recordRate("fattyAcidSynthesis", rate)
+    return {"acetyl_coa": -rate, "fatty_acid": rate, "nadph": -rate * 0.5, "atp": -rate * 0.2}
+
+def betaOxidation(ctx: BatchCtx) -> Dict[str, Any]:
+    glucagon = ctx.env.getSignal("glucagon")
+    ep = ctx.env.getSignal("epinephrine")
+    fa = ctx.env.getMetabolite("fatty_acid")
+    nad_plus = ctx.env.getMetabolite("nad_plus")
+    etoh = ctx.env.getMetabolite("ethanol")
+    alcohol_inhibition = np.where(etoh > 0.5, 0.6, 1.0)
+    rate = ctx.rate_modifier * alcohol_inhibition * (0.3 + 0.4 * _max(glucagon, ep)) * _min(fa, nad_plus)
+    rate = np.where(fa > 40.0, rate * 2.0, np.where(fa > 20.0, rate * 1.5, rate))
+    ctx.env.recordRate("betaOxidation", rate)
+    return {"fatty_acid": -rate, "acetyl_coa": rate, "nadh": rate, "nad_plus": -rate, "atp": rate * 0.5}
+
+def deNovoLipogenesis(ctx: BatchCtx) -> Dict[str, Any]:
+    insulin = ctx.env.getSignal("insulin")
+    ins_sens = ctx.env.getParameter("insulin_sensitivity")
+    glucose = ctx.env.getMetabolite("glucose")
+    atp = ctx.env.getMetabolite("atp")
+    nadph = ctx.env.getMetabolite("nadph")
+    excess = _max(0.0, (glucose - 100.0) / 100.0)
+    rate = ctx.rate_modifier * (0.02 + 0.08 * insulin * ins_sens) * excess * _min(glucose, atp * 0.5, nadph * 0.5)
+    ctx.env.recordRate("deNovoLipogenesis", rate)
+    return {"glucose": -rate, "fatty_acid": rate, "atp": -rate * 0.2, "nadph": -rate * 0.5}
+
+def lipidTransport(ctx: BatchCtx) -> Dict[str, Any]:
+    insulin = ctx.env.getSignal("insulin")
+    ins_sens = ctx.env.getParameter("insulin_sensitivity")
+    fa = ctx.env.getMetabolite("fatty_acid")
+    rate = ctx.rate_modifier * (0.01 + 0.05 * insulin * ins_sens) * _min(fa, 5.0)
+    ctx.env.recordRate("lipidTransport", rate)
+    return {"fatty_acid": -rate * 0.7, "triglycerides": rate}
+
+def adiposeLipolysis(ctx: BatchCtx) -> Dict[str, Any]:
+    insulin = ctx.env.getSignal("insulin")
+    glucagon = ctx.env.getSignal("glucagon")
+    ep = ctx.env.getSignal("epinephrine")
+    drive = _max(glucagon - insulin, 0.0) + ep * 1.0
+    low_ins_boost = np.where(insulin < 0.2, 0.5, 0.0)
+    rate = ctx.rate_modifier * (0.02 + 0.05 * (drive + low_ins_boost)) * 3.0
+    ctx.env.recordRate("adiposeLipolysis", rate)
+    return {"fatty_acid": rate * 0.8, "glycerol": rate * 0.2}
+
+def aminoAcidCatabolism(ctx: BatchCtx) -> Dict[str, Any]:
+    aa = ctx.env.getMetabolite("amino_acid")
+    atp = ctx.env.getMetabolite("atp")
+    cort = ctx.env.getSignal("cortisol")
+    post = _post(ctx)
+    rate = ctx.rate_modifier * (1.0 + 0.3 * post + 0.3 * cort) * _min(_max(aa - 20.0, 0.0), atp) * 0.05
+    ctx.env.recordRate("aminoAcidCatabolism", rate)
+    return {"amino_acid": -rate, "ammonia": rate, "atp": -rate * 0.1}
+
+def aminoAcidSynthesisTransport(ctx: BatchCtx) -> Dict[str, Any]:
+    aa = ctx.env.getMetabolite("amino_acid")
+    atp = ctx.env.getMetabolite("atp")
+    rate = ctx.rate_modifier * _min(aa, atp) * 0.02
+    ctx.env.recordRate("aminoAcidSynthesisTransport", rate)
+    return {"amino_acid": -rate, "albumin": rate * 0.6, "clotting_factor": rate * 0.4, "atp": -rate * 0.2}
+
+def oxidativePhosphorylation(ctx: BatchCtx) -> Dict[str, Any]:
+    nadh = ctx.env.getMetabolite("nadh")
+    oxygen = ctx.env.getMetabolite("oxygen")
+    adp = ctx.env.getMetabolite("adp")
+    rate = ctx.rate_modifier * _min(nadh, oxygen * 0.2, _max(adp, 1.0)) * 0.6
+    ctx.env.recordRate("oxidativePhosphorylation", rate)
+    return {"nadh": -rate, "nad_plus": rate, "oxygen": -rate * 0.5, "atp": rate, "adp": -rate}
+
+def ketogenesis(ctx: BatchCtx) -> Dict[str, Any]:
+    glucose = ctx.env.getMetabolite("glucose")
+    acetyl = ctx.env.getMetabolite("acetyl_coa")
+    glucagon = ctx.env.getSignal("glucagon")
+    insulin = ctx.env.getSignal("insulin")
+    low_ins_gain = _max(0.0, 1.0 - insulin)
+    post_clamp = np.where(_post(ctx) > 0.0, 0.3, 1.0)
+    rate = ctx.rate_modifier * post_clamp * (0.1 + 0.15 * glucagon + 0.12 * low_ins_gain) * _max(0.0, (70.0 - glucose) / 70.0) * _min(acetyl, 5.0)
+    rate = _max(_min(rate, 0.25), 0.05)
+    ctx.env.recordRate("ketogenesis", rate)
+    return {"acetyl_coa": -rate, "ketone_body": rate}
+
+def lactateFermentation(ctx: BatchCtx) -> Dict[str, Any]:
+    pyr = ctx.env.getMetabolite("pyruvate")
+    nadh = ctx.env.getMetabolite("nadh")
+    nadp = ctx.env.getMetabolite("nad_plus")
+    oxygen = ctx.env.getMetabolite("oxygen")
+    deficit = np.where((nadp < 15.0) | ((nadh / (nadp + 1e-6)) > 2.0), 1.0, 0.0)
+    hypox = np.where(oxygen < 40.0, 1.0, 0.0)
+    trig = _max(deficit, hypox)
+    rate = ctx.rate_modifier * trig * _min(pyr + 0.5, nadh) * 0.08
+    ctx.env.recordRate("lactateFermentation", rate)
+    return {"pyruvate": -rate, "lactate": rate, "nadh": -rate, "nad_plus": rate}
+
+def nampt_Salvage(ctx: BatchCtx) -> Dict[str, Any]:
+    nam = ctx.env.getMetabolite("nicotinamide")
+    atp = ctx.env.getMetabolite("atp")
+    liver_fn = ctx.env.getParameter("liver_function")
+    rate = ctx.rate_modifier * _min(nam, atp * 0.3) * 0.06 * liver_fn
+    ctx.env.recordRate("nampt_Salvage", rate)
+    return {"nicotinamide": -rate, "nad_plus": rate, "atp": -rate * 0.2}
+
+def deNovoNADSynthesis(ctx: BatchCtx) -> Dict[str, Any]:
+    nia = ctx.env.getMetabolite("niacin")
+    trp = ctx.env.getMetabolite("tryptophan")
+    atp = ctx.env.getMetabolite("atp")
+    liver_fn = ctx.env.getParameter("liver_function")
+    precursor = _min(nia + trp * 0.5, atp * 0.3)
+    rate = ctx.rate_modifier * precursor * 0.03 * liver_fn
+    ctx.env.recordRate("deNovoNADSynthesis", rate)
+    return {"niacin": -rate * 0.5, "tryptophan": -rate, "nad_plus": rate, "atp": -rate * 0.2}
+
+def cps1_Ammonia_to_CarbamoylPhosphate(ctx: BatchCtx) -> Dict[str, Any]:
+    nh3 = ctx.env.getMetabolite("ammonia")
+    atp = ctx.env.getMetabolite("atp")
+    post = _post(ctx)
+    rate = ctx.rate_modifier * (1.0 + 0.5 * post) * _min(nh3, atp * 0.5) * 0.3
+    ctx.env.recordRate("cps1_Ammonia_to_CarbamoylPhosphate", rate)
+    return {"ammonia": -rate, "atp": -rate * 0.5, "citrulline": rate}
+
+def otc_CarbamoylPhosphate_to_Citrulline(ctx: BatchCtx) -> Dict[str, Any]:
+    cit = ctx.env.getMetabolite("citrulline")
+    orn = ctx.env.getMetabolite("ornithine")
+    post = _post(ctx)
+    rate = ctx.rate_modifier * (1.0 + 0.5 * post) * _min(cit, orn) * 0.3
+    ctx.env.recordRate("otc_CarbamoylPhosphate_to_Citrulline", rate)
+    return {"citrulline": -rate, "argininosuccinate": rate}
+
+def ass1_Citrulline_to_ASP_Argininosuccinate(ctx: BatchCtx) -> Dict[str, Any]:
+    arg_succ = ctx.env.getMetabolite("argininosuccinate")
+    post = _post(ctx)
+    rate = ctx.rate_modifier * (1.0 + 0.3 * post) * _min(arg_succ, 5.0) * 0.2
+    ctx.env.recordRate("ass1_Citrulline_to_ASP_Argininosuccinate", rate)
+    return {"argininosuccinate": -rate, "arginine": rate}
+
+def asl_Argininosuccinate_to_Arginine_Fumarate(ctx: BatchCtx) -> Dict[str, Any]:
+    arg = ctx.env.getMetabolite("arginine")
+    post = _post(ctx)
+    rate = ctx.rate_modifier * (1.0 + 0.3 * post) * _min(arg, 5.0) * 0.2
+    ctx.env.recordRate("asl_Argininosuccinate_to_Arginine_Fumarate", rate)
+    return {"arginine": -rate, "urea": rate, "ornithine": rate * 0.5}
+
+def phaseI_OxRed(ctx: BatchCtx) -> Dict[str, Any]:
+    xen = ctx.env.getParameter("xenobiotic_load")
+    nadph = ctx.env.getMetabolite("nadph")
+    liver_fn = ctx.env.getParameter("liver_function")
+    rate = ctx.rate_modifier * _min(xen, nadph) * 0.1 * liver_fn
+    ctx.env.recordRate("phaseI_OxRed", rate)
+    return {"phaseI_intermediates": rate, "nadph": -rate}
+
+def phaseII_Conjugation(ctx: BatchCtx) -> Dict[str, Any]:
+    inter = ctx.env.getMetabolite("phaseI_intermediates")
+    liver_fn = ctx.env.getParameter("liver_function")
+    conj = ctx.env.getMetabolite("conjugates")
+    udpga = ctx.env.getMetabolite("udpga")
+    paps = ctx.env.getMetabolite("paps")
+    gsh = ctx.env.getMetabolite("gsh")
+    cof = _max(0.0, _min(udpga + paps + gsh, inter + 1.0))
+    rate = ctx.rate_modifier * inter * 0.1 * (liver_fn ** 2) * (0.5 + 0.5 * _min(cof / 10.0, 1.0))
+    clear = ctx.rate_modifier * conj * 0.05 * _max(liver_fn - 0.5, 0.0)
+    ctx.env.recordRate("phaseII_Conjugation", rate)
+    return {
+        "phaseI_intermediates": -rate,
+        "conjugates": rate - clear,
+        "udpga": -rate * 0.2,
+        "paps": -rate * 0.1,
+        "gsh": -rate * 0.1,
+    }
+
+def bilirubinUGT(ctx: BatchCtx) -> Dict[str, Any]:
+    ib = ctx.env.getMetabolite("indirect_bilirubin")
+    udpga = ctx.env.getMetabolite("udpga")
+    liver_fn = ctx.env.getParameter("liver_function")
+    rate = ctx.rate_modifier * _min(ib, udpga * 0.5) * 0.05 * liver_fn
+    ctx.env.recordRate("bilirubinUGT", rate)
+    return {"indirect_bilirubin": -rate, "direct_bilirubin": rate, "udpga": -rate * 0.5}
+
+def ethanol_ADH(ctx: BatchCtx) -> Dict[str, Any]:
+    etoh = ctx.env.getMetabolite("ethanol")
+    nadp = ctx.env.getMetabolite("nad_plus")
+    liver_fn = ctx.env.getParameter("liver_function")
+    substrate_saturation = _min(etoh / 1.0, 1.0)
+    v_max = 0.5 * liver_fn
+    cofactor_limit = _min(1.0, nadp / 5.0)
+    rate = ctx.rate_modifier * v_max * substrate_saturation * cofactor_limit
+    ctx.env.recordRate("ethanol_ADH", rate)
+    return {"ethanol": -rate, "acetaldehyde": rate, "nadh": rate * 0.8, "nad_plus": -rate * 0.8}
+
+def acetaldehyde_ALDH(ctx: BatchCtx) -> Dict[str, Any]:
+    acald = ctx.env.getMetabolite("acetaldehyde")
+    nadp = ctx.env.getMetabolite("nad_plus")
+    liver_fn = ctx.env.getParameter("liver_function")
+    aldh_act = ctx.env.getParameter("aldh_activity")
+    substrate_saturation = _min(acald / 1.0, 1.0)
+    v_max = 0.4 * liver_fn * aldh_act
+    cofactor_limit = _min(1.0, nadp / 5.0)
+    rate = ctx.rate_modifier * v_max * substrate_saturation * cofactor_limit
+    ctx.env.recordRate("acetaldehyde_ALDH", rate)
+    return {"acetaldehyde": -rate, "acetate": rate, "nadh": rate * 0.8, "nad_plus": -rate * 0.8}
+
+def acetate_to_acetylcoa(ctx: BatchCtx) -> Dict[str, Any]:
+    ac = ctx.env.getMetabolite("acetate")
+    atp = ctx.env.getMetabolite("atp")
+    rate = ctx.rate_modifier * _min(ac, atp * 0.5) * 0.02
+    ctx.env.recordRate("acetate_to_acetylcoa", rate)
+    return {"acetate": -rate, "acetyl_coa": rate, "atp": -rate * 0.2}
+
+def bileAcidSynthesis(ctx: BatchCtx) -> Dict[str, Any]:
+    chol = ctx.env.getMetabolite("cholesterol")
+    rate = ctx.rate_modifier * _min(chol, 5.0) * 0.02
+    ctx.env.recordRate("bileAcidSynthesis", rate)
+    return {"cholesterol": -rate, "bile_acid": rate}
+
+def plasmaProteinSynthesis(ctx: BatchCtx) -> Dict[str, Any]:
+    aa = ctx.env.getMetabolite("amino_acid")
+    atp = ctx.env.getMetabolite("atp")
+    post = _post(ctx)
+    rate = ctx.rate_modifier * (1.0 + 0.5 * post) * _min(aa, atp) * 0.03
+    ctx.env.recordRate("plasmaProteinSynthesis", rate)
+    return {"amino_acid": -rate, "albumin": rate, "atp": -rate * 0.2}
+
+def coagulationFactorSynthesis(ctx: BatchCtx) -> Dict[str, Any]:
+    aa = ctx.env.getMetabolite("amino_acid")
+    atp = ctx.env.getMetabolite("atp")
+    rate = ctx.rate_modifier * _min(aa, atp) * 0.01
+    ctx.env.recordRate("coagulationFactorSynthesis", rate)
+    return {"amino_acid": -rate, "clotting_factor": rate, "atp": -rate * 0.1}
+
+def cytosolicATPase_load(ctx: BatchCtx) -> Dict[str, Any]:
+    atp = ctx.env.getMetabolite("atp")
+    rate = ctx.rate_modifier * _min(atp, 2.0) * 0.03
+    ctx.env.recordRate("cytosolicATPase_load", rate)
+    return {"atp": -rate, "adp": rate}
+
+
+# --- 编排函数 ---
+
+def orchestrateGlycogenSynthesis(ctx: BatchCtx) -> Dict[str, Any]:
+    outputs = _merge(pgm_G6P_to_G1P(ctx), udpGlucoseSynthesis(ctx), glycogenSynthaseStep(ctx), branchingEnzymeStep(ctx))
+    ctx.write(outputs)
+    return outputs
+
+def orchestrateGlycogenBreakdown(ctx: BatchCtx) -> Dict[str, Any]:
+    outputs = _merge(glycogenPhosphorylaseStep(ctx), debranchingEnzymeStep(ctx), g1p_to_g6p(ctx))
+    ctx.write(outputs)
+    return outputs
+
+def orchestrateGluconeogenesis(ctx: BatchCtx) -> Dict[str, Any]:
+    lact = ctx.env.getMetabolite("lactate")
+    glyc = ctx.env.getMetabolite("glycerol")
+    aa = ctx.env.getMetabolite("amino_acid")
+    atp = ctx.env.getMetabolite("atp")
+    glucagon = ctx.env.getSignal("glucagon")
+    etoh = ctx.env.getMetabolite("ethanol")
+    infl = ctx.env.getSignal("inflammation")
+    cort = ctx.env.getSignal("cortisol")
+    alcohol_inhibition = np.where(etoh > 0.5, 0.5, 1.0)
+    stress_gain = 1.0 + 0.7 * cort + 0.7 * infl
+    post_clamp = np.where(_post(ctx) > 0.0, 0.7, 1.0)
+    rate = ctx.rate_modifier * post_clamp * alcohol_inhibition * stress_gain * (0.02 + 0.05 * glucagon) * _min(lact + glyc + aa, atp * 0.5)
+    outputs = {"glucose": rate, "lactate": -rate * 0.4, "glycerol": -rate * 0.3, "amino_acid": -rate * 0.3, "atp": -rate * 0.2}
+    ctx.write(outputs)
+    return outputs
+
+def orchestrateGlycolysis(ctx: BatchCtx) -> Dict[str, Any]:
+    outputs = _merge(hexokinase_or_glucokinase(ctx), glycolysis_middle_steps(ctx), pyruvateKinase_step(ctx))
+    ctx.write(outputs)
+    return outputs
+
+def orchestrateLipidMetabolism(ctx: BatchCtx) -> Dict[str, Any]:
+    # 分支改写为掩码：未命中分支的患者贡献 0，与标量版本逐元素一致
+    insulin = ctx.env.getSignal("insulin")
+    glucagon = ctx.env.getSignal("glucagon")
+    triglycerides = ctx.env.getMetabolite("triglycerides")
+    fatty_acid = ctx.env.getMetabolite("fatty_acid")
+    post = ctx.env.getParameter("is_postprandial") != 0.0
+    initial_triglycerides = 80.0
+
+    outputs = {}
+
+    def add(o, mask, scale=None):
+        for k, v in o.items():
+            v = v if scale is None else v * scale
+            outputs[k] = outputs.get(k, 0.0) + np.where(mask, v, 0.0)
+
+    high_fa = fatty_acid > 8.0
+    low_fa = fatty_acid < 8.0
+    fed = insulin > glucagon
+
+    add(betaOxidation(ctx.under(high_fa)), high_fa, 4.0)
+
+    synth = fed & low_fa
+    fas_ctx = ctx.under(synth)
+    for o_ in (fattyAcidSynthesis(fas_ctx), deNovoLipogenesis(fas_ctx)):
+        add(o_, synth, 0.1)
+    add(lipidTransport(ctx.under(fed)), fed)
+    add({"triglycerides": ctx.rate_modifier * 0.4}, fed & post)
+    add({"triglycerides": -ctx.rate_modifier * 2.5}, fed & (triglycerides > initial_triglycerides * 1.6))
+
+    fasting = ~fed
+    o = betaOxidation(ctx.under(fasting))
+    lipo = fasting & low_fa
+    lip = adiposeLipolysis(ctx.under(lipo))
+    for k, v in lip.items():
+        add({k: v}, lipo, 0.02 if k == "fatty_acid" else None)
+    add(o, fasting, 2.5)
+
+    post_high = post & high_fa
+    add(betaOxidation(ctx.under(post_high)), post_high, 3.0)
+
+    ctx.write(outputs)
+    return outputs
+
+def orchestrateAminoAcidMetabolism(ctx: BatchCtx) -> Dict[str, Any]:
+    outputs = _merge(aminoAcidCatabolism(ctx), aminoAcidSynthesisTransport(ctx))
+    ctx.write(outputs)
+    return outputs
+
+def orchestrateEnergyHomeostasis(ctx: BatchCtx) -> Dict[str, Any]:
+    low = ctx.env.getMetabolite("glucose") < 70.0
+    ketogenesis_ctx = ctx.under(low)
+    ketogenesis_ctx.write(ketogenesis(ketogenesis_ctx))
+    oxphos_ctx = ctx.under(~low)
+    oxphos_ctx.write(oxidativePhosphorylation(oxphos_ctx))
+    return {}
+
+def orchestrateNADHomeostasis(ctx: BatchCtx) -> Dict[str, Any]:
+    outputs = _merge(nampt_Salvage(ctx), deNovoNADSynthesis(ctx), lactateFermentation(ctx))
+    ctx.write(outputs)
+    return outputs
+
+def orchestrateUreaCycle(ctx: BatchCtx) -> Dict[str, Any]:
+    outputs = _merge(
+        cps1_Ammonia_to_CarbamoylPhosphate(ctx),
+        otc_CarbamoylPhosphate_to_Citrulline(ctx),
+        ass1_Citrulline_to_ASP_Argininosuccinate(ctx),
+        asl_Argininosuccinate_to_Arginine_Fumarate(ctx),
+    )
+    ctx.write(outputs)
+    return outputs
+
+def orchestrateDetoxification(ctx: BatchCtx) -> Dict[str, Any]:
+    outputs = _merge(
+        phaseI_OxRed(ctx),
+        phaseII_Conjugation(ctx),
+        ethanol_ADH(ctx),
+        acetaldehyde_ALDH(ctx),
+        acetate_to_acetylcoa(ctx),
+        bilirubinUGT(ctx),
+    )
+    ctx.write(outputs)
+    return outputs
+
+def orchestrateSynthesisSecretion(ctx: BatchCtx) -> Dict[str, Any]:
+    outputs = _merge(bileAcidSynthesis(ctx), plasmaProteinSynthesis(ctx), coagulationFactorSynthesis(ctx))
+    ctx.write(outputs)
+    return outputs
+
+def orchestrateSystemSignals(ctx: BatchCtx) -> Dict[str, Any]:
+    # hormoneSignalTransduction / neuralSignalIntegration 写入的 insulin、glucagon、epinephrine
+    # 在同一步内会被降解模块覆盖（ResourcePool 后写覆盖先写），这里只计算最终生效的值
+    infl = _max(ctx.env.getSignal("inflammation") - 0.001, 0.0)
+    ctx.env.setSignal("inflammation", infl)
+    ctx.env.setParameter("insulin_sensitivity", _max(0.5, 1.0 - 0.5 * infl))
+    ide = ctx.env.getParameter("insulin_degrading_enzyme_activity")
+    ins = ctx.env.getSignal("insulin")
+    ctx.env.setSignal("insulin", _max(ins - 0.02 * ide * ins, 0.0))
+    ctx.env.setSignal("glucagon", _max(ctx.env.getSignal("glucagon") - 0.01, 0.0))
+    ctx.env.setSignal("epinephrine", _max(ctx.env.getSignal("epinephrine") - 0.01, 0.0))
+    return {}
+
+def applyEnergyDeficitPolicies(ctx: BatchCtx) -> None:
+    atp = ctx.env.getMetabolite("atp")
+    etoh = ctx.env.getMetabolite("ethanol")
+    ctx.applyAction("downscale_rates", np.where(atp < 1.5, 0.3, 1.0))
+    ctx.applyAction("downscale_rates", np.where(etoh > 0.1, ctx.rate_modifier * 0.8, ctx.rate_modifier))
+
+
+class BatchLiverMetabolismSystem:
+    """LiverMetabolismSystem 的批量版本：每一步对全部 N 个患者各求值一次反应函数。"""
+
+    def __init__(self, env: BatchMetabolicEnvironment):
+        self.env = env
+
+    def evaluate(self) -> _BatchPool:
+        """基于当前状态求一步的增量与速率，不写回环境。"""
+        pool = _BatchPool(self.env)
+        rctx = BatchCtx(BatchResourceEnv(pool))
+        orchestrateSystemSignals(rctx)
+        applyEnergyDeficitPolicies(rctx)
+        synth = rctx.env.getSignal("insulin") > rctx.env.getSignal("glucagon")
+        tasks = [
+            (orchestrateNADHomeostasis, None),
+            (orchestrateEnergyHomeostasis, None),
+            (cytosolicATPase_load, None),
+            (orchestrateGlycolysis, None),
+            (orchestrateGluconeogenesis, None),
+            (orchestrateLipidMetabolism, None),
+            (orchestrateAminoAcidMetabolism, None),
+            (orchestrateGlycogenSynthesis, synth),
+            (orchestrateGlycogenBreakdown, ~synth),
+            (orchestrateUreaCycle, None),
+            (orchestrateSynthesisSecretion, None),
+            (orchestrateDetoxification, None),
+            (orchestrateNADHomeostasis, None),
+        ]
+        for fn, mask in tasks:
+            fn(rctx if mask is None else rctx.under(mask))
+        return pool
+
+    def tendency(self) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        """一步的状态增量 (Δ代谢物 (N, k_m), Δ信号 (N, k_s), 速率)，即 step 前后之差，不修改环境。"""
+        pool = self.evaluate()
+        m = self.env.metabolites
+        dm = np.zeros_like(m)
+        for k, v in pool.outputs.items():
+            i = self.env.metabolite_index[k]
+            dm[:, i] = np.maximum(m[:, i] + v, 0.0) - m[:, i]
+        s = self.env.signals
+        ds = np.zeros_like(s)
+        for k, v in pool.signal_updates.items():
+            i = self.env.signal_index[k]
+            ds[:, i] = np.where(np.isnan(v), 0.0, v - s[:, i])
+        return dm, ds, pool.rates
+
+    def step(self, t) -> None:
+        pool = self.evaluate()
+        self.env.writeOutputs(pool.outputs)
+        for s, v in pool.signal_updates.items():
+            i = self.env.signal_index[s]
+            self.env.signals[:, i] = np.where(np.isnan(v), self.env.signals[:, i], v)
+        self.env.current_rates.update(pool.rates)
+        self.env.update_history(t)
+
+
+def run_batch(env: BatchMetabolicEnvironment, minutes: int, inject=None, columns: Sequence[str] = None,
+              path: str = None, dtype=np.float64) -> np.ndarray:
+    """按分钟推进 N 个患者；返回 (minutes, N, columns) 历史数组（给定 path 时为 memmap 文件上的数组）。"""
+    system = BatchLiverMetabolismSystem(env)
+    inject = as_inject(inject, env, minutes)
+    env.reserve_history(minutes, columns, dtype, path=path, dt=1.0 / 60.0, start=0.0)
+    for tt in range(minutes):
+        hour = tt / 60.0
+        if inject:
+            inject(env, tt)
+        system.step(hour)
+    env.flush_history()
+    return env.to_array()
@@ -0,0 +1,510 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+import main
+from adaptive import run_adaptive
+from batch import BatchMetabolicEnvironment, run_batch
+import simulate
+import sum_result
+from simulate import LiverMetabolismSystem, MetabolicEnvironment, ResourcePool
+from simulate_ode import run_ode
+from simulate_trigger import LiverMetabolismSystemTrigger, TriggerCtx, _reaction_list
+
+
+def _timeit(fn: Callable[[], object], repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_backends(backends: List[str] = None, repeats: int = 3) -> Dict[str, float]:
+    # main.simulate_24h：24 小时三餐场景，共 721 步
+    backends = backends or ["serial", "thread", "process"]
+    steps = 24 * 30 + 1
+    results: Dict[str, float] = {}
+    for name in backends:
+        elapsed = _timeit(lambda: main.simulate_24h(backend=name), repeats)
+        results[name] = steps / elapsed
+        print(f"[backend] {name:<8s} {elapsed:8.3f} s  {steps / elapsed:10.1f} steps/s")
+    return results
+
+
+def _meals(e, t: int) -> None:
+    # 批量与逐患者共用的注入回调：三餐 + 餐后窗口
+    if t in (60, 300, 660):
+        e.setMetabolite("glucose", e.getMetabolite("glucose") + 30.0)
+        e.setMetabolite("amino_acid", e.getMetabolite("amino_acid") + 5.0)
+    e.setParameter("is_postprandial", 60 <= t < 180 or 300 <= t < 480 or 660 <= t < 900)
+
+
+def bench_cohort(n: int = 10000, minutes: int = 24 * 60, loop_sample: int = 10) -> float:
+    # N 个患者（liver_function 各不相同）24 小时：批量推进 vs 逐患者循环（按 loop_sample 个患者外推）
+    liver_function = np.random.default_rng(0).uniform(0.2, 1.0, n)
+    columns = ["glucose", "insulin", "ketone_body", "rate_betaOxidation", "time"]
+
+    t0 = time.perf_counter()
+    env = BatchMetabolicEnvironment.from_parameters(n, liver_function=liver_function)
+    run_batch(env, minutes, _meals, columns=columns)
+    batched = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for i in range(loop_sample):
+        e = MetabolicEnvironment()
+        e.setParameter("liver_function", float(liver_function[i]))
+        system = LiverMetabolismSystem(e)
+        e.reserve_history(minutes)
+        for tt in range(minutes):
+            _meals(e, tt)
+            system.step(tt / 60.0)
+        assert np.array_equal(e.to_frame()[columns].to_numpy(), env.to_array()[:, i, :], equal_nan=True)
+    looped = (time.perf_counter() - t0) / loop_sample * n
+
+    speedup = looped / batched
+    print(f"[cohort] {n} patients x {minutes} min: batched {batched:8.2f} s, "
+          f"loop {looped:8.1f} s (extrapolated), speedup {speedup:.0f}x")
+    return speedup
+
+
+def bench_trigger(steps: int = 2000, repeats: int = 3) -> Dict[str, float]:
+    # 触发式引擎每步耗时：谓词求值（标量逐条 vs 编译掩码）与完整 step（compiled=False/True）
+    env = MetabolicEnvironment()
+    ctx = TriggerCtx(env)
+    system = LiverMetabolismSystemTrigger(env)
+    n = 10000
+    per_pred = {
+        "predicates/scalar": _timeit(lambda: [[bool(pred(ctx)) for _, _, pred in _reaction_list()] for _ in range(n)], repeats) / n,
+        "predicates/compiled": _timeit(lambda: [system._trigger_mask() for _ in range(n)], repeats) / n,
+    }
+
+    def run(compiled: bool) -> None:
+        e = MetabolicEnvironment()
+        s = LiverMetabolismSystemTrigger(e, compiled=compiled)
+        e.reserve_history(steps)
+        for tt in range(steps):
+            _meals(e, tt)
+            s.step(tt / 60.0)
+
+    per_step = {
+        "step/reference": _timeit(lambda: run(False), repeats) / steps,
+        "step/compiled": _timeit(lambda: run(True), repeats) / steps,
+    }
+    results = {**per_pred, **per_step}
+    for name, sec in results.items():
+        print(f"[trigger] {name:<20s} {sec * 1e6:8.1f} us")
+    return results
+
+
+def bench_symbols(n: int = 200000, repeats: int = 3) -> Dict[str, float]:
+    # 状态读取与历史记录：按名称（旧 dict 写法 / 兼容接口）vs 预解析槽位；完整 step 见 bench_slots_step
+    env = MetabolicEnvironment()
+    legacy = dict(env.metabolites)
+    i = simulate.MET.glucose
+    m = env.m
+    results = {
+        "read/dict": _timeit(lambda: [float(legacy.get("glucose", 0.0)) for _ in range(n)], repeats) / n,
+        "read/getMetabolite": _timeit(lambda: [env.getMetabolite("glucose") for _ in range(n)], repeats) / n,
+        "read/view": _timeit(lambda: [env.metabolites["glucose"] for _ in range(n)], repeats) / n,
+        "read/slot": _timeit(lambda: [m[i] for _ in range(n)], repeats) / n,
+    }
+    rows = n // 20
+    dicts = (dict(env.metabolites), dict(env.signals), dict(env.parameters))
+
+    def history(flat: bool) -> None:
+        e = MetabolicEnvironment()
+        e.reserve_history(rows)
+        for tt in range(rows):
+            if flat:
+                e.update_history(tt)
+            else:
+                e.recorder.append_parts((("", dicts[0]), ("", dicts[1]), ("", dicts[2]), ("rate_", e.current_rates), ("", {"time": tt})))
+
+    results["history/dicts"] = _timeit(lambda: history(False), repeats) / rows
+    results["history/slots"] = _timeit(lambda: history(True), repeats) / rows
+    for name, sec in results.items():
+        print(f"[symbols] {name:<20s} {sec * 1e9:8.0f} ns")
+    return results
+
+
+# 子进程中运行：argv = [代码目录, 系统类, 步数]；输出每步微秒数
+_STEP_SCRIPT = """
+import sys, time, warnings
+warnings.filterwarnings("ignore")
+sys.path.insert(0, sys.argv[1])
+import simulate, simulate_trigger
+cls = simulate_trigger.LiverMetabolismSystemTrigger if sys.argv[2] == "trigger" else simulate.LiverMetabolismSystem
+minutes = int(sys.argv[3])
+env = simulate.MetabolicEnvironment()
+system = cls(env)
+env.reserve_history(minutes)
+t0 = time.perf_counter()
+for tt in range(minutes):
+    if tt in (60, 300, 660):
+        env.setMetabolite("glucose", env.getMetabolite("glucose") + 30.0)
+        env.setMetabolite("amino_acid", env.getMetabolite("amino_acid") + 5.0)
+    env.setParameter("is_postprandial", 60 <= tt < 180 or 300 <= tt < 480 or 660 <= tt < 900)
+    system.step(tt / 60.0)
+print((time.perf_counter() - t0) / minutes * 1e6)
+"""
+
+
+def bench_slots_step(rev: str = "ca6cc91", minutes: int = 24 * 60, rounds: int = 4) -> Dict[str, float]:
+    # 完整 step 每步耗时：rev^（dict 状态、按名称读取）vs rev（__slots__ 槽位），另附当前树；
+    # 各树在子进程中交替运行，取最优
+    root = subprocess.run(["git", "rev-parse", "--show-toplevel"], capture_output=True, text=True, check=True).stdout.strip()
+    results: Dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        trees = {}
+        for tree, commit in (("dict", f"{rev}^"), ("slots", rev)):
+            archive = subprocess.run(["git", "-C", root, "archive", commit, "modules/code"], capture_output=True, check=True).stdout
+            os.makedirs(os.path.join(tmp, tree))
+            subprocess.run(["tar", "-x", "-C", os.path.join(tmp, tree)], input=archive, check=True)
+            trees[tree] = os.path.join(tmp, tree, "modules", "code")
+        trees["head"] = os.path.dirname(os.path.abspath(__file__))
+        for system in ("trigger", "liver"):
+            for tree in trees:
+                results[f"{system}/{tree}"] = float("inf")
+            for _ in range(rounds):
+                for tree, path in trees.items():
+                    out = subprocess.run([sys.executable, "-c", _STEP_SCRIPT, path, system, str(minutes)],
+                                         cwd=path, capture_output=True, text=True, check=True).stdout
+                    results[f"{system}/{tree}"] = min(results[f"{system}/{tree}"], float(out.split()[-1]))
+            r = {tree: results[f"{system}/{tree}"] for tree in trees}
+            print(f"[slots] {system:<8s} step: dict {r['dict']:6.1f} us -> slots {r['slots']:6.1f} us "
+                  f"({r['dict'] / r['slots']:.2f}x), current tree {r['head']:6.1f} us")
+    return results
+
+
+def bench_events(days: int = 7) -> Dict[str, float]:
+    # 7 天触发式模拟：紧凑事件日志 vs 旧格式（每步 36 个 dict）的内存占用
+    minutes = days * 24 * 60
+    env = MetabolicEnvironment()
+    system = LiverMetabolismSystemTrigger(env)
+    env.reserve_history(minutes)
+    system.events_history.reserve(minutes)
+    t0 = time.perf_counter()
+    for tt in range(minutes):
+        _meals(env, tt % (24 * 60))
+        system.step(tt / 60.0)
+    elapsed = time.perf_counter() - t0
+    log = system.events_history
+    tracemalloc.start()
+    legacy = list(log)
+    legacy_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del legacy
+    print(f"[events] {days} days ({minutes} steps, {elapsed / minutes * 1e6:.1f} us/step): "
+          f"EventLog {log.nbytes / 1024:.1f} KiB, dict list {legacy_bytes / 2**20:.1f} MiB "
+          f"({legacy_bytes / log.nbytes:.0f}x)")
+    return {"compact": log.nbytes, "legacy": legacy_bytes}
+
+
+def bench_ode(days: List[int] = None, rtol: float = 1e-4) -> Dict[str, Dict[str, float]]:
+    # 刚性 ODE 参考解 vs 定步长引擎：耗时与相对紧容差参考解（rtol=1e-7）的最大相对误差；
+    # run_ode 衡量的是精度，它在这些场景下都比定步长引擎慢，不作为加速手段
+    days = days or [1, 7]
+    columns = ["glucose", "glycogen", "insulin", "glucagon", "fatty_acid", "triglycerides", "ketone_body", "atp", "urea", "amino_acid"]
+    meals = lambda e, t: _meals(e, t % (24 * 60))
+    results: Dict[str, Dict[str, float]] = {}
+    for d in days:
+        minutes = d * 24 * 60
+        t0 = time.perf_counter()
+        env = MetabolicEnvironment()
+        system = LiverMetabolismSystem(env)
+        env.reserve_history(minutes)
+        for tt in range(minutes):
+            meals(env, tt)
+            system.step(tt / 60.0)
+        fixed = env.to_frame()
+        fixed_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        ode = run_ode(MetabolicEnvironment(), minutes, meals, rtol=rtol, atol=rtol * 1e-2)
+        ode_s = time.perf_counter() - t0
+        ref = run_ode(MetabolicEnvironment(), minutes, meals, rtol=1e-7, atol=1e-9)
+
+        def err(df) -> float:
+            return max(float(np.max(np.abs(df[c].to_numpy() - ref[c].to_numpy())) / (np.max(np.abs(ref[c].to_numpy())) + 1e-12))
+                       for c in columns)
+
+        results[f"{d}d"] = {"fixed_s": fixed_s, "ode_s": ode_s, "fixed_err": err(fixed), "ode_err": err(ode)}
+        print(f"[ode] {d} day(s): fixed {fixed_s:6.2f} s (max rel err {err(fixed):.2e}), "
+              f"BDF rtol={rtol:g} {ode_s:6.2f} s (max rel err {err(ode):.2e}, nfev {ode.attrs['nfev']}, "
+              f"njev {ode.attrs['njev']}, unit-step fallback {ode.attrs['fallback_steps']})")
+    return results
+
+
+class _LockedResourcePool(ResourcePool):
+    # 旧实现：共享 dict + 每次写入加锁（仅用于对比）
+    def __init__(self, env: MetabolicEnvironment = None):
+        super().__init__(env)
+        self.lock = threading.Lock()
+        self.outputs: Dict[str, float] = {}
+        self.signal_updates: Dict[str, float] = {}
+        self.rates: Dict[str, float] = {}
+
+    def bind(self, task) -> None:
+        pass
+
+    def write_output(self, outputs: Dict[str, float]) -> None:
+        with self.lock:
+            for k, v in outputs.items():
+                self.outputs[k] = self.outputs.get(k, 0.0) + float(v)
+
+    def set_signal(self, name: str, value: float) -> None:
+        with self.lock:
+            self.signal_updates[name] = float(max(value, 0.0))
+
+    def set_metabolite_abs(self, name: str, new_value: float) -> None:
+        i = self.symbols.metabolites.get(name)
+        delta = float(max(new_value, 0.0)) - (0.0 if i is None else self.snapshot_m[i])
+        with self.lock:
+            self.outputs[name] = self.outputs.get(name, 0.0) + delta
+
+    def record_rate(self, name: str, rate: float) -> None:
+        with self.lock:
+            self.rates[name] = float(rate)
+
+    def drain(self):
+        with self.lock:
+            out = {"metabolites": dict(self.outputs), "signals": dict(self.signal_updates), "rates": dict(self.rates)}
+            self.outputs.clear()
+            self.signal_updates.clear()
+            self.rates.clear()
+            self.release()
+            return out
+
+
+def bench_pool(threads: List[int] = None, writes: int = 20000, steps: int = 1000, repeats: int = 3) -> Dict[str, float]:
+    # 资源池写入竞争：T 个线程各写 writes 次（加锁共享 dict vs 任务私有缓冲 + 有序归约），
+    # 以及完整 step 在 serial / thread 后端下的耗时
+    threads = threads or [1, 2, 4, 8]
+    env = MetabolicEnvironment()
+    names = list(env.metabolites)[:8]
+    results: Dict[str, float] = {}
+
+    def hammer(pool_cls) -> None:
+        pool = pool_cls(env)
+
+        def work(i: int) -> None:
+            pool.bind(i)
+            for j in range(writes):
+                pool.write_output({names[j % 8]: 1e-3, names[(j + 3) % 8]: -1e-3})
+                pool.record_rate(names[j % 8], float(j))
+
+        ts = [threading.Thread(target=work, args=(i,)) for i in range(n)]
+        for t in ts:
+            t.start()
+        for t in ts:
+            t.join()
+        pool.drain()
+
+    for n in threads:
+        for label, cls in (("locked", _LockedResourcePool), ("buffered", ResourcePool)):
+            sec = _timeit(lambda: hammer(cls), repeats)
+            results[f"contention/{label}/{n}"] = sec
+            print(f"[pool] {n} threads x {writes} writes  {label:<8s} {sec * 1e3:8.1f} ms  "
+                  f"{sec / (n * writes * 2) * 1e9:6.0f} ns/write")
+
+    def run(backend: str) -> None:
+        with LiverMetabolismSystem(MetabolicEnvironment(), backend=backend) as system:
+            system.env.reserve_history(steps)
+            for tt in range(steps):
+                _meals(system.env, tt)
+                system.step(tt / 60.0)
+
+    for backend in ("serial", "thread"):
+        for label, cls in (("locked", _LockedResourcePool), ("buffered", ResourcePool)):
+            simulate.ResourcePool = cls
+            try:
+                sec = _timeit(lambda: run(backend), repeats) / steps
+            finally:
+                simulate.ResourcePool = ResourcePool
+            results[f"step/{backend}/{label}"] = sec
+            print(f"[pool] step ({backend:<6s}) {label:<8s} {sec * 1e6:8.1f} us")
+    return results
+
+
+def bench_alloc(hours: int = 24) -> Dict[str, float]:
+    # tracemalloc：逐步推进 hours 小时（历史已预分配），统计每步的瞬时分配峰值与净增长
+    steps = hours * 60
+    env = MetabolicEnvironment()
+    system = LiverMetabolismSystem(env)
+    env.reserve_history(steps)
+    system.step(0.0)
+    tracemalloc.start()
+    transient, retained = [], []
+    for tt in range(1, steps):
+        _meals(env, tt % (24 * 60))
+        cur0 = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        system.step(tt / 60.0)
+        cur1, peak = tracemalloc.get_traced_memory()
+        transient.append(peak - cur0)
+        retained.append(cur1 - cur0)
+    tracemalloc.stop()
+    results = {"transient_bytes": float(np.mean(transient)), "retained_bytes": float(np.mean(retained))}
+    print(f"[alloc] {hours} h ({steps} steps): per-step peak mean {np.mean(transient):.0f} B, "
+          f"median {np.median(transient):.0f} B, max {np.max(transient):.0f} B; retained {np.mean(retained):.1f} B/step")
+    return results
+
+
+def bench_summary(days: int = 7, repeats: int = 3) -> Dict[str, float]:
+    # 趋势摘要：逐列 analyze_trend vs 全部列一次 analyze_trends vs 逐步在线更新 TrendSummarizer（历史来自 days 天的 .mmap 结果）
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.mmap")
+        main.simulate_days(days, path)
+        names, data, time_col = sum_result._load(path)
+    series = [(pd.Series(data[:, j]), pd.Series(time_col)) for j in range(len(names))]
+
+    def online() -> None:
+        summarizer = sum_result.TrendSummarizer(names)
+        for row, t in zip(data, time_col):
+            summarizer.update(row, t)
+        summarizer.markdown()
+
+    results = {
+        "per_column": _timeit(lambda: [sum_result.analyze_trend(x, t) for x, t in series], repeats),
+        "all_columns": _timeit(lambda: sum_result.analyze_trends(data, time_col), repeats),
+        "online_per_step": _timeit(online, repeats) / len(data),
+    }
+    print(f"[summary] {days} d, {data.shape[0]} rows x {data.shape[1]} columns: per-column {results['per_column'] * 1e3:.1f} ms, "
+          f"all columns {results['all_columns'] * 1e3:.1f} ms, online {results['online_per_step'] * 1e6:.1f} us/step")
+    return results
+
+
+def bench_dashboard(hours: List[int] = None, max_frames: int = 300) -> Dict[str, Dict[str, float]]:
+    # vis.py 动画仪表盘：游标模式（曲线只写一次，帧数上限 max_frames）的构建时间与 HTML 大小
+    import contextlib
+    import io
+    import vis
+    hours = hours or [6, 24, 24 * 7]
+    env = MetabolicEnvironment()
+    system = LiverMetabolismSystem(env)
+    env.reserve_history(max(hours) * 60)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for tt in range(max(hours) * 60):
+            _meals(env, tt % (24 * 60))
+            system.step(tt / 60.0)
+            if tt + 1 in [h * 60 for h in hours]:
+                path = os.path.join(tmp, f"{tt + 1}.html")
+                t0 = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    vis.generate_interactive_dashboard(env.to_frame(), path, max_frames=max_frames)
+                results[f"{(tt + 1) // 60}h"] = {"build_s": time.perf_counter() - t0, "html_mb": os.path.getsize(path) / 1e6}
+    for name, r in results.items():
+        print(f"[dashboard] {name:>5s}: build {r['build_s']:.2f} s, html {r['html_mb']:.2f} MB")
+    return results
+
+
+def bench_plots(formats: List[str] = None, jobs: int = 1) -> Dict[str, float]:
+    # ill_cases 全部对比图（4 组 × 曲线图/速率图）的渲染时间，按输出格式分别计时
+    import ill_cases
+    import plotting
+    from scenarios import run_scenarios
+    formats = formats or [".png", ".svg", ".json"]
+    results = run_scenarios("ill_cases", jobs=1)
+    groups = {
+        "nafld": ["glucose", "fatty_acid", "triglycerides", "insulin"],
+        "dka": ["glucose", "ketone_body", "insulin", "fatty_acid"],
+        "acetaldehyde": ["ethanol", "acetaldehyde", "acetate", "nadh", "nad_plus"],
+        "hepatic_encephalopathy": ["ammonia", "urea", "amino_acid"],
+    }
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tasks = []
+        for name, cols in groups.items():
+            left, right = results[f"{name}_abnormal"][0], results[f"{name}_normal"][0]
+            tasks.append((ill_cases._plot_pair, (left, right, cols, name, name, os.path.join(tmp, f"{name}_pair.png"))))
+            tasks.append((ill_cases._plot_pair_rates, (left, right, ill_cases.RATE_COLUMNS, name, name, os.path.join(tmp, f"{name}_rates.png"))))
+        for fmt in formats:
+            t0 = time.perf_counter()
+            plotting.render(tasks, jobs=jobs, fmt=fmt)
+            timings[fmt] = time.perf_counter() - t0
+    for fmt, s in timings.items():
+        print(f"[plots] {len(tasks)} figures {fmt:>5s}: {s:.2f} s")
+    return timings
+
+
+def bench_sweep(n: int = 64, minutes: int = 6 * 60) -> Dict[str, float]:
+    # sweep.py：同一组拉丁超立方设计点分别用批量环境与逐点标量模型运行
+    import sweep
+    design = sweep.latin_hypercube(n, seed=0, liver_function=(0.3, 1.2), aldh_activity=(0.1, 1.5),
+                                   insulin_degrading_enzyme_activity=(0.05, 3.0), xenobiotic_load=(0.0, 2.0))
+    metrics = {"peak_glucose": sweep.peak("glucose"), "auc_ketone_body": sweep.auc("ketone_body"),
+               "hours_ammonia_high": sweep.time_above("ammonia", 0.05)}
+    results = {}
+    for mode in ["batch", "process"]:
+        t0 = time.perf_counter()
+        sweep.run_sweep(design, metrics, minutes, mode=mode)
+        results[mode] = time.perf_counter() - t0
+        print(f"[sweep] {n} points x {minutes} min, {mode:>7s}: {results[mode]:.2f} s")
+    return results
+
+
+def bench_adaptive(days: List[int] = None, rtol: float = 1e-2) -> Dict[str, Dict[str, float]]:
+    # 自适应步长 vs 定步长引擎：增量求值次数、耗时，以及自适应结果相对定步长引擎的最大相对误差
+    days = days or [1, 7]
+    columns = ["glucose", "glycogen", "insulin", "glucagon", "fatty_acid", "triglycerides", "ketone_body", "atp", "urea", "amino_acid"]
+    meals = lambda e, t: _meals(e, t % (24 * 60))
+    results: Dict[str, Dict[str, float]] = {}
+    for d in days:
+        minutes = d * 24 * 60
+        t0 = time.perf_counter()
+        env = MetabolicEnvironment()
+        system = LiverMetabolismSystem(env)
+        env.reserve_history(minutes)
+        for tt in range(minutes):
+            meals(env, tt)
+            system.step(tt / 60.0)
+        fixed = env.to_frame()
+        fixed_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        adaptive = run_adaptive(MetabolicEnvironment(), minutes, meals, rtol=rtol)
+        adaptive_s = time.perf_counter() - t0
+        err = max(float(np.max(np.abs(adaptive[c].to_numpy() - fixed[c].to_numpy())) / (np.max(np.abs(fixed[c].to_numpy())) + 1e-12))
+                  for c in columns)
+        results[f"{d}d"] = {"fixed_s": fixed_s, "adaptive_s": adaptive_s, "err": err,
+                            "nfev": adaptive.attrs["nfev"], "steps": adaptive.attrs["steps"]}
+        print(f"[adaptive] {d} day(s): fixed {minutes} steps {fixed_s:6.2f} s, "
+              f"rtol={rtol:g} {adaptive.attrs['steps']} steps / {adaptive.attrs['nfev']} evals {adaptive_s:6.2f} s "
+              f"(max rel err {err:.2e}, rejected {adaptive.attrs['rejected']})")
+    return results
+
+
+BENCHMARKS = {
+    "backends": bench_backends,
+    "cohort": bench_cohort,
+    "trigger": bench_trigger,
+    "symbols": bench_symbols,
+    "slots": bench_slots_step,
+    "events": bench_events,
+    "ode": bench_ode,
+    "pool": bench_pool,
+    "alloc": bench_alloc,
+    "summary": bench_summary,
+    "dashboard": bench_dashboard,
+    "plots": bench_plots,
+    "sweep": bench_sweep,
+    "adaptive": bench_adaptive,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="模拟引擎性能基准")
+    parser.add_argument("names", nargs="*", default=list(BENCHMARKS), help=f"要运行的基准: {', '.join(BENCHMARKS)}")
+    args = parser.parse_args()
+    for name in args.names:
+        BENCHMARKS[name]()
@@ -0,0 +1,237 @@
+import hashlib
+import importlib
+import json
+import os
+import random
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from history import HistoryRecorder
+from schedule import Schedule, as_inject
+from simulate import LiverMetabolismSystem
+
+# 模型方程或默认初值有改动时递增：旧的预热缓存随之失效
+MODEL_VERSION = 1
+
+# 不属于“状态”的属性：历史记录单独存储
+_HISTORY_ATTRS = ("recorder", "history")
+
+# __slots__ 环境（MetabolicEnvironment）的状态：槽位列表的 dict 视图与本步速率
+_SLOT_STATE = ("metabolites", "signals", "parameters", "current_rates")
+
+
+def _state_dicts(env: Any) -> Dict[str, Mapping[str, Any]]:
+    # 环境中的 dict 属性即全部状态（metabolites / signals / parameters / current_rates / kinetic_parameters ...）
+    if not hasattr(env, "__dict__"):
+        return {k: getattr(env, k) for k in _SLOT_STATE}
+    return {k: v for k, v in vars(env).items() if isinstance(v, dict) and k not in _HISTORY_ATTRS}
+
+
+def _is_float(v: Any) -> bool:
+    return type(v) is float or isinstance(v, np.floating)
+
+
+def _class_name(obj: Any) -> str:
+    cls = obj if isinstance(obj, type) else type(obj)
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def state_hash(env: Any) -> str:
+    """环境状态（不含历史）的 sha256。"""
+    text = json.dumps([_class_name(env), {k: dict(v) for k, v in _state_dicts(env).items()}], sort_keys=True, default=repr)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _stable(value: Any) -> Any:
+    # 可稳定复现的描述：闭包捕获值 / 默认参数须是数字、字符串、容器、数组、Schedule 或函数
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return ["ndarray", str(value.dtype), list(value.shape), hashlib.sha256(value.tobytes()).hexdigest()]
+    if isinstance(value, (list, tuple)):
+        return [_stable(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_stable(v) for v in value), key=repr)
+    if isinstance(value, Mapping):
+        return sorted(([_stable(k), _stable(v)] for k, v in value.items()), key=repr)
+    if isinstance(value, Schedule):
+        return repr(value)
+    if isinstance(value, type(_stable.__code__)):
+        return [value.co_code.hex(), _stable(value.co_consts), list(value.co_names)]
+    if callable(value) and hasattr(value, "__code__"):
+        return _callable_id(value)
+    raise TypeError(f"cannot derive a stable warm-up key from {type(value).__name__}; pass key= explicitly")
+
+
+def _callable_id(fn: Optional[Callable]) -> str:
+    """注入函数的标识：代码、闭包捕获的值与默认参数（捕获值不同的闭包得到不同的键）。"""
+    if fn is None:
+        return "none"
+    if isinstance(fn, Schedule):
+        return repr(fn)
+    code = getattr(fn, "__code__", None)
+    if code is None:
+        raise TypeError(f"cannot derive a stable warm-up key from {type(fn).__name__}; pass key= explicitly")
+    cells = [c.cell_contents for c in fn.__closure__ or ()]
+    body = json.dumps([_stable(code), _stable(cells), _stable(fn.__defaults__), _stable(fn.__kwdefaults__)])
+    return f"{getattr(fn, '__module__', '')}.{getattr(fn, '__qualname__', '')}:{hashlib.sha256(body.encode()).hexdigest()[:16]}"
+
+
+def save_checkpoint(path: str, env: Any, step: int, rng: np.random.Generator = None,
+                    history: bool = True, steps_per_hour: float = 60.0, meta: Dict[str, Any] = None) -> str:
+    """把环境完整状态写入 path（npz 二进制 + JSON 头）。
+
+    浮点字典存为 float64 数组，其余（布尔参数、嵌套字典）放在 JSON 头中；同时保存当前步数/时间、
+    numpy 全局与 random 模块的 RNG 状态，以及传入的 Generator 状态。先写临时文件再原子替换。
+    """
+    arrays: Dict[str, np.ndarray] = {}
+    header: Dict[str, Any] = {
+        "model_version": MODEL_VERSION,
+        "env_class": _class_name(env),
+        "step": int(step),
+        "time": step / steps_per_hour,
+        "steps_per_hour": steps_per_hour,
+        "state": {},
+        "json": {},
+        "meta": meta or {},
+    }
+    for name, d in _state_dicts(env).items():
+        if all(_is_float(v) for v in d.values()):
+            header["state"][name] = list(d)
+            arrays[f"state.{name}"] = np.array(list(d.values()), dtype=np.float64)
+        else:
+            header["json"][name] = dict(d)
+
+    if history and getattr(env, "recorder", None) is not None:
+        header["history"] = {"kind": "recorder", "columns": list(env.recorder.columns)}
+        arrays["history"] = env.recorder.to_numpy()
+    elif history and isinstance(getattr(env, "history", None), list) and env.history:
+        df = pd.DataFrame(env.history)
+        header["history"] = {"kind": "records", "columns": list(df.columns),
+                             "bool": [c for c in df.columns if df[c].dtype == bool]}
+        arrays["history"] = df.to_numpy(dtype=np.float64, na_value=np.nan)
+
+    _, keys, pos, has_gauss, cached = np.random.get_state()
+    arrays["rng.numpy"] = keys
+    py_version, py_state, py_gauss = random.getstate()
+    arrays["rng.python"] = np.array(py_state, dtype=np.uint64)
+    header["rng"] = {"numpy": [int(pos), int(has_gauss), float(cached)], "python": [py_version, py_gauss],
+                     "generator": rng.bit_generator.state if rng is not None else None}
+
+    arrays["header"] = np.frombuffer(json.dumps(header).encode(), dtype=np.uint8)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp, path)
+    return path
+
+
+def load_checkpoint(path: str, env: Any = None, rng: np.random.Generator = None,
+                    history: bool = True) -> Tuple[Any, Dict[str, Any]]:
+    """从 path 恢复状态，返回 (env, header)；header["step"] / header["time"] 为检查点所在时刻。
+
+    env 为 None 时按检查点记录的类新建环境。history=False 时丢弃已有历史（用于从预热分叉新场景）。
+    RNG 状态总是恢复到 numpy / random 全局；传入 rng 时同时恢复其 bit generator。
+    """
+    with np.load(path) as data:
+        header = json.loads(data["header"].tobytes().decode())
+        arrays = {k: data[k] for k in data.files if k != "header"}
+    if header["model_version"] != MODEL_VERSION:
+        raise ValueError(f"checkpoint {path} was written by model version {header['model_version']}, current is {MODEL_VERSION}")
+    if env is None:
+        module, _, name = header["env_class"].rpartition(".")
+        env = getattr(importlib.import_module(module), name)()
+    elif _class_name(env) != header["env_class"]:
+        raise TypeError(f"checkpoint {path} holds {header['env_class']}, got {_class_name(env)}")
+
+    for name, keys in header["state"].items():
+        d = getattr(env, name)
+        # 普通 dict 先清空；槽位视图的名称固定，按名称覆盖即可
+        if isinstance(d, dict):
+            d.clear()
+        d.update(zip(keys, arrays[f"state.{name}"].tolist()))
+    for name, d in header["json"].items():
+        setattr(env, name, d)
+
+    saved = header.get("history")
+    if getattr(env, "recorder", None) is not None:
+        if history and saved:
+            env.recorder = HistoryRecorder.from_array(saved["columns"], arrays["history"])
+        else:
+            env.recorder = HistoryRecorder()
+    elif isinstance(getattr(env, "history", None), list):
+        env.history = []
+        if history and saved:
+            df = pd.DataFrame(arrays["history"], columns=saved["columns"])
+            for c in saved["bool"]:
+                df[c] = df[c].astype(bool)
+            env.history = df.to_dict("records")
+
+    pos, has_gauss, cached = header["rng"]["numpy"]
+    np.random.set_state(("MT19937", arrays["rng.numpy"], pos, has_gauss, cached))
+    py_version, py_gauss = header["rng"]["python"]
+    random.setstate((py_version, tuple(int(x) for x in arrays["rng.python"]), py_gauss))
+    if rng is not None and header["rng"]["generator"] is not None:
+        rng.bit_generator.state = header["rng"]["generator"]
+    return env, header
+
+
+def run_resumable(env: Any, minutes: int, path: str, inject: Callable[[Any, int], None] = None,
+                  every: int = 360, make_system: Callable[[Any], Any] = LiverMetabolismSystem,
+                  rng: np.random.Generator = None) -> Any:
+    """运行 minutes 步，每 every 步写一次检查点；path 已存在时从其中的步数继续。
+
+    适用于 LiverMetabolismSystem / RuleBasedLiverSystem（step(小时)）及同接口的系统；
+    inject(env, tt) 收到的是绝对步数。
+    """
+    start = 0
+    if os.path.exists(path):
+        env, header = load_checkpoint(path, env, rng)
+        start = header["step"]
+    system = make_system(env)
+    if hasattr(env, "reserve_history"):
+        env.reserve_history(minutes)
+    for tt in range(start, minutes):
+        if inject:
+            inject(env, tt)
+        system.step(tt / 60.0)
+        if every and (tt + 1) % every == 0 and tt + 1 < minutes:
+            save_checkpoint(path, env, tt + 1, rng)
+    save_checkpoint(path, env, minutes, rng)
+    return env
+
+
+def warmup_key(env: Any, minutes: int, inject: Union[Schedule, Callable[[Any, int], None]] = None,
+               make_system: Callable[[Any], Any] = LiverMetabolismSystem, key: str = None) -> str:
+    """预热缓存键：模型版本 + 初始状态哈希 + 预热步数 + 注入计划/函数与系统类的标识。
+
+    注入函数按代码、闭包捕获值与默认参数区分；捕获了无法稳定描述的对象时抛出 TypeError，
+    此时改传 Schedule 或显式的 key（替代注入函数部分）。
+    """
+    inject_id = f"key:{key}" if key is not None else _callable_id(inject)
+    parts = [str(MODEL_VERSION), state_hash(env), str(minutes), inject_id, _class_name(make_system)]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:20]
+
+
+def warm_start(env: Any, minutes: int, inject: Union[Schedule, Callable[[Any, int], None]] = None,
+               cache_dir: str = "../checkpoints", make_system: Callable[[Any], Any] = LiverMetabolismSystem,
+               key: str = None) -> str:
+    """返回从 env 出发预热 minutes 步后的检查点路径；命中缓存时不重复计算。
+
+    未命中时 env 会被原地推进。检查点不含预热期历史，供多个场景 load_checkpoint(path, history=False) 后分叉运行。
+    """
+    path = os.path.join(cache_dir, f"warmup-{warmup_key(env, minutes, inject, make_system, key)}.npz")
+    if os.path.exists(path):
+        return path
+    inject = as_inject(inject, env, minutes)
+    system = make_system(env)
+    for tt in range(minutes):
+        if inject:
+            inject(env, tt)
+        system.step(tt / 60.0)
+    return save_checkpoint(path, env, minutes, history=False, meta={"warmup_minutes": minutes})
@@ -1,77 +1,61 @@
 import os
 import pandas as pd
+import plotting
 import matplotlib.pyplot as plt
-from typing import Callable, Dict, List
+from typing import Callable, Dict, List, Union
+from schedule import Schedule, as_inject
 from simulate import MetabolicEnvironment, LiverMetabolismSystem
 
 
-def _run(env: MetabolicEnvironment, minutes: int, inject: Callable[[MetabolicEnvironment, int], None] = None) -> pd.DataFrame:
+def _run(env: MetabolicEnvironment, minutes: int, inject: Union[Schedule, Callable[[MetabolicEnvironment, int], None]] = None) -> pd.DataFrame:
     sys = LiverMetabolismSystem(env)
+    inject = as_inject(inject, env, minutes)
+    env.reserve_history(minutes)
     for t in range(minutes):
         hour = t / 60.0
         if inject:
             inject(env, t)
         sys.step(hour)
-    df = pd.DataFrame(env.history)
+    df = env.to_frame()
     df["time"] = df["time"]
     return df
 
 
-def _plot(df: pd.DataFrame, columns: List[str], title: str, outfile: str) -> None:
-    try:
-        plt.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans', 'Arial']
-    except:
-        pass
-    plt.rcParams['axes.unicode_minus'] = False
-    plt.figure(figsize=(12, 7))
+def _plot(df: pd.DataFrame, columns: List[str], title: str, outfile: str) -> str:
+    fig, ax = plotting.figure(1, 1, figsize=(12, 7))
     available = [c for c in columns if c in df.columns]
     cmap = plt.get_cmap("tab20")
     for i, col in enumerate(available):
         val = df[col]
         m = val.max() if val.max() != 0 else 1.0
-        plt.plot(df["time"], val / m, label=col, linewidth=2, color=cmap(i % cmap.N))
-    plt.xlabel("时间 (小时)")
-    plt.ylabel("归一化浓度/水平")
-    plt.title(title)
+        plotting.line(ax, df["time"], val / m, label=col, linewidth=2, color=cmap(i % cmap.N))
+    ax.set_xlabel("时间 (小时)")
+    ax.set_ylabel("归一化浓度/水平")
+    ax.set_title(title)
     if len(available) > 0:
-        plt.legend(loc="best", fontsize=9, ncol=2)
-    outdir = os.path.dirname(outfile) or "."
-    os.makedirs(outdir, exist_ok=True)
-    plt.tight_layout()
-    plt.savefig(outfile, bbox_inches="tight")
-    plt.close()
-
-
-def _plot_no_scale(df: pd.DataFrame, columns: List[str], title: str, outfile: str) -> None:
-    try:
-        plt.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans', 'Arial']
-    except:
-        pass
-    plt.rcParams['axes.unicode_minus'] = False
-    
-    plt.figure(figsize=(12, 7))
+        ax.legend(loc="best", fontsize=9, ncol=2)
+    return plotting.save(fig, outfile)
+
+
+def _plot_no_scale(df: pd.DataFrame, columns: List[str], title: str, outfile: str) -> str:
+    fig, ax = plotting.figure(1, 1, figsize=(12, 7))
     available = [c for c in columns if c in df.columns]
     cmap = plt.get_cmap("tab20")
     
     for i, col in enumerate(available):
         val = df[col]
         # 去除归一化逻辑，直接绘制原始数值 val
-        plt.plot(df["time"], val, label=col, linewidth=2, color=cmap(i % cmap.N))
+        plotting.line(ax, df["time"], val, label=col, linewidth=2, color=cmap(i % cmap.N))
         
-    plt.xlabel("时间 (小时)")
+    ax.set_xlabel("时间 (小时)")
     # 修改 Y 轴标签，去掉“归一化”字样
-    plt.ylabel("浓度/水平")
-    plt.title(title)
+    ax.set_ylabel("浓度/水平")
+    ax.set_title(title)
     
     if len(available) > 0:
-        plt.legend(loc="best", fontsize=9, ncol=2)
+        ax.legend(loc="best", fontsize=9, ncol=2)
         
-    outdir = os.path.dirname(outfile) or "."
-    os.makedirs(outdir, exist_ok=True)
-    
-    plt.tight_layout()
-    plt.savefig(outfile, bbox_inches="tight")
-    plt.close()
+    return plotting.save(fig, outfile)
 
 
 def test_insulin_degradation_detailed() -> Dict[str, float]:
@@ -428,6 +412,7 @@ def run_all_detailed_tests() -> Dict[str, Dict[str, float]]:
 
 def summarize_and_plot_detailed() -> str:
     results = run_all_detailed_tests()
+    plotting.close()
     summary = ["=== 详细测试需求验证结果 ==="]
     total = 0
     passed = 0
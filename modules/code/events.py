@@ -0,0 +1,113 @@
+import os
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class EventLog(Sequence):
+    """触发事件日志：(steps × reactions) 布尔矩阵按行位打包存储，外加每步时间。
+
+    作为 Sequence 使用时，第 i 项按需还原为旧格式
+    {"time": t, "events": [{"name", "status", "detail"}, ...]}。
+    """
+
+    TRIGGERED = "triggered"
+    STOPPED = "stopped"
+
+    def __init__(self, names: Iterable[str], capacity: int = 0):
+        self.names: List[str] = list(names)
+        self.index: Dict[str, int] = {n: i for i, n in enumerate(self.names)}
+        capacity = max(int(capacity), 0)
+        self._bits = np.zeros((capacity, (len(self.names) + 7) // 8), dtype=np.uint8)
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def reserve(self, steps: int) -> None:
+        if steps > self._bits.shape[0]:
+            self._resize(steps)
+
+    def _resize(self, rows: int) -> None:
+        bits = np.zeros((rows, self._bits.shape[1]), dtype=np.uint8)
+        times = np.zeros(rows, dtype=np.float64)
+        bits[:self._len] = self._bits[:self._len]
+        times[:self._len] = self._times[:self._len]
+        self._bits, self._times = bits, times
+
+    def append(self, t: float, triggered: Iterable[bool]) -> None:
+        if self._len >= self._bits.shape[0]:
+            self._resize(max(2 * self._bits.shape[0], 64))
+        self._bits[self._len] = np.packbits(np.fromiter(triggered, dtype=bool, count=len(self.names)))
+        self._times[self._len] = t
+        self._len += 1
+
+    @property
+    def times(self) -> np.ndarray:
+        return self._times[:self._len]
+
+    @property
+    def nbytes(self) -> int:
+        return self._bits[:self._len].nbytes + self.times.nbytes
+
+    def matrix(self) -> np.ndarray:
+        """(steps, reactions) 布尔矩阵。"""
+        return np.unpackbits(self._bits[:self._len], axis=1, count=len(self.names)).astype(bool)
+
+    def column(self, name: str) -> np.ndarray:
+        i = self.index[name]
+        return (self._bits[:self._len, i // 8] >> (7 - i % 8)) & 1 == 1
+
+    def switches(self, name: str) -> List[Tuple[float, str]]:
+        """反应 name 的状态变化点 [(time, status)]，首步记为初始状态。"""
+        on = self.column(name)
+        if len(on) == 0:
+            return []
+        idx = np.flatnonzero(np.r_[True, on[1:] != on[:-1]])
+        return [(float(self._times[i]), self.TRIGGERED if on[i] else self.STOPPED) for i in idx]
+
+    def intervals(self, name: str) -> List[Tuple[float, Optional[float]]]:
+        """反应 name 的触发区间 [(开始时间, 结束时间)]；结束时间为首个 stopped 步，至末尾仍触发则为 None。"""
+        on = np.r_[False, self.column(name), False].astype(np.int8)
+        edges = np.diff(on)
+        starts = np.flatnonzero(edges == 1)
+        stops = np.flatnonzero(edges == -1)
+        times = self.times
+        return [(float(times[a]), float(times[b]) if b < len(times) else None) for a, b in zip(starts, stops)]
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """所有反应的状态变化 [{"time", "name", "status"}]，按 (步, 反应) 顺序，与逐步扫描结果一致。"""
+        m = self.matrix()
+        if len(m) == 0:
+            return []
+        changed = np.vstack([np.ones((1, m.shape[1]), dtype=bool), m[1:] != m[:-1]])
+        rows, cols = np.nonzero(changed)
+        times = self.times
+        return [
+            {"time": float(times[r]), "name": self.names[c], "status": self.TRIGGERED if m[r, c] else self.STOPPED}
+            for r, c in zip(rows.tolist(), cols.tolist())
+        ]
+
+    def to_csv(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        pd.DataFrame(self.summary(), columns=["time", "name", "status"]).to_csv(path, index=False)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("event index out of range")
+        row = np.unpackbits(self._bits[i], count=len(self.names)).tolist()
+        return {
+            "time": float(self._times[i]),
+            "events": [
+                {"name": name, "status": self.TRIGGERED if on else self.STOPPED, "detail": {}}
+                for name, on in zip(self.names, row)
+            ],
+        }
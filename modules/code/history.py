@@ -0,0 +1,459 @@
+import json
+import os
+from abc import ABC, abstractmethod
+import numpy as np
+import pandas as pd
+from collections.abc import Sequence
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+
+class HistorySink(ABC):
+    """历史记录的流式输出：recorder 每攒满一个行组调用一次 write(列名, 行块)，结束时 close()。
+
+    子类必须实现 write，否则实例化时即报 TypeError。
+    """
+
+    @abstractmethod
+    def write(self, columns: List[str], block: np.ndarray) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("Parquet/Arrow history sinks require pyarrow (pip install pyarrow); use a .csv path otherwise") from e
+    return pyarrow
+
+
+class ParquetSink(HistorySink):
+    """每个行组写成 Parquet 文件中的一个 row group。"""
+
+    def __init__(self, path: str, compression: str = "zstd"):
+        self.path = path
+        self.compression = compression
+        self._writer = None
+
+    def write(self, columns: List[str], block: np.ndarray) -> None:
+        pa = _pyarrow()
+        import pyarrow.parquet as pq
+        table = pa.Table.from_arrays([pa.array(block[:, j]) for j in range(len(columns))], names=columns)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema, compression=self.compression)
+        self._writer.write_table(table, row_group_size=len(block))
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class ArrowSink(HistorySink):
+    """Arrow IPC 文件（即 Feather v2），每个行组一个 record batch，可内存映射读取。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._writer = None
+
+    def write(self, columns: List[str], block: np.ndarray) -> None:
+        pa = _pyarrow()
+        batch = pa.RecordBatch.from_arrays([pa.array(block[:, j]) for j in range(len(columns))], names=columns)
+        if self._writer is None:
+            self._file = pa.OSFile(self.path, "wb")
+            self._writer = pa.ipc.new_file(self._file, batch.schema)
+        self._writer.write_batch(batch)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._file.close()
+            self._writer = self._file = None
+
+
+class CsvSink(HistorySink):
+    """逐块追加的 CSV（无额外依赖；格式与 DataFrame.to_csv(index=False) 相同）。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._header = True
+
+    def write(self, columns: List[str], block: np.ndarray) -> None:
+        pd.DataFrame(block, columns=columns, copy=False).to_csv(self.path, mode="w" if self._header else "a", header=self._header,
+                                                                index=False, chunksize=256)
+        self._header = False
+
+
+def write_memmap_header(path: str, columns: List[str], dtype, shape: Tuple[int, ...], **meta: Any) -> None:
+    """写 <path>.json 头：列名、dtype、形状（首维为已写入的行数）及 dt / start 等附加信息。"""
+    header = {"columns": list(columns), "dtype": np.dtype(dtype).str, "shape": [int(n) for n in shape], **meta}
+    tmp = path + ".json.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(header, f)
+    os.replace(tmp, path + ".json")
+
+
+def open_memmap(path: str, mode: str = "r") -> Tuple[np.memmap, Dict[str, Any]]:
+    """按 JSON 头映射原始数据文件，返回 (数组, 头)；数组形状为 (行, 列) 或批量的 (行, 个体, 列)。"""
+    with open(path + ".json", encoding="utf-8") as f:
+        header = json.load(f)
+    shape = tuple(header["shape"])
+    if shape[0] == 0:
+        return np.empty(shape, dtype=header["dtype"]), header
+    return np.memmap(path, dtype=header["dtype"], mode=mode, shape=shape), header
+
+
+class MemmapSink(HistorySink):
+    """行主序的原始数组文件 + JSON 头（<path>.json），读取时 np.memmap 零拷贝打开。
+
+    dtype=np.float32 时文件大小减半（写出时转换，模拟本身仍用 float64）；
+    dt / start 记入头中（每行的时间步长与起始时间）。每个行组写出后更新头，未 close 的文件也可读取。
+    """
+
+    def __init__(self, path: str, dtype=np.float64, dt: float = None, start: float = None):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.meta = {"dt": dt, "start": start}
+        self.rows = 0
+        self._file = None
+
+    def write(self, columns: List[str], block: np.ndarray) -> None:
+        if self._file is None:
+            self._file = open(self.path, "wb")
+        self._file.write(np.ascontiguousarray(block, dtype=self.dtype).tobytes())
+        self._file.flush()
+        self.rows += len(block)
+        write_memmap_header(self.path, columns, self.dtype, (self.rows, len(columns)), **self.meta)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+_SINKS = {".parquet": ParquetSink, ".arrow": ArrowSink, ".feather": ArrowSink, ".ipc": ArrowSink, ".csv": CsvSink,
+          ".mmap": MemmapSink}
+
+
+def open_sink(path: str, **options: Any) -> HistorySink:
+    """按扩展名（.parquet / .arrow / .feather / .ipc / .csv / .mmap）创建 sink，options 传给 sink 构造函数。"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in _SINKS:
+        raise ValueError(f"Unknown history format {ext!r} (expected one of {sorted(_SINKS)})")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return _SINKS[ext](path, **options)
+
+
+def read_history(path: str, columns: Iterable[str] = None) -> pd.DataFrame:
+    """读取 sink 写出的历史文件，columns 给定时只加载这些列。"""
+    columns = None if columns is None else list(columns)
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        return pd.read_parquet(path, columns=columns)
+    if ext in (".arrow", ".feather", ".ipc"):
+        # 内存映射：只有被选中的列会真正读入
+        pa = _pyarrow()
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        return (table if columns is None else table.select(columns)).to_pandas()
+    if ext == ".csv":
+        df = pd.read_csv(path, usecols=columns, float_precision="round_trip")
+        return df if columns is None else df[columns]
+    if ext == ".mmap":
+        return load_results(path, columns)
+    raise ValueError(f"Unknown history format {ext!r} (expected one of {sorted(_SINKS)})")
+
+
+def history_columns(path: str) -> List[str]:
+    """历史文件的列名（不读取数据）。"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        _pyarrow()
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(path).names)
+    if ext in (".arrow", ".feather", ".ipc"):
+        pa = _pyarrow()
+        return list(pa.ipc.open_file(pa.memory_map(path)).schema.names)
+    if ext == ".mmap":
+        with open(path + ".json", encoding="utf-8") as f:
+            return list(json.load(f)["columns"])
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def load_results(path: str, columns: Iterable[str] = None, patient: int = None) -> pd.DataFrame:
+    """打开模拟结果为 DataFrame。.mmap 文件零拷贝（各列直接引用映射内存，只读），其余格式同 read_history。
+
+    批量（个体维）文件需给出 patient。
+    """
+    if os.path.splitext(path)[1].lower() != ".mmap":
+        return read_history(path, columns)
+    data, header = open_memmap(path)
+    if data.ndim == 3:
+        if patient is None:
+            raise ValueError(f"{path} holds a cohort of {data.shape[1]} histories; pass patient=")
+        data = data[:, patient, :]
+    names = header["columns"]
+    if columns is None:
+        return pd.DataFrame(data, columns=names, copy=False)
+    index = {c: j for j, c in enumerate(names)}
+    return pd.DataFrame({c: data[:, index[c]] for c in columns}, copy=False)
+
+
+def as_frame(history: Any) -> pd.DataFrame:
+    """绘图 / 汇总入口的统一转换：结果文件路径、DataFrame、LazyHistory 或 dict 记录序列。"""
+    if isinstance(history, (str, os.PathLike)):
+        return load_results(os.fspath(history))
+    if isinstance(history, pd.DataFrame):
+        # 浅拷贝：调用方添加派生列时不影响传入的 DataFrame
+        return pd.DataFrame(history)
+    if isinstance(history, LazyHistory):
+        return history.to_frame()
+    return pd.DataFrame(history)
+
+
+class LazyHistory:
+    """历史文件的按列惰性视图：df["glucose"] 时才读入该列（已读的列缓存）。
+
+    支持绘图代码常用的 df.columns / c in df.columns / df[col] / df[[...]]，可代替 DataFrame 传入；
+    pickle 时只携带路径。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.columns = pd.Index(history_columns(path))
+        self._cache: Dict[str, pd.Series] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"path": self.path}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["path"])
+
+    def __len__(self) -> int:
+        return len(self[self.columns[0]]) if len(self.columns) else 0
+
+    def __getitem__(self, key: Union[str, List[str]]):
+        if isinstance(key, str):
+            if key not in self._cache:
+                if key not in self.columns:
+                    raise KeyError(key)
+                self._cache[key] = read_history(self.path, [key])[key]
+            return self._cache[key]
+        missing = [c for c in key if c not in self._cache]
+        if missing:
+            self._cache.update(read_history(self.path, missing).items())
+        return pd.DataFrame({c: self._cache[c] for c in key})
+
+    def to_frame(self, columns: Iterable[str] = None) -> pd.DataFrame:
+        return read_history(self.path, columns)
+
+
+class HistoryRecorder:
+    """列式历史记录器：每个状态变量占固定列，行缓冲区预分配并按倍数扩容。
+
+    缺失值（例如某一步未触发的反应速率）记为 NaN，列顺序与
+    pd.DataFrame(list_of_dicts) 相同（按首次出现的顺序）。
+    """
+
+    def __init__(self, capacity: int = 0, dtype=np.float64):
+        self.dtype = np.dtype(dtype)
+        self.columns: List[str] = []
+        self.index: Dict[str, int] = {}
+        self._data = np.full((max(int(capacity), 0), 16), np.nan, dtype=self.dtype)
+        self._len = 0
+        self._layouts: Dict[Tuple[int, str, Tuple[str, ...]], np.ndarray] = {}
+        # 流式输出（stream() 之后）：已写出的行数、写出的列号与列名
+        self._sink: Optional[HistorySink] = None
+        self._keep: Optional[Callable[[str], bool]] = None
+        self._schema: Optional[Tuple[np.ndarray, List[str], int]] = None
+        self.flushed = 0
+        self._observers: List[Callable[["HistoryRecorder", int], None]] = []
+
+    @classmethod
+    def from_array(cls, columns: List[str], data: np.ndarray, capacity: int = 0) -> "HistoryRecorder":
+        """由列名与 (行, 列) 数组重建记录器（用于检查点恢复）。"""
+        rec = cls(max(capacity, len(data)), dtype=data.dtype)
+        for name in columns:
+            rec._column(name)
+        rec._data[:len(data), :len(columns)] = data
+        rec._len = len(data)
+        return rec
+
+    def __len__(self) -> int:
+        return self._len
+
+    @property
+    def capacity(self) -> int:
+        return self._data.shape[0]
+
+    def reserve(self, steps: int) -> None:
+        # 预分配到至少可容纳 steps 行（流式输出时缓冲区固定为一个行组）
+        if self._sink is None and steps > self._data.shape[0]:
+            self._resize(steps, self._data.shape[1])
+
+    def declare(self, columns: Iterable[str]) -> None:
+        """预先登记列（流式输出的 schema 在第一个行组写出时固定）。"""
+        for name in columns:
+            self._column(name)
+
+    def stream(self, sink: HistorySink, row_group: int = 4096, columns: Union[Iterable[str], Callable[[str], bool]] = None) -> None:
+        """此后每满 row_group 行就把缓冲区写入 sink 并清空，内存占用与运行长度无关。
+
+        columns 为要写出的列名（或 列名 -> bool 的判断函数），None 为全部；例如
+        columns=lambda c: not c.startswith("rate_") 在写出时丢弃全部速率列。
+        第一个行组写出后出现的新列无法写入，需事先 declare()。已在缓冲区中的行随第一个行组写出；
+        此后 to_frame() / row() 只包含尚未写出的行，完整结果用 read_history() / LazyHistory 读取。
+        """
+        if columns is None or callable(columns):
+            self._keep = columns
+        else:
+            wanted = set(columns)
+            self._keep = wanted.__contains__
+        self._sink = sink
+        self._schema = None
+        self._resize(max(int(row_group), self._len, 1), self._data.shape[1])
+
+    def flush(self) -> None:
+        """把缓冲区中的行写入 sink（未调用 stream() 时无操作）。"""
+        if self._sink is None or self._len == 0:
+            return
+        if self._schema is None:
+            names = [c for c in self.columns if self._keep is None or self._keep(c)]
+            self._schema = (np.array([self.index[c] for c in names], dtype=np.intp), names, len(self.columns))
+        idx, names, ncols = self._schema
+        if len(self.columns) != ncols:
+            extra = [c for c in self.columns[ncols:] if self._keep is None or self._keep(c)]
+            if extra:
+                raise ValueError(f"history columns {extra} appeared after streaming started; declare() them up front")
+            self._schema = (idx, names, len(self.columns))
+        self._sink.write(names, self._data[:self._len, idx])
+        self._data[:self._len] = np.nan
+        self.flushed += self._len
+        self._len = 0
+
+    def close(self) -> None:
+        """写出剩余行并关闭 sink。"""
+        if self._sink is not None:
+            self.flush()
+            self._sink.close()
+            self._sink = None
+
+    def add_observer(self, fn: Callable[["HistoryRecorder", int], None]) -> None:
+        """每追加一行后调用 fn(recorder, 行号)；此时该行仍在缓冲区中（流式输出时也可用 row_array 读取）。"""
+        self._observers.append(fn)
+
+    def remove_observer(self, fn: Callable[["HistoryRecorder", int], None]) -> None:
+        self._observers.remove(fn)
+
+    def _notify(self, row: int) -> None:
+        for fn in self._observers:
+            fn(self, row)
+
+    def _resize(self, rows: int, cols: int) -> None:
+        data = np.full((rows, cols), np.nan, dtype=self.dtype)
+        old_rows, old_cols = self._data.shape
+        data[:min(old_rows, rows), :min(old_cols, cols)] = self._data[:rows, :cols]
+        self._data = data
+
+    def _column(self, name: str) -> int:
+        i = self.index.get(name)
+        if i is None:
+            i = len(self.columns)
+            self.columns.append(name)
+            self.index[name] = i
+            if i >= self._data.shape[1]:
+                self._resize(self._data.shape[0], 2 * self._data.shape[1])
+        return i
+
+    def _next_row(self) -> int:
+        if self._len >= self._data.shape[0]:
+            if self._sink is not None:
+                self.flush()
+            else:
+                self._resize(max(2 * self._data.shape[0], 64), self._data.shape[1])
+        return self._len
+
+    def layout(self, names: Iterable[str], prefix: str = "") -> np.ndarray:
+        """按顺序登记列（已有的列沿用原位置），返回列号数组，供 append_values 使用。"""
+        return np.array([self._column(prefix + k) for k in names], dtype=np.intp)
+
+    def _write_parts(self, row: int, parts: Iterable[Tuple[str, Mapping[str, Any]]]) -> None:
+        for pos, (prefix, values) in enumerate(parts):
+            keys = tuple(values)
+            idx = self._layouts.get((pos, prefix, keys))
+            if idx is None:
+                idx = self._layouts[(pos, prefix, keys)] = self.layout(keys, prefix)
+            if len(idx):
+                self._data[row, idx] = list(values.values())
+
+    def append_parts(self, parts: Iterable[Tuple[str, Mapping[str, Any]]]) -> None:
+        """追加一行，parts 为 (列名前缀, {名称: 值}) 序列；同名列以后出现者为准。"""
+        row = self._next_row()
+        self._write_parts(row, parts)
+        self._len += 1
+        if self._observers:
+            self._notify(row)
+
+    def append_values(self, idx: np.ndarray, values: List[float], parts: Iterable[Tuple[str, Mapping[str, Any]]] = ()) -> None:
+        """追加一行：定长部分 values 写入 layout() 给出的 idx 列，其余 parts 同 append_parts。"""
+        row = self._next_row()
+        self._data[row, idx] = values
+        self._write_parts(row, parts)
+        self._len += 1
+        if self._observers:
+            self._notify(row)
+
+    def append(self, record: Mapping[str, Any]) -> None:
+        self.append_parts((("", record),))
+
+    def column(self, name: str) -> np.ndarray:
+        return self._data[:self._len, self.index[name]]
+
+    def row_array(self, i: int) -> np.ndarray:
+        """缓冲区第 i 行（按 columns 顺序，缺失为 NaN）的视图。"""
+        return self._data[i, :len(self.columns)]
+
+    def to_numpy(self) -> np.ndarray:
+        return self._data[:self._len, :len(self.columns)]
+
+    def to_frame(self, copy: bool = True) -> pd.DataFrame:
+        """当前缓冲区的 DataFrame（默认为副本）。
+
+        copy=False 时零拷贝引用缓冲区的只读视图（写入会报错）；流式输出时缓冲区会在 flush 后复用，始终复制。
+        """
+        data = self.to_numpy()
+        if copy or self._sink is not None:
+            data = data.copy()
+        else:
+            data = data.view()
+            data.flags.writeable = False
+        return pd.DataFrame(data, columns=list(self.columns), copy=False)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        values = self._data[i, :len(self.columns)].tolist()
+        return {k: v for k, v in zip(self.columns, values) if v == v}
+
+
+class HistoryView(Sequence):
+    """兼容旧接口的惰性视图：按需把每一行还原为 dict（省略 NaN 项）。"""
+
+    def __init__(self, recorder: HistoryRecorder):
+        self.recorder = recorder
+
+    def __len__(self) -> int:
+        return len(self.recorder)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.recorder.row(j) for j in range(*i.indices(len(self)))]
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("history index out of range")
+        return self.recorder.row(i)
+
+    def append(self, record: Mapping[str, Any]) -> None:
+        self.recorder.append(record)
@@ -1,183 +1,145 @@
+import argparse
 import os
-from typing import Callable, Dict, List, Tuple, Any
+from typing import Callable, Dict, List, Tuple, Any, Union
 import pandas as pd
+import plotting
 import matplotlib.pyplot as plt
-from simulate import MetabolicEnvironment, LiverMetabolismSystem
+from checkpoint import warm_start
+from scenarios import run_scenarios
+from schedule import Schedule, as_inject
+from simulate import SYMBOLS, MetabolicEnvironment, LiverMetabolismSystem
 
 
-def _run(env: MetabolicEnvironment, minutes: int, inject: Callable[[MetabolicEnvironment, int], None] = None) -> Tuple[pd.DataFrame, List[Dict]]:
+def _run(env: MetabolicEnvironment, minutes: int, inject: Union[Schedule, Callable[[MetabolicEnvironment, int], None]] = None, t0: int = 0) -> Tuple[pd.DataFrame, List[Dict]]:
+    # t0 为起始步数（从预热检查点分叉时非零）；inject 收到的仍是场景内的相对步数
     system = LiverMetabolismSystem(env)
+    inject = as_inject(inject, env, minutes)
+    env.reserve_history(minutes)
     for tt in range(minutes):
-        hour = tt / 60.0
+        hour = (t0 + tt) / 60.0
         if inject:
             inject(env, tt)
         system.step(hour)
-    df = pd.DataFrame(env.history)
+    df = env.to_frame()
     return df, []
 
 
-def _plot_pair(df_left: pd.DataFrame, df_right: pd.DataFrame, columns: List[str], title_left: str, title_right: str, outfile: str) -> None:
-    try:
-        plt.rcParams["font.sans-serif"] = ["SimHei", "DejaVu Sans", "Arial"]
-    except:
-        pass
-    plt.rcParams["axes.unicode_minus"] = False
-    fig, axes = plt.subplots(1, 2, figsize=(14, 6), sharey=False)
+def _plot_pair(df_left: pd.DataFrame, df_right: pd.DataFrame, columns: List[str], title_left: str, title_right: str, outfile: str) -> str:
+    fig, axes = plotting.figure(1, 2, figsize=(14, 6))
     cmap = plt.get_cmap("tab20")
     available_left = [c for c in columns if c in df_left.columns]
     available_right = [c for c in columns if c in df_right.columns]
     for i, col in enumerate(available_left):
-        axes[0].plot(df_left["time"], df_left[col], label=col, linewidth=2, color=cmap(i % cmap.N))
+        plotting.line(axes[0], df_left["time"], df_left[col], label=col, linewidth=2, color=cmap(i % cmap.N))
     axes[0].set_title(title_left)
     axes[0].set_xlabel("时间 (小时)")
     axes[0].set_ylabel("浓度/水平")
     if len(available_left) > 0:
         axes[0].legend(loc="best", fontsize=9, ncol=2)
     for i, col in enumerate(available_right):
-        axes[1].plot(df_right["time"], df_right[col], label=col, linewidth=2, color=cmap(i % cmap.N))
+        plotting.line(axes[1], df_right["time"], df_right[col], label=col, linewidth=2, color=cmap(i % cmap.N))
     axes[1].set_title(title_right)
     axes[1].set_xlabel("时间 (小时)")
     axes[1].set_ylabel("浓度/水平")
     if len(available_right) > 0:
         axes[1].legend(loc="best", fontsize=9, ncol=2)
-    outdir = os.path.dirname(outfile) or "."
-    os.makedirs(outdir, exist_ok=True)
-    plt.tight_layout()
-    plt.savefig(outfile, bbox_inches="tight")
-    plt.close()
-
-
-def _plot_pair_rates(df_left: pd.DataFrame, df_right: pd.DataFrame, rate_columns: List[str], title_left: str, title_right: str, outfile: str) -> None:
-    try:
-        plt.rcParams["font.sans-serif"] = ["SimHei", "DejaVu Sans", "Arial"]
-    except:
-        pass
-    plt.rcParams["axes.unicode_minus"] = False
-    cols = [c for c in rate_columns if c in df_left.columns or c in df_right.columns]
+    return plotting.save(fig, outfile)
+
+
+def _recorded(df: pd.DataFrame, col: str) -> bool:
+    # 流式历史预先声明全部速率列：从未触发的反应为全 NaN 列，按未记录处理
+    return col in df.columns and bool(df[col].notna().any())
+
+
+def _plot_pair_rates(df_left: pd.DataFrame, df_right: pd.DataFrame, rate_columns: List[str], title_left: str, title_right: str, outfile: str) -> str:
+    left = {c for c in rate_columns if _recorded(df_left, c)}
+    right = {c for c in rate_columns if _recorded(df_right, c)}
+    cols = [c for c in rate_columns if c in left or c in right]
     if len(cols) == 0:
-        outdir = os.path.dirname(outfile) or "."
-        os.makedirs(outdir, exist_ok=True)
-        fig, _ = plt.subplots(1, 1, figsize=(8, 4))
+        fig, _ = plotting.figure(1, 1, figsize=(8, 4))
         fig.suptitle("无可用速率数据")
-        plt.savefig(outfile, bbox_inches="tight")
-        plt.close()
-        return
-    fig, axes = plt.subplots(len(cols), 2, figsize=(14, 3.5 * len(cols)), sharey=False)
+        return plotting.save(fig, outfile, layout=False)
+    fig, axes = plotting.figure(len(cols), 2, figsize=(14, 3.5 * len(cols)))
     if len(cols) == 1:
         axes = [axes]
     for i, col in enumerate(cols):
         ax_left, ax_right = axes[i]
-        if col in df_left.columns:
-            ax_left.plot(df_left["time"], df_left[col], linewidth=2)
+        if col in left:
+            plotting.line(ax_left, df_left["time"], df_left[col], linewidth=2)
         ax_left.set_title(f"{title_left} - {col}")
         ax_left.set_xlabel("时间 (小时)")
         ax_left.set_ylabel("反应速率")
-        if col in df_right.columns:
-            ax_right.plot(df_right["time"], df_right[col], linewidth=2)
+        if col in right:
+            plotting.line(ax_right, df_right["time"], df_right[col], linewidth=2)
         ax_right.set_title(f"{title_right} - {col}")
         ax_right.set_xlabel("时间 (小时)")
         ax_right.set_ylabel("反应速率")
-    outdir = os.path.dirname(outfile) or "."
-    os.makedirs(outdir, exist_ok=True)
-    plt.tight_layout()
-    plt.savefig(outfile, bbox_inches="tight")
-    plt.close()
-
+    return plotting.save(fig, outfile)
 
-def case_nafld_abnormal() -> Tuple[pd.DataFrame, List[Dict]]:
-    env = MetabolicEnvironment()
 
-    def inject(e: MetabolicEnvironment, t: int):
-        e.setParameter("is_postprandial", True)
-        g = e.getMetabolite("glucose")
-        e.setMetabolite("glucose", max(g, 180.0))
+def case_nafld_abnormal(env: MetabolicEnvironment = None, t0: int = 0) -> Tuple[pd.DataFrame, List[Dict]]:
+    env = MetabolicEnvironment() if env is None else env
 
-    return _run(env, minutes=360, inject=inject)
+    schedule = Schedule().set("is_postprandial", 1.0).floor("glucose", 180.0, 0, 360)
+    return _run(env, minutes=360, inject=schedule, t0=t0)
 
 
-def case_nafld_normal() -> Tuple[pd.DataFrame, List[Dict]]:
-    env = MetabolicEnvironment()
+def case_nafld_normal(env: MetabolicEnvironment = None, t0: int = 0) -> Tuple[pd.DataFrame, List[Dict]]:
+    env = MetabolicEnvironment() if env is None else env
 
-    def inject(e: MetabolicEnvironment, t: int):
-        if 20 <= t < 60 or 180 <= t < 220:
-            e.setParameter("is_postprandial", True)
-            e.setMetabolite("glucose", e.getMetabolite("glucose") + 5.0)
-        else:
-            e.setParameter("is_postprandial", False)
+    schedule = Schedule().set("is_postprandial", 0.0)
+    for start, end in ((20, 60), (180, 220)):
+        schedule.window("is_postprandial", start, end).infusion("glucose", 5.0, start, end)
+    return _run(env, minutes=360, inject=schedule, t0=t0)
 
-    return _run(env, minutes=360, inject=inject)
 
-
-def case_dka_abnormal() -> Tuple[pd.DataFrame, List[Dict]]:
-    env = MetabolicEnvironment()
+def case_dka_abnormal(env: MetabolicEnvironment = None, t0: int = 0) -> Tuple[pd.DataFrame, List[Dict]]:
+    env = MetabolicEnvironment() if env is None else env
     env.setParameter("insulin_degrading_enzyme_activity", 50.0)
     env.setParameter("insulin_sensitivity", 1.0)
 
-    def inject(e: MetabolicEnvironment, t: int):
-        e.setParameter("is_postprandial", False)
-        e.setMetabolite("glucose", max(e.getMetabolite("glucose"), 180.0))
-
-    return _run(env, minutes=360, inject=inject)
+    schedule = Schedule().set("is_postprandial", 0.0).floor("glucose", 180.0, 0, 360)
+    return _run(env, minutes=360, inject=schedule, t0=t0)
 
 
-def case_dka_normal() -> Tuple[pd.DataFrame, List[Dict]]:
-    env = MetabolicEnvironment()
+def case_dka_normal(env: MetabolicEnvironment = None, t0: int = 0) -> Tuple[pd.DataFrame, List[Dict]]:
+    env = MetabolicEnvironment() if env is None else env
 
-    def inject(e: MetabolicEnvironment, t: int):
-        if 30 <= t < 120:
-            e.setParameter("is_postprandial", True)
-            e.setMetabolite("glucose", e.getMetabolite("glucose") + 4.0)
-        else:
-            e.setParameter("is_postprandial", False)
+    schedule = Schedule().set("is_postprandial", 0.0).window("is_postprandial", 30, 120).infusion("glucose", 4.0, 30, 120)
+    return _run(env, minutes=360, inject=schedule, t0=t0)
 
-    return _run(env, minutes=360, inject=inject)
 
-
-def case_acetaldehyde_abnormal() -> Tuple[pd.DataFrame, List[Dict]]:
-    env = MetabolicEnvironment()
+def case_acetaldehyde_abnormal(env: MetabolicEnvironment = None, t0: int = 0) -> Tuple[pd.DataFrame, List[Dict]]:
+    env = MetabolicEnvironment() if env is None else env
     env.setParameter("liver_function", 0.2)
 
-    def inject(e: MetabolicEnvironment, t: int):
-        if t == 10:
-            e.setMetabolite("ethanol", e.getMetabolite("ethanol") + 8.0)
-        if t >= 30:
-            e.setMetabolite("nad_plus", max(e.getMetabolite("nad_plus") - 0.5, 1.0))
-
-    return _run(env, minutes=240, inject=inject)
+    # 30 分钟起 NAD+ 持续消耗，但不低于 1.0
+    schedule = Schedule().bolus("ethanol", 8.0, 10).infusion("nad_plus", -0.5, 30, 240).floor("nad_plus", 1.0, 30, 240)
+    return _run(env, minutes=240, inject=schedule, t0=t0)
 
 
-def case_acetaldehyde_normal() -> Tuple[pd.DataFrame, List[Dict]]:
-    env = MetabolicEnvironment()
+def case_acetaldehyde_normal(env: MetabolicEnvironment = None, t0: int = 0) -> Tuple[pd.DataFrame, List[Dict]]:
+    env = MetabolicEnvironment() if env is None else env
     env.setParameter("liver_function", 1.0)
 
-    def inject(e: MetabolicEnvironment, t: int):
-        if t == 10:
-            e.setMetabolite("ethanol", e.getMetabolite("ethanol") + 5.0)
+    schedule = Schedule().bolus("ethanol", 5.0, 10)
+    return _run(env, minutes=240, inject=schedule, t0=t0)
 
-    return _run(env, minutes=240, inject=inject)
 
-
-def case_hepatic_encephalopathy_abnormal() -> Tuple[pd.DataFrame, List[Dict]]:
-    env = MetabolicEnvironment()
+def case_hepatic_encephalopathy_abnormal(env: MetabolicEnvironment = None, t0: int = 0) -> Tuple[pd.DataFrame, List[Dict]]:
+    env = MetabolicEnvironment() if env is None else env
     env.setParameter("liver_function", 0.2)
 
-    def inject(e: MetabolicEnvironment, t: int):
-        e.setMetabolite("atp", min(e.getMetabolite("atp"), 10.0))
-        if t % 30 == 0 and t <= 180:
-            e.setMetabolite("amino_acid", e.getMetabolite("amino_acid") + 3.0)
-
-    return _run(env, minutes=240, inject=inject)
+    schedule = Schedule().ceiling("atp", 10.0, 0, 240).bolus("amino_acid", 3.0, 0, every=30, until=181)
+    return _run(env, minutes=240, inject=schedule, t0=t0)
 
 
-def case_hepatic_encephalopathy_normal() -> Tuple[pd.DataFrame, List[Dict]]:
-    env = MetabolicEnvironment()
+def case_hepatic_encephalopathy_normal(env: MetabolicEnvironment = None, t0: int = 0) -> Tuple[pd.DataFrame, List[Dict]]:
+    env = MetabolicEnvironment() if env is None else env
     env.setParameter("liver_function", 1.0)
 
-    def inject(e: MetabolicEnvironment, t: int):
-        if t % 60 == 0 and t <= 180:
-            e.setMetabolite("amino_acid", e.getMetabolite("amino_acid") + 1.0)
-
-    return _run(env, minutes=240, inject=inject)
+    schedule = Schedule().bolus("amino_acid", 1.0, 0, every=60, until=181)
+    return _run(env, minutes=240, inject=schedule, t0=t0)
 
 
 def _write_events(path: str, events: List[Dict]) -> None:
@@ -187,100 +149,125 @@ def _write_events(path: str, events: List[Dict]) -> None:
     df.to_csv(path, index=False)
 
 
-def run_and_plot_all() -> Dict[str, str]:
+SCENARIOS: Dict[str, Callable[..., Tuple[pd.DataFrame, List[Dict]]]] = {
+    "nafld_abnormal": case_nafld_abnormal,
+    "nafld_normal": case_nafld_normal,
+    "dka_abnormal": case_dka_abnormal,
+    "dka_normal": case_dka_normal,
+    "acetaldehyde_abnormal": case_acetaldehyde_abnormal,
+    "acetaldehyde_normal": case_acetaldehyde_normal,
+    "hepatic_encephalopathy_abnormal": case_hepatic_encephalopathy_abnormal,
+    "hepatic_encephalopathy_normal": case_hepatic_encephalopathy_normal,
+}
+
+
+# 速率对比图中的反应
+RATE_COLUMNS = [
+    "rate_hexokinase_or_glucokinase",
+    "rate_glycolysis_middle_steps",
+    "rate_betaOxidation",
+    "rate_fattyAcidSynthesis",
+    "rate_ketogenesis",
+    "rate_oxidativePhosphorylation",
+    "rate_glycogenSynthaseStep",
+    "rate_glycogenPhosphorylaseStep",
+    "rate_deNovoLipogenesis",
+]
+
+
+def run_and_plot_all(jobs: int = None, warmup_hours: float = 0.0, stream_dir: str = None, fmt: str = ".parquet",
+                     plot_format: str = None) -> Dict[str, str]:
     os.makedirs("../results-ill", exist_ok=True)
-    df_nafld_abn, ev_nafld_abn = case_nafld_abnormal()
-    df_nafld_ctl, ev_nafld_ctl = case_nafld_normal()
-    _plot_pair(
+    # 先并行跑完全部场景，再统一绘图/导出事件；warmup_hours > 0 时所有场景从同一段
+    # 空腹预热的缓存检查点分叉。给定 stream_dir 时历史流式写入文件（只保留状态列与绘图用到的速率列），
+    # 绘图时按列惰性读取。各图互相独立，收集后由 plotting.render 统一渲染（jobs 同样控制绘图进程数），
+    # plot_format 可改为 ".svg"/".json" 等轻量输出
+    checkpoint = warm_start(MetabolicEnvironment(), int(warmup_hours * 60)) if warmup_hours > 0 else None
+    columns = list(SYMBOLS.names) + RATE_COLUMNS + ["time"]
+    results = run_scenarios("ill_cases", jobs=jobs, checkpoint=checkpoint, stream_dir=stream_dir, fmt=fmt, columns=columns)
+    tasks = []
+    df_nafld_abn, ev_nafld_abn = results["nafld_abnormal"]
+    df_nafld_ctl, ev_nafld_ctl = results["nafld_normal"]
+    tasks.append((_plot_pair, (
         df_nafld_abn,
         df_nafld_ctl,
         ["glucose", "fatty_acid", "triglycerides", "insulin"],
         "NAFLD 异常输入",
         "NAFLD 正常对照",
         "../results-ill/nafld_pair.png",
-    )
+    )))
     _write_events("../results-ill/nafld_events_abnormal.csv", ev_nafld_abn)
     _write_events("../results-ill/nafld_events_normal.csv", ev_nafld_ctl)
-    rate_cols = [
-        "rate_hexokinase_or_glucokinase",
-        "rate_glycolysis_middle_steps",
-        "rate_betaOxidation",
-        "rate_fattyAcidSynthesis",
-        "rate_ketogenesis",
-        "rate_oxidativePhosphorylation",
-        "rate_glycogenSynthaseStep",
-        "rate_glycogenPhosphorylaseStep",
-        "rate_deNovoLipogenesis",
-    ]
-    _plot_pair_rates(
+    tasks.append((_plot_pair_rates, (
         df_nafld_abn,
         df_nafld_ctl,
-        rate_cols,
+        RATE_COLUMNS,
         "NAFLD 异常输入 主要反应速率",
         "NAFLD 正常对照 主要反应速率",
         "../results-ill/nafld_rates_pair.png",
-    )
-    df_dka_abn, ev_dka_abn = case_dka_abnormal()
-    df_dka_ctl, ev_dka_ctl = case_dka_normal()
-    _plot_pair(
+    )))
+    df_dka_abn, ev_dka_abn = results["dka_abnormal"]
+    df_dka_ctl, ev_dka_ctl = results["dka_normal"]
+    tasks.append((_plot_pair, (
         df_dka_abn,
         df_dka_ctl,
         ["glucose", "ketone_body", "insulin", "fatty_acid"],
         "DKA 异常输入",
         "DKA 正常对照",
         "../results-ill/dka_pair.png",
-    )
+    )))
     _write_events("../results-ill/dka_events_abnormal.csv", ev_dka_abn)
     _write_events("../results-ill/dka_events_normal.csv", ev_dka_ctl)
-    _plot_pair_rates(
+    tasks.append((_plot_pair_rates, (
         df_dka_abn,
         df_dka_ctl,
-        rate_cols,
+        RATE_COLUMNS,
         "DKA 异常输入 主要反应速率",
         "DKA 正常对照 主要反应速率",
         "../results-ill/dka_rates_pair.png",
-    )
-    df_acet_abn, ev_acet_abn = case_acetaldehyde_abnormal()
-    df_acet_ctl, ev_acet_ctl = case_acetaldehyde_normal()
-    _plot_pair(
+    )))
+    df_acet_abn, ev_acet_abn = results["acetaldehyde_abnormal"]
+    df_acet_ctl, ev_acet_ctl = results["acetaldehyde_normal"]
+    tasks.append((_plot_pair, (
         df_acet_abn,
         df_acet_ctl,
         ["ethanol", "acetaldehyde", "acetate", "nadh", "nad_plus"],
         "乙醛蓄积 异常输入",
         "乙醛蓄积 正常对照",
         "../results-ill/acetaldehyde_pair.png",
-    )
+    )))
     _write_events("../results-ill/acetaldehyde_events_abnormal.csv", ev_acet_abn)
     _write_events("../results-ill/acetaldehyde_events_normal.csv", ev_acet_ctl)
-    _plot_pair_rates(
+    tasks.append((_plot_pair_rates, (
         df_acet_abn,
         df_acet_ctl,
-        rate_cols,
+        RATE_COLUMNS,
         "乙醛蓄积 异常输入 主要反应速率",
         "乙醛蓄积 正常对照 主要反应速率",
         "../results-ill/acetaldehyde_rates_pair.png",
-    )
-    df_he_abn, ev_he_abn = case_hepatic_encephalopathy_abnormal()
-    df_he_ctl, ev_he_ctl = case_hepatic_encephalopathy_normal()
-    _plot_pair(
+    )))
+    df_he_abn, ev_he_abn = results["hepatic_encephalopathy_abnormal"]
+    df_he_ctl, ev_he_ctl = results["hepatic_encephalopathy_normal"]
+    tasks.append((_plot_pair, (
         df_he_abn,
         df_he_ctl,
         ["ammonia", "urea", "amino_acid"],
         "肝性脑病 异常输入",
         "肝性脑病 正常对照",
         "../results-ill/hepatic_encephalopathy_pair.png",
-    )
+    )))
     _write_events("../results-ill/hepatic_encephalopathy_events_abnormal.csv", ev_he_abn)
     _write_events("../results-ill/hepatic_encephalopathy_events_normal.csv", ev_he_ctl)
-    _plot_pair_rates(
+    tasks.append((_plot_pair_rates, (
         df_he_abn,
         df_he_ctl,
-        rate_cols,
+        RATE_COLUMNS,
         "肝性脑病 异常输入 主要反应速率",
         "肝性脑病 正常对照 主要反应速率",
         "../results-ill/hepatic_encephalopathy_rates_pair.png",
-    )
-    return {
+    )))
+    plotting.render(tasks, jobs=jobs, fmt=plot_format)
+    paths = {
         "NAFLD": "../results-ill/nafld_pair.png",
         "NAFLD_EVENTS_ABNORMAL": "../results-ill/nafld_events_abnormal.csv",
         "NAFLD_EVENTS_NORMAL": "../results-ill/nafld_events_normal.csv",
@@ -298,8 +285,17 @@ def run_and_plot_all() -> Dict[str, str]:
         "HepaticEncephalopathy_EVENTS_NORMAL": "../results-ill/hepatic_encephalopathy_events_normal.csv",
         "HepaticEncephalopathy_RATES": "../results-ill/hepatic_encephalopathy_rates_pair.png",
     }
+    return {k: v if v.endswith(".csv") else plotting.with_format(v, plot_format) for k, v in paths.items()}
 
 
 if __name__ == "__main__":
-    paths = run_and_plot_all()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=None, help="并行进程数（默认 CPU 核数，1 为顺序执行）")
+    parser.add_argument("--warmup", type=float, default=0.0, help="场景开始前的空腹预热小时数（结果按模型版本与初始状态缓存）")
+    parser.add_argument("--stream", default=None, help="把各场景历史流式写入该目录（不在内存中保留完整历史）")
+    parser.add_argument("--format", default=".parquet", choices=[".parquet", ".arrow", ".csv", ".mmap"], help="流式历史的文件格式")
+    parser.add_argument("--plot-format", default=None, choices=list(plotting.FORMATS), help="图像输出格式（默认 .png；.json 只导出曲线数据不渲染）")
+    args = parser.parse_args()
+    paths = run_and_plot_all(jobs=args.jobs, warmup_hours=args.warmup, stream_dir=args.stream, fmt=args.format,
+                             plot_format=args.plot_format)
     print(paths)
@@ -2,52 +2,85 @@ import sys
 import os
 import pandas as pd
 import matplotlib.pyplot as plt
+from adaptive import run_adaptive
+from history import LazyHistory
 from simulate import MetabolicEnvironment, LiverMetabolismSystem
 
-def simulate_24h() -> pd.DataFrame:
-    env = MetabolicEnvironment()
-    system = LiverMetabolismSystem(env)
+UNITS_PER_HOUR = 30
+DAY_UNITS = 24 * UNITS_PER_HOUR
+
+
+def _daily_schedule(env: MetabolicEnvironment, t: int) -> None:
+    # Meals and postprandial windows; t counts units since midnight and repeats every day
+    t = t % DAY_UNITS
+    if t == 8 * UNITS_PER_HOUR:
+        env.setMetabolite("glucose", env.getMetabolite("glucose") + 30.0)
+        env.setMetabolite("amino_acid", env.getMetabolite("amino_acid") + 5.0)
+        env.setMetabolite("triglycerides", env.getMetabolite("triglycerides") + 5.0)
     
-    UNITS_PER_HOUR = 30
-    DAY_UNITS = 24 * UNITS_PER_HOUR
+    elif t == 12 * UNITS_PER_HOUR:
+        env.setMetabolite("glucose", env.getMetabolite("glucose") + 40.0)
+        env.setMetabolite("amino_acid", env.getMetabolite("amino_acid") + 7.0)
+        env.setMetabolite("triglycerides", env.getMetabolite("triglycerides") + 8.0)
+        
+    elif t == 18 * UNITS_PER_HOUR:
+        env.setMetabolite("glucose", env.getMetabolite("glucose") + 35.0)
+        env.setMetabolite("amino_acid", env.getMetabolite("amino_acid") + 6.0)
+        env.setMetabolite("triglycerides", env.getMetabolite("triglycerides") + 7.0)
+
+    is_postprandial = False
+    if (8 * UNITS_PER_HOUR) <= t < (10 * UNITS_PER_HOUR):
+        is_postprandial = True
+    elif (12 * UNITS_PER_HOUR) <= t < (15 * UNITS_PER_HOUR):
+        is_postprandial = True
+    elif (18 * UNITS_PER_HOUR) <= t < (22 * UNITS_PER_HOUR):
+        is_postprandial = True
+        
+    env.setParameter("is_postprandial", is_postprandial)
+
+def simulate_24h(backend: str = "serial", rtol: float = None) -> pd.DataFrame:
+    # rtol switches to the adaptive step controller (adaptive.run_adaptive): it follows the same per-step
+    # update within rtol and returns the same rows and columns
+    env = MetabolicEnvironment()
     start_t = 7 * UNITS_PER_HOUR
     total_units = DAY_UNITS + 1
+    if rtol is not None:
+        df = run_adaptive(env, total_units, lambda e, k: _daily_schedule(e, start_t + k), rtol=rtol, steps_per_hour=UNITS_PER_HOUR)
+        df["time"] = df["time"] + 7.0
+        df["time_abs"] = df["time"]
+        return df
+    system = LiverMetabolismSystem(env, backend=backend)
+    env.reserve_history(total_units)
     
     for t in range(start_t, start_t + total_units):
         hour = (t - start_t) / UNITS_PER_HOUR
-        
-        if t == 8 * UNITS_PER_HOUR:
-            env.setMetabolite("glucose", env.getMetabolite("glucose") + 30.0)
-            env.setMetabolite("amino_acid", env.getMetabolite("amino_acid") + 5.0)
-            env.setMetabolite("triglycerides", env.getMetabolite("triglycerides") + 5.0)
-        
-        elif t == 12 * UNITS_PER_HOUR:
-            env.setMetabolite("glucose", env.getMetabolite("glucose") + 40.0)
-            env.setMetabolite("amino_acid", env.getMetabolite("amino_acid") + 7.0)
-            env.setMetabolite("triglycerides", env.getMetabolite("triglycerides") + 8.0)
-            
-        elif t == 18 * UNITS_PER_HOUR:
-            env.setMetabolite("glucose", env.getMetabolite("glucose") + 35.0)
-            env.setMetabolite("amino_acid", env.getMetabolite("amino_acid") + 6.0)
-            env.setMetabolite("triglycerides", env.getMetabolite("triglycerides") + 7.0)
-
-        is_postprandial = False
-        if (8 * UNITS_PER_HOUR) <= t < (10 * UNITS_PER_HOUR):
-            is_postprandial = True
-        elif (12 * UNITS_PER_HOUR) <= t < (15 * UNITS_PER_HOUR):
-            is_postprandial = True
-        elif (18 * UNITS_PER_HOUR) <= t < (22 * UNITS_PER_HOUR):
-            is_postprandial = True
-            
-        env.setParameter("is_postprandial", is_postprandial)
-        
+        _daily_schedule(env, t)
         system.step(hour)
-        
-    df = pd.DataFrame(env.history)
+
+    system.close()
+    df = env.to_frame()
     df["time"] = df["time"] + 7.0
     df["time_abs"] = df["time"]
     return df
 
+def simulate_days(days: int, out: str, backend: str = "serial", columns=None, row_group: int = 4096, **options) -> LazyHistory:
+    # Multi-day run with the same daily meals; history is streamed to `out` (.parquet/.arrow/.csv/.mmap)
+    # in row groups so memory stays flat, and the result is read back lazily per column.
+    # The time column holds clock hours since day 0, 00:00 (the run starts at 7:00).
+    # `options` go to the sink, e.g. dtype=np.float32 for a half-size .mmap file.
+    start_t = 7 * UNITS_PER_HOUR
+    if out.lower().endswith(".mmap"):
+        options.setdefault("dt", 1.0 / UNITS_PER_HOUR)
+        options.setdefault("start", 7.0)
+    env = MetabolicEnvironment()
+    env.stream_history(out, row_group, columns, **options)
+    with LiverMetabolismSystem(env, backend=backend) as system:
+        for t in range(start_t, start_t + days * DAY_UNITS + 1):
+            _daily_schedule(env, t)
+            system.step(t / UNITS_PER_HOUR)
+    env.recorder.close()
+    return LazyHistory(out)
+
 def run_simulation_train_cases() -> pd.DataFrame:
     return simulate_24h()
 
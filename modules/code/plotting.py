@@ -0,0 +1,193 @@
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import matplotlib
+
+# 用例脚本只输出文件：导入 pyplot 之前固定无界面后端，子进程/无显示环境下行为一致
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+from matplotlib.lines import Line2D  # noqa: E402
+from matplotlib.transforms import Bbox  # noqa: E402
+
+plt.rcParams["font.sans-serif"] = ["SimHei", "DejaVu Sans", "Arial"]
+plt.rcParams["axes.unicode_minus"] = False
+# SimHei 缺失时每次绘制都会对每个中文字形告警，批量出图时刷屏
+warnings.filterwarnings("ignore", message="Glyph .* missing from font")
+
+FORMATS = (".png", ".svg", ".pdf", ".json")
+
+# 按布局 (nrows, ncols, figsize) 缓存的图与坐标轴；同一布局的下一张图直接复用
+_FIGURES: Dict[Tuple, Tuple[Any, Any]] = {}
+# 每个坐标轴本张图已使用的曲线数（其余曲线在 save 时移除）
+_USED: Dict[Any, int] = {}
+
+
+def figure(nrows: int = 1, ncols: int = 1, figsize: Tuple[float, float] = (12, 7)):
+    """返回 (fig, axes)，语义同 plt.subplots；同一布局复用上一张图的 Figure/Axes。
+
+    复用时复位子图间距，清空标题、坐标轴标签与图例，已有曲线先隐去标签（不进入本张图的图例），
+    留给 line() 通过 set_data 改写。
+    """
+    key = (nrows, ncols, tuple(figsize))
+    if key not in _FIGURES:
+        _FIGURES[key] = plt.subplots(nrows, ncols, figsize=figsize)
+    fig, axes = _FIGURES[key]
+    # 子图间距复位为默认值，save() 的 tight_layout 从与新建图相同的起点计算
+    fig.subplots_adjust(**{k: plt.rcParams[f"figure.subplot.{k}"] for k in ("left", "right", "bottom", "top", "wspace", "hspace")})
+    suptitle = getattr(fig, "_suptitle", None)
+    if suptitle is not None:
+        suptitle.set_text("")
+    for ax in fig.axes:
+        _USED[ax] = 0
+        ax.set_title("")
+        ax.set_xlabel("")
+        ax.set_ylabel("")
+        if ax.get_legend() is not None:
+            ax.get_legend().remove()
+        for ln in ax.get_lines():
+            ln.set_label("_nolegend_")
+    return fig, axes
+
+
+def _default_color(i: int):
+    # 新建图中 ax 的第 i 条曲线的默认颜色（属性循环的第 i 个）
+    colors = plt.rcParams["axes.prop_cycle"].by_key().get("color", [plt.rcParams["lines.color"]])
+    return colors[i % len(colors)]
+
+
+def _reset(ln: Line2D, i: int) -> None:
+    # 把复用的曲线恢复为新建时的默认样式；坐标变换与裁剪沿用 ln 自身（update_from 会一并复制）
+    default = Line2D([], [], color=_default_color(i), transform=ln.get_transform())
+    default.set_clip_box(ln.get_clip_box())
+    default.set_clip_path(ln.get_clip_path())
+    ln.update_from(default)
+    ln.set_zorder(default.get_zorder())
+    ln.set_label("_nolegend_")
+
+
+def line(ax, x, y, **style):
+    """在 ax 上画一条曲线：优先改写复用图里的现有 Line2D，不够时再新建。
+
+    复用的曲线先恢复默认样式再应用 style，未指定的颜色、线型、标记等不会沿用上一张图。
+    """
+    used = _USED.get(ax, 0)
+    lines = ax.get_lines()
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if used < len(lines):
+        ln = lines[used]
+        _reset(ln, used)
+        ln.set_data(x, y)
+        ln.update(style)
+    else:
+        # 复用图的属性循环已前进，颜色显式取默认值，与新建图一致
+        if "color" not in style and "c" not in style:
+            style = {"color": _default_color(used), **style}
+        ln, = ax.plot(x, y, **style)
+    _USED[ax] = used + 1
+    return ln
+
+
+def _finish(fig) -> None:
+    # 移除上一张图多出来的曲线，并按本张图的数据重算坐标范围；
+    # 视图范围先复位，没有曲线或数据全为 NaN 时与新建的坐标轴取相同的默认范围
+    for ax in fig.axes:
+        for ln in ax.get_lines()[_USED.get(ax, 0):]:
+            ln.remove()
+        ax.viewLim.set_points(Bbox.unit().get_points())
+        if _USED.get(ax, 0):
+            ax.relim()
+            ax.autoscale_view()
+
+
+def spec(fig) -> Dict[str, Any]:
+    """图的轻量描述（标题、坐标轴标签、每条曲线的标签/颜色/数据），不经过渲染。"""
+    def _values(a) -> List[Any]:
+        return [None if not np.isfinite(v) else float(v) for v in np.asarray(a, dtype=np.float64)]
+
+    suptitle = getattr(fig, "_suptitle", None)
+    axes = []
+    for ax in fig.axes:
+        axes.append({
+            "title": ax.get_title(),
+            "xlabel": ax.get_xlabel(),
+            "ylabel": ax.get_ylabel(),
+            "legend": ax.get_legend() is not None,
+            "lines": [{
+                "label": ln.get_label(),
+                "color": matplotlib.colors.to_hex(ln.get_color()),
+                "linewidth": ln.get_linewidth(),
+                "x": _values(ln.get_xdata()),
+                "y": _values(ln.get_ydata()),
+            } for ln in ax.get_lines()],
+        })
+    return {
+        "figsize": [float(v) for v in fig.get_size_inches()],
+        "suptitle": suptitle.get_text() if suptitle is not None else "",
+        "axes": axes,
+    }
+
+
+def save(fig, outfile: str, layout: bool = True) -> str:
+    """按扩展名写出 fig（.png/.svg/.pdf 渲染，.json 只写 spec），返回输出路径。
+
+    layout=True 时每次保存前按本张图的标题与刻度标签重新 tight_layout。
+    """
+    ext = os.path.splitext(outfile)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"不支持的图像格式: {ext}（可选 {', '.join(FORMATS)}）")
+    os.makedirs(os.path.dirname(outfile) or ".", exist_ok=True)
+    _finish(fig)
+    if ext == ".json":
+        with open(outfile, "w", encoding="utf-8") as f:
+            json.dump(spec(fig), f, ensure_ascii=False)
+        return outfile
+    if layout:
+        fig.tight_layout()
+    fig.savefig(outfile, bbox_inches="tight")
+    return outfile
+
+
+def close() -> None:
+    """关闭并清空缓存的图；下一次 figure() 重新创建。"""
+    for fig, _ in _FIGURES.values():
+        plt.close(fig)
+    _FIGURES.clear()
+    _USED.clear()
+
+
+def with_format(outfile: str, fmt: str = None) -> str:
+    """把 outfile 的扩展名换成 fmt（None 时原样返回）。"""
+    if fmt is None:
+        return outfile
+    return os.path.splitext(outfile)[0] + fmt
+
+
+def _render_one(fn: Callable[..., Any], args: Sequence[Any], fmt: str = None) -> str:
+    # 约定 fn 的最后一个位置参数是输出路径
+    args = list(args)
+    args[-1] = with_format(args[-1], fmt)
+    fn(*args)
+    return args[-1]
+
+
+def render(tasks: Sequence[Tuple[Callable[..., Any], Sequence[Any]]], jobs: int = None, fmt: str = None) -> List[str]:
+    """渲染一组互相独立的图，返回实际写出的路径（顺序与 tasks 一致）。
+
+    每个任务为 (fn, args)，fn(*args) 画一张图，args 的最后一项是输出路径；fmt 给定时
+    （如 ".svg"/".json"）替换其扩展名。jobs=1 时在当前进程内顺序执行（同布局的图复用
+    Figure，结束后关闭），否则提交到进程池，fn 与 args 需可 pickle（模块级函数、DataFrame/LazyHistory）。
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(tasks) <= 1:
+        try:
+            return [_render_one(fn, args, fmt) for fn, args in tasks]
+        finally:
+            close()
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as ex:
+        futs = [ex.submit(_render_one, fn, args, fmt) for fn, args in tasks]
+        return [f.result() for f in futs]
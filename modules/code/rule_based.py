@@ -1,6 +1,54 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Callable, Optional, Tuple
+from typing import Dict, List, Callable, Tuple, Union
+
+from schedule import Schedule, as_inject
+
+# 代谢物边界 (下限, 上限)；未列出的代谢物只截断到非负
+METABOLITE_BOUNDS: Dict[str, Tuple[float, float]] = {
+    "glucose": (3.0, 10.0),          # mmol/L
+    "glycogen": (0.0, 100.0),        # g
+    "fatty_acid": (0.1, 2.0),        # mmol/L
+    "triglycerides": (0.5, 2.0),     # mmol/L
+    "cholesterol": (3.0, 6.0),       # mmol/L
+    "amino_acid": (2.0, 8.0),        # mmol/L
+    "ammonia": (0.01, 0.1),          # mmol/L
+    "urea": (2.5, 7.1),              # mmol/L
+    "indirect_bilirubin": (0.1, 20.0), # μmol/L
+    "direct_bilirubin": (0.1, 7.0),  # μmol/L
+    "udpga": (0.1, 5.0),             # mmol/L
+    "phaseI_intermediates": (0.0, 1.0), # mmol/L
+    "conjugates": (0.0, 2.0),        # mmol/L
+    "nadh": (0.05, 1.0),             # mmol/L
+    "nad_plus": (0.1, 1.0),          # mmol/L
+    "atp": (2.0, 10.0),              # mmol/L
+    "adp": (0.5, 2.0),               # mmol/L
+    "amp": (0.05, 0.5),              # mmol/L
+    "insulin": (2.0, 50.0),          # μU/mL
+    "glucagon": (2.0, 20.0),         # pg/mL
+    "ketone_body": (0.05, 5.0),      # mmol/L
+    "albumin": (30.0, 55.0),         # g/L
+    "ethanol": (0.0, 50.0),          # mmol/L
+    "acetaldehyde": (0.0, 5.0),      # mmol/L
+    "acetate": (0.0, 10.0),          # mmol/L
+    "paps": (0.1, 3.0),              # mmol/L
+    "gsh": (0.5, 5.0),               # mmol/L
+}
+
+
+def compile_bounds(names: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """按 names 的顺序把边界编译成 (下限, 上限) 数组；未列出的代谢物为 [0, inf)。"""
+    lower = np.array([METABOLITE_BOUNDS.get(k, (0.0, np.inf))[0] for k in names], dtype=np.float64)
+    upper = np.array([METABOLITE_BOUNDS.get(k, (0.0, np.inf))[1] for k in names], dtype=np.float64)
+    return lower, upper
+
+
+def compile_kinetics(env: "MetabolicEnvironment", names: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """按 names 的顺序把 Km / Vmax 编译成数组；未配置的底物与 getKineticParameter 一样取 1.0。"""
+    km = np.array([env.getKineticParameter("km_michaelis_menten", k) for k in names], dtype=np.float64)
+    vmax = np.array([env.getKineticParameter("vmax_michaelis_menten", k) for k in names], dtype=np.float64)
+    return km, vmax
+
 
 class MetabolicEnvironment:
     def __init__(self):
@@ -75,38 +123,9 @@ class MetabolicEnvironment:
     
     def setMetabolite(self, name: str, value: float):
         # 应用边界条件
-        bounds = {
-            "glucose": (3.0, 10.0),          # mmol/L
-            "glycogen": (0.0, 100.0),        # g
-            "fatty_acid": (0.1, 2.0),        # mmol/L
-            "triglycerides": (0.5, 2.0),     # mmol/L
-            "cholesterol": (3.0, 6.0),       # mmol/L
-            "amino_acid": (2.0, 8.0),        # mmol/L
-            "ammonia": (0.01, 0.1),          # mmol/L
-            "urea": (2.5, 7.1),              # mmol/L
-            "indirect_bilirubin": (0.1, 20.0), # μmol/L
-            "direct_bilirubin": (0.1, 7.0),  # μmol/L
-            "udpga": (0.1, 5.0),             # mmol/L
-            "phaseI_intermediates": (0.0, 1.0), # mmol/L
-            "conjugates": (0.0, 2.0),        # mmol/L
-            "nadh": (0.05, 1.0),             # mmol/L
-            "nad_plus": (0.1, 1.0),          # mmol/L
-            "atp": (2.0, 10.0),              # mmol/L
-            "adp": (0.5, 2.0),               # mmol/L
-            "amp": (0.05, 0.5),              # mmol/L
-            "insulin": (2.0, 50.0),          # μU/mL
-            "glucagon": (2.0, 20.0),         # pg/mL
-            "ketone_body": (0.05, 5.0),      # mmol/L
-            "albumin": (30.0, 55.0),         # g/L
-            "ethanol": (0.0, 50.0),          # mmol/L
-            "acetaldehyde": (0.0, 5.0),      # mmol/L
-            "acetate": (0.0, 10.0),          # mmol/L
-            "paps": (0.1, 3.0),              # mmol/L
-            "gsh": (0.5, 5.0),               # mmol/L
-        }
-        
-        if name in bounds:
-            min_val, max_val = bounds[name]
+        bounds = METABOLITE_BOUNDS.get(name)
+        if bounds is not None:
+            min_val, max_val = bounds
             value = max(min_val, min(max_val, value))
         else:
             value = max(0.0, value)
@@ -163,11 +182,17 @@ class MetabolicEnvironment:
 class RuleBasedLiverSystem:
     def __init__(self, env: MetabolicEnvironment):
         self.env = env
+        # 动力学常数在构造时按代谢物编号编译一次（之后修改 env.kinetic_parameters 需重建系统）
+        self.metabolite_names = list(env.metabolites)
+        self.km, self.vmax = compile_kinetics(env, self.metabolite_names)
+        self._mm = {k: (float(km), float(vmax)) for k, km, vmax in zip(self.metabolite_names, self.km, self.vmax)}
     
     def step(self, time: float):
         # 记录当前状态
         self.env.record(time)
-        
+        self.advance()
+
+    def advance(self):
         # 执行各种代谢途径（按照时间尺度排序）
         # 快速反应（毫秒-秒级）
         self.process_energy_state()
@@ -184,13 +209,28 @@ class RuleBasedLiverSystem:
         
         # 慢速反应（分钟-小时级）
         self.process_albumin_synthesis()
+
+    def evaluate(self) -> np.ndarray:
+        """基于当前环境求一步的增量（按 metabolite_names 顺序），不写回环境。"""
+        before = dict(self.env.metabolites)
+        self.advance()
+        after = self.env.metabolites
+        delta = np.array([after[k] - before[k] for k in self.metabolite_names])
+        after.update(before)
+        return delta
     
     def michaelis_menten_rate(self, substrate: str, substrate_concentration: float) -> float:
         # Michaelis-Menten动力学计算反应速率
-        km = self.env.getKineticParameter("km_michaelis_menten", substrate)
-        vmax = self.env.getKineticParameter("vmax_michaelis_menten", substrate)
+        km, vmax = self._mm.get(substrate, (1.0, 1.0))
         rate = (vmax * substrate_concentration) / (km + substrate_concentration)
         return rate * self.env.getParameter("rate_modifier")
+
+    def michaelis_menten_rates(self, concentrations: np.ndarray, rate_modifier: float = None) -> np.ndarray:
+        """对按代谢物编号排列的浓度（末维为代谢物）一次求全部 Michaelis-Menten 速率，逐元素与 michaelis_menten_rate 相同。"""
+        if rate_modifier is None:
+            rate_modifier = self.env.getParameter("rate_modifier")
+        rate = (self.vmax * concentrations) / (self.km + concentrations)
+        return rate * rate_modifier
     
     def process_energy_state(self):
         # 处理能量状态（ATP/ADP/AMP平衡）
@@ -480,8 +520,9 @@ class RuleBasedLiverSystem:
         self.env.update_oxidation_reduction_state()
 
 
-def run_simulation(env: MetabolicEnvironment, minutes: int, inject: Optional[Callable] = None) -> pd.DataFrame:
+def run_simulation(env: MetabolicEnvironment, minutes: int, inject: Union[Schedule, Callable, None] = None) -> pd.DataFrame:
     system = RuleBasedLiverSystem(env)
+    inject = as_inject(inject, env, minutes)
     for t in range(minutes):
         hour = t / 60.0
         if inject:
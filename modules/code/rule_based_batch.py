@@ -0,0 +1,409 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from rule_based import MetabolicEnvironment, compile_bounds, compile_kinetics
+
+# 事件表的一行，格式见 schedule.Event（schedule.Schedule 可直接作为事件表传入）：
+#   {"target", "value", "start", "end", "every", "op": "add" | "set" | "max" | "min", "patient"}
+Event = Mapping[str, Any]
+# 编译后的一次操作：(op, 目标类别 "m"/"p", 列号, 患者下标或 None, 值)
+_Op = Tuple[str, str, int, Optional[np.ndarray], Union[float, np.ndarray]]
+
+
+class BatchRuleBasedEnvironment:
+    """N 个规则模型环境：代谢物 / 参数为 (N, k) 数组，列顺序与 rule_based.MetabolicEnvironment 一致。
+
+    setMetabolite 的截断与标量版相同（边界由 compile_bounds 预编译）；mask 给定时只写入 mask 为 True 的患者。
+    布尔参数（is_postprandial）以 0.0 / 1.0 存放。
+    """
+
+    def __init__(self, n: int, base: MetabolicEnvironment = None):
+        base = base if base is not None else MetabolicEnvironment()
+        self.n = int(n)
+        self.metabolite_names = list(base.metabolites)
+        self.parameter_names = list(base.parameters)
+        self.metabolite_index = {k: i for i, k in enumerate(self.metabolite_names)}
+        self.parameter_index = {k: i for i, k in enumerate(self.parameter_names)}
+        self.metabolites = np.tile(np.array([float(v) for v in base.metabolites.values()]), (self.n, 1))
+        self.parameters = np.tile(np.array([float(v) for v in base.parameters.values()]), (self.n, 1))
+        self.lower, self.upper = compile_bounds(self.metabolite_names)
+        self.km, self.vmax = compile_kinetics(base, self.metabolite_names)
+        self.history_columns = ["time"] + self.metabolite_names + self.parameter_names
+        self._history: Optional[np.ndarray] = None
+        self._history_len = 0
+
+    @classmethod
+    def from_parameters(cls, n: int, base: MetabolicEnvironment = None, **parameters) -> "BatchRuleBasedEnvironment":
+        env = cls(n, base)
+        for name, value in parameters.items():
+            env.setParameter(name, value)
+        return env
+
+    @classmethod
+    def from_environments(cls, envs: Sequence[MetabolicEnvironment]) -> "BatchRuleBasedEnvironment":
+        env = cls(len(envs), envs[0])
+        for i, e in enumerate(envs):
+            env.metabolites[i] = [float(e.metabolites[k]) for k in env.metabolite_names]
+            env.parameters[i] = [float(e.parameters[k]) for k in env.parameter_names]
+        return env
+
+    def getMetabolite(self, name: str) -> np.ndarray:
+        # 返回副本：规则里读出的值在同一步内被当作快照使用
+        return self.metabolites[:, self.metabolite_index[name]].copy()
+
+    def setMetabolite(self, name: str, value, mask: np.ndarray = None) -> None:
+        i = self.metabolite_index[name]
+        value = np.maximum(self.lower[i], np.minimum(self.upper[i], value))
+        if mask is None:
+            self.metabolites[:, i] = value
+        else:
+            self.metabolites[:, i] = np.where(mask, value, self.metabolites[:, i])
+
+    def getParameter(self, name: str) -> np.ndarray:
+        return self.parameters[:, self.parameter_index[name]].copy()
+
+    def setParameter(self, name: str, value, mask: np.ndarray = None) -> None:
+        i = self.parameter_index[name]
+        value = np.asarray(value, dtype=float)
+        if mask is None:
+            self.parameters[:, i] = value
+        else:
+            self.parameters[:, i] = np.where(mask, value, self.parameters[:, i])
+
+    # --- 历史记录：(steps, N, 列)，列为 time + 代谢物 + 参数（与标量版 DataFrame 列顺序相同） ---
+    def reserve_history(self, steps: int) -> None:
+        self._history = np.full((int(steps), self.n, len(self.history_columns)), np.nan)
+        self._history_len = 0
+
+    def record(self, time: float) -> None:
+        if self._history is None:
+            self.reserve_history(64)
+        if self._history_len >= self._history.shape[0]:
+            grown = np.full((2 * self._history.shape[0],) + self._history.shape[1:], np.nan)
+            grown[:self._history_len] = self._history
+            self._history = grown
+        row = self._history[self._history_len]
+        k = len(self.metabolite_names)
+        row[:, 0] = time
+        row[:, 1:1 + k] = self.metabolites
+        row[:, 1 + k:] = self.parameters
+        self._history_len += 1
+
+    def to_array(self) -> np.ndarray:
+        if self._history is None:
+            return np.empty((0, self.n, len(self.history_columns)))
+        return self._history[:self._history_len]
+
+    def column(self, name: str) -> np.ndarray:
+        return self.to_array()[:, :, self.history_columns.index(name)]
+
+    def to_frame(self, patient: int) -> pd.DataFrame:
+        return pd.DataFrame(self.to_array()[:, patient, :], columns=list(self.history_columns))
+
+
+class BatchRuleBasedLiverSystem:
+    """RuleBasedLiverSystem 的批量版本：规则的 if 分支改为按患者的掩码，逐元素结果与标量版一致。"""
+
+    def __init__(self, env: BatchRuleBasedEnvironment):
+        self.env = env
+        self._mm = {k: (float(a), float(b)) for k, a, b in zip(env.metabolite_names, env.km, env.vmax)}
+
+    def michaelis_menten_rate(self, substrate: str, substrate_concentration: np.ndarray) -> np.ndarray:
+        km, vmax = self._mm.get(substrate, (1.0, 1.0))
+        rate = (vmax * substrate_concentration) / (km + substrate_concentration)
+        return rate * self.env.getParameter("rate_modifier")
+
+    def step(self, time: float) -> None:
+        self.env.record(time)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.process_energy_state()
+            self.process_oxidation_reduction_state()
+            self.process_insulin_degradation()
+            self.process_ethanol_metabolism()
+            self.process_bilirubin_metabolism()
+            self.process_phaseII_conjugation()
+            self.process_glucose_homeostasis()
+            self.process_urea_cycle()
+            self.process_lipid_metabolism()
+            self.process_albumin_synthesis()
+
+    def process_energy_state(self) -> None:
+        env = self.env
+        atp, adp, amp = env.getMetabolite("atp"), env.getMetabolite("adp"), env.getMetabolite("amp")
+        total_adenylate = atp + adp + amp
+        target_total = 6.1
+        env.setMetabolite("amp", amp + (target_total - total_adenylate), mask=total_adenylate != target_total)
+
+    def process_oxidation_reduction_state(self) -> None:
+        env = self.env
+        nadh, nad_plus = env.getMetabolite("nadh"), env.getMetabolite("nad_plus")
+        total_nad = nadh + nad_plus
+        target_total = 0.4
+        env.setMetabolite("nad_plus", nad_plus + (target_total - total_nad), mask=total_nad != target_total)
+
+    def process_insulin_degradation(self) -> None:
+        env = self.env
+        ide_activity = env.getParameter("insulin_degrading_enzyme_activity")
+        insulin = env.getMetabolite("insulin")
+        base_degradation_rate = 0.2 * env.getParameter("rate_modifier")
+        ide_effect = ide_activity / (0.5 + ide_activity)
+        insulin_effect = insulin / (3.0 + insulin)
+        degradation_rate = base_degradation_rate * ide_effect * insulin_effect * (1.0 + ide_activity)
+        env.setMetabolite("insulin", insulin - degradation_rate)
+
+    def process_ethanol_metabolism(self) -> None:
+        env = self.env
+        ethanol = env.getMetabolite("ethanol")
+        acetaldehyde = env.getMetabolite("acetaldehyde")
+        acetate = env.getMetabolite("acetate")
+        nadh = env.getMetabolite("nadh")
+        nad_plus = env.getMetabolite("nad_plus")
+        mask = ethanol > 0
+        if not mask.any():
+            return
+        ethanol_degraded = np.minimum(ethanol, self.michaelis_menten_rate("ethanol", ethanol))
+        acetaldehyde_produced = ethanol_degraded
+        redox_ratio = nadh / (nad_plus + 0.01)
+        inhibition_factor = 1.0 / (1.0 + 2.0 * redox_ratio)
+        aldh_rate = 0.15 * env.getParameter("rate_modifier") * inhibition_factor
+        acetaldehyde_degraded = np.minimum(acetaldehyde + acetaldehyde_produced, aldh_rate)
+        nadh_produced = ethanol_degraded + acetaldehyde_degraded
+        env.setMetabolite("ethanol", ethanol - ethanol_degraded, mask)
+        env.setMetabolite("acetaldehyde", acetaldehyde + acetaldehyde_produced - acetaldehyde_degraded, mask)
+        env.setMetabolite("acetate", acetate + acetaldehyde_degraded, mask)
+        env.setMetabolite("nadh", nadh + nadh_produced, mask)
+        env.setMetabolite("nad_plus", nad_plus - nadh_produced, mask)
+
+    def process_bilirubin_metabolism(self) -> None:
+        env = self.env
+        indirect_bilirubin = env.getMetabolite("indirect_bilirubin")
+        direct_bilirubin = env.getMetabolite("direct_bilirubin")
+        udpga = env.getMetabolite("udpga")
+        mask = (indirect_bilirubin > 0) & (udpga > 0)
+        if not mask.any():
+            return
+        conjugation_rate = self.michaelis_menten_rate("indirect_bilirubin", indirect_bilirubin) * env.getParameter("liver_function")
+        conjugation_rate = conjugation_rate * (udpga / (1.0 + udpga))
+        bilirubin_conjugated = np.minimum(indirect_bilirubin, conjugation_rate)
+        udpga_consumed = bilirubin_conjugated * 1.0
+        env.setMetabolite("indirect_bilirubin", indirect_bilirubin - bilirubin_conjugated, mask)
+        env.setMetabolite("direct_bilirubin", direct_bilirubin + bilirubin_conjugated, mask)
+        env.setMetabolite("udpga", udpga - udpga_consumed, mask)
+
+    def process_phaseII_conjugation(self) -> None:
+        env = self.env
+        phaseI_intermediates = env.getMetabolite("phaseI_intermediates")
+        conjugates = env.getMetabolite("conjugates")
+        udpga = env.getMetabolite("udpga")
+        paps = env.getMetabolite("paps")
+        gsh = env.getMetabolite("gsh")
+        total_cofactor = udpga + paps + gsh
+        mask = (phaseI_intermediates > 0) & (total_cofactor > 0)
+        if not mask.any():
+            return
+        conjugation_rate = self.michaelis_menten_rate("phaseI_intermediates", phaseI_intermediates) * env.getParameter("liver_function")
+        intermediates_conjugated = np.minimum(phaseI_intermediates, conjugation_rate)
+        env.setMetabolite("phaseI_intermediates", phaseI_intermediates - intermediates_conjugated, mask)
+        env.setMetabolite("conjugates", conjugates + intermediates_conjugated, mask)
+        env.setMetabolite("udpga", udpga - intermediates_conjugated * (udpga / total_cofactor), mask)
+        env.setMetabolite("paps", paps - intermediates_conjugated * (paps / total_cofactor), mask)
+        env.setMetabolite("gsh", gsh - intermediates_conjugated * (gsh / total_cofactor), mask)
+
+    def process_glucose_homeostasis(self) -> None:
+        env = self.env
+        glucose = env.getMetabolite("glucose")
+        glycogen = env.getMetabolite("glycogen")
+        insulin = env.getMetabolite("insulin")
+        glucagon = env.getMetabolite("glucagon")
+        is_postprandial = env.getParameter("is_postprandial") != 0
+        rate_modifier = env.getParameter("rate_modifier")
+        insulin_effect = 1.0 + (insulin / 10.0) ** 2
+        glucagon_effect = 1.0 + (glucagon / 5.0) ** 2
+
+        glucose_initial = 5.0
+        glucose_peak_limit = glucose_initial * 2.0
+        over_peak = glucose > glucose_peak_limit
+        storing = ~over_peak & (is_postprandial | (glucose > 5.5))
+        releasing = ~over_peak & ~storing & (glucose < 4.0)
+        # 超过峰值：多余血糖转糖原；餐后/高血糖：按胰岛素效应合成糖原；两者共用糖原上限处理
+        env.setMetabolite("glucose", np.full(env.n, glucose_peak_limit), over_peak)
+        synthesis = np.where(over_peak, (glucose - glucose_peak_limit) * 0.5 * insulin_effect, 0.5 * insulin_effect * rate_modifier)
+        new_glycogen = glycogen + synthesis
+        overflow = (over_peak | storing) & (new_glycogen > 100.0)
+        env.setMetabolite("triglycerides", env.getMetabolite("triglycerides") + (new_glycogen - 100.0) * 0.01, overflow)
+        new_glycogen = np.where(overflow, 100.0, new_glycogen)
+        env.setMetabolite("glycogen", new_glycogen, over_peak | storing)
+        # 低血糖：糖原分解
+        glycogen_degraded = np.minimum(glycogen, 0.3 * glucagon_effect * rate_modifier)
+        env.setMetabolite("glycogen", glycogen - glycogen_degraded, releasing)
+        env.setMetabolite("glucose", glucose + glycogen_degraded * 0.1, releasing)
+
+        # 糖酵解（与标量版一样基于本过程开始时读到的 glucose）
+        glucose_used = np.minimum(glucose, self.michaelis_menten_rate("glucose", glucose))
+        env.setMetabolite("glucose", glucose - glucose_used)
+        atp_produced = glucose_used * 2
+        env.setMetabolite("atp", env.getMetabolite("atp") + atp_produced)
+        env.setMetabolite("adp", env.getMetabolite("adp") - atp_produced)
+
+        # 酮体生成
+        ketogenic = (glucose < 4.5) & (glycogen < 10.0)
+        if ketogenic.any():
+            fatty_acid = env.getMetabolite("fatty_acid")
+            fatty_acid_used = np.minimum(fatty_acid, 0.1 * rate_modifier)
+            env.setMetabolite("fatty_acid", fatty_acid - fatty_acid_used, ketogenic)
+            env.setMetabolite("ketone_body", env.getMetabolite("ketone_body") + fatty_acid_used * 0.5, ketogenic)
+
+    def process_urea_cycle(self) -> None:
+        env = self.env
+        ammonia = env.getMetabolite("ammonia")
+        urea = env.getMetabolite("urea")
+        atp = env.getMetabolite("atp")
+        mask = ammonia > 0.03
+        if not mask.any():
+            return
+        urea_synthesis_rate = self.michaelis_menten_rate("ammonia", ammonia) * env.getParameter("liver_function")
+        urea_synthesis_rate = urea_synthesis_rate * (atp / (2.0 + atp))
+        ammonia_used = np.minimum(ammonia, urea_synthesis_rate)
+        atp_used = ammonia_used * 2
+        env.setMetabolite("ammonia", ammonia - ammonia_used, mask)
+        env.setMetabolite("urea", urea + ammonia_used * 0.5, mask)
+        env.setMetabolite("atp", atp - atp_used, mask)
+        env.setMetabolite("adp", env.getMetabolite("adp") + atp_used, mask)
+
+    def process_albumin_synthesis(self) -> None:
+        env = self.env
+        albumin = env.getMetabolite("albumin")
+        amino_acid = env.getMetabolite("amino_acid")
+        atp = env.getMetabolite("atp")
+        base_synthesis_rate = (12.0 / 24.0) * 0.01 * env.getParameter("rate_modifier") * env.getParameter("liver_function")
+        amino_acid_effect = amino_acid / (3.0 + amino_acid)
+        atp_effect = atp / (3.0 + atp)
+        albumin_synthesis_rate = base_synthesis_rate * amino_acid_effect * atp_effect
+        amino_acid_used = albumin_synthesis_rate * 0.1
+        atp_used = albumin_synthesis_rate * 5.0
+        mask = (amino_acid > 2.0) & (atp > 2.0) & (amino_acid >= amino_acid_used) & (atp >= atp_used)
+        if not mask.any():
+            return
+        new_albumin = albumin + albumin_synthesis_rate
+        new_albumin = np.where(new_albumin > 55.0, 55.0, new_albumin)
+        env.setMetabolite("albumin", new_albumin, mask)
+        env.setMetabolite("amino_acid", amino_acid - amino_acid_used, mask)
+        env.setMetabolite("atp", atp - atp_used, mask)
+        env.setMetabolite("adp", env.getMetabolite("adp") + atp_used, mask)
+
+    def process_lipid_metabolism(self) -> None:
+        env = self.env
+        fatty_acid = env.getMetabolite("fatty_acid")
+        triglycerides = env.getMetabolite("triglycerides")
+        insulin = env.getMetabolite("insulin")
+        glucose = env.getMetabolite("glucose")
+        is_postprandial = env.getParameter("is_postprandial") != 0
+        # 餐后：甘油三酯合成（超过 1.8 的部分输出）
+        insulin_effect = insulin / (10.0 + insulin)
+        glucose_effect = glucose / (5.0 + glucose)
+        tg_synthesis_rate = 0.1 * insulin_effect * glucose_effect * env.getParameter("rate_modifier")
+        # 空腹：β 氧化
+        beta_oxidation_rate = self.michaelis_menten_rate("fatty_acid", fatty_acid)
+        fatty_acid_used = np.minimum(fatty_acid, np.where(is_postprandial, tg_synthesis_rate, beta_oxidation_rate))
+        new_triglycerides = triglycerides + fatty_acid_used * 0.3
+        new_triglycerides = np.where(new_triglycerides > 1.8, 1.8, new_triglycerides)
+        fasting = ~is_postprandial
+        atp_produced = fatty_acid_used * 10
+        env.setMetabolite("fatty_acid", fatty_acid - fatty_acid_used)
+        env.setMetabolite("triglycerides", new_triglycerides, is_postprandial)
+        env.setMetabolite("atp", env.getMetabolite("atp") + atp_produced, fasting)
+        env.setMetabolite("adp", env.getMetabolite("adp") - atp_produced, fasting)
+
+
+def compile_events(events: Union[pd.DataFrame, Iterable[Event]], env: BatchRuleBasedEnvironment, minutes: int) -> Dict[int, List[_Op]]:
+    """把事件表编译成 {步数: [操作, ...]}，只有存在事件的步才有条目。
+
+    同一步内的操作严格按表中行顺序执行，每行之后按代谢物上下界截断，与标量 Plan / inject 回调逐行写入一致。
+    相邻且同目标、同 op 的行合并为一次向量化写入（结果不变时）：set 以靠后的为准，max / min 取最严格的阈值，
+    add 只在各行作用的患者互不重叠时合并（重叠时逐行相加并各自截断）。
+    """
+    rows = events.to_dict("records") if isinstance(events, pd.DataFrame) else list(events)
+    # 每步的操作组：[op, 目标, 患者数组列表, 值数组列表, 已覆盖患者的掩码]
+    steps: Dict[int, List[list]] = {}
+    for e in rows:
+        op = e.get("op", "add")
+        if op not in ("add", "set", "max", "min"):
+            raise ValueError(f"Unknown event op: {op}")
+        target = e["target"]
+        if target not in env.metabolite_index and target not in env.parameter_index:
+            raise KeyError(f"Unknown event target: {target}")
+        start = int(e["start"])
+        end = e.get("end")
+        end = start + 1 if end is None or pd.isna(end) else int(end)
+        every = e.get("every")
+        every = 1 if every is None or pd.isna(every) else int(every)
+        patient = e.get("patient")
+        idx = np.arange(env.n) if patient is None or pd.isna(patient) else np.array([int(patient)])
+        value = np.full(len(idx), float(e["value"]))
+        for t in range(start, min(end, minutes), every):
+            ops = steps.setdefault(t, [])
+            last = ops[-1] if ops else None
+            if last is not None and last[0] == op and last[1] == target and not (op == "add" and last[4][idx].any()):
+                last[2].append(idx)
+                last[3].append(value)
+                last[4][idx] = True
+            else:
+                covered = np.zeros(env.n, dtype=bool)
+                covered[idx] = True
+                ops.append([op, target, [idx], [value], covered])
+    plan: Dict[int, List[_Op]] = {}
+    for t in sorted(steps):
+        for op, target, patients, values, _ in steps[t]:
+            idx, value = np.concatenate(patients), np.concatenate(values)
+            if op in ("max", "min"):
+                idx, inverse = np.unique(idx, return_inverse=True)
+                ufunc = np.maximum if op == "max" else np.minimum
+                merged = np.full(len(idx), -np.inf if op == "max" else np.inf)
+                ufunc.at(merged, inverse, value)
+                value = merged
+            elif op == "set":
+                # 每个患者保留最后一次 set
+                idx, last = np.unique(idx[::-1], return_index=True)
+                value = value[::-1][last]
+            if len(idx) == env.n and value.min() == value.max():
+                idx, value = None, float(value[0])
+            kind, col = ("m", env.metabolite_index[target]) if target in env.metabolite_index else ("p", env.parameter_index[target])
+            plan.setdefault(t, []).append((op, kind, col, idx, value))
+    return plan
+
+
+def _apply(env: BatchRuleBasedEnvironment, ops: List[_Op]) -> None:
+    for op, kind, col, idx, value in ops:
+        arr = env.metabolites if kind == "m" else env.parameters
+        rows = slice(None) if idx is None else idx
+        cur = arr[rows, col]
+        if op == "add":
+            new = cur + value
+        elif op == "max":
+            new = np.maximum(cur, value)
+        elif op == "min":
+            new = np.minimum(cur, value)
+        else:
+            new = value
+        if kind == "m":
+            new = np.maximum(env.lower[col], np.minimum(env.upper[col], new))
+        arr[rows, col] = new
+
+
+def run_batch_simulation(env: BatchRuleBasedEnvironment, minutes: int,
+                         events: Union[pd.DataFrame, Iterable[Event]] = None) -> np.ndarray:
+    """按分钟推进 N 个环境，返回 (minutes, N, 列) 历史数组（列见 env.history_columns）。
+
+    events 为事件表（见 Event），第 t 步的事件在该步求值前写入，等价于标量版 run_simulation 里
+    inject(env, t) 的 setMetabolite/setParameter 调用。
+    """
+    system = BatchRuleBasedLiverSystem(env)
+    plan = compile_events(events, env, minutes) if events is not None else {}
+    env.reserve_history(minutes)
+    for t in range(minutes):
+        ops = plan.get(t)
+        if ops:
+            _apply(env, ops)
+        system.step(t / 60.0)
+    return env.to_array()
@@ -0,0 +1,67 @@
+import importlib
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from checkpoint import load_checkpoint
+from history import LazyHistory
+from simulate import MetabolicEnvironment
+
+# 场景结果的跨进程形式：(列名, ndarray)，或流式输出时的历史文件路径
+_Payload = Union[Tuple[List[str], np.ndarray], str]
+
+
+def _run_case(module: str, name: str, checkpoint: str = None, stream: str = None,
+              columns: Union[Iterable[str], Callable[[str], bool]] = None) -> Tuple[_Payload, List[Dict[str, Any]]]:
+    # 子进程内按 "模块.SCENARIOS[名称]" 查找并运行（inject 闭包无法 pickle，只传名称）
+    case = importlib.import_module(module).SCENARIOS[name]
+    env, t0 = None, 0
+    if checkpoint is not None:
+        # 从预热检查点分叉：场景在恢复出的环境上、从检查点所在步数继续
+        env, header = load_checkpoint(checkpoint, history=False)
+        t0 = header["step"]
+    if stream is not None:
+        env = env or MetabolicEnvironment()
+        env.stream_history(stream, columns=columns)
+    df, events = case() if env is None else case(env=env, t0=t0)
+    if stream is not None:
+        env.recorder.close()
+        return stream, events
+    return (list(df.columns), df.to_numpy(dtype=np.float64)), events
+
+
+def _restore(payload: _Payload) -> Union[pd.DataFrame, LazyHistory]:
+    if isinstance(payload, str):
+        return LazyHistory(payload)
+    return pd.DataFrame(payload[1], columns=payload[0])
+
+
+def run_scenarios(module: str, names: Sequence[str] = None, jobs: int = None, checkpoint: str = None,
+                  stream_dir: str = None, fmt: str = ".parquet",
+                  columns: Union[Iterable[str], Callable[[str], bool]] = None) -> Dict[str, Tuple[Union[pd.DataFrame, LazyHistory], List[Dict[str, Any]]]]:
+    """运行 module.SCENARIOS 中的场景，返回 {名称: (df, events)}，顺序与 names 一致。
+
+    jobs=1 时在当前进程内顺序执行；否则每个场景提交到进程池，结果以
+    (列名, ndarray, events) 的形式回传后再还原为 DataFrame。
+    给定 checkpoint（如 checkpoint.warm_start 的预热结果）时，每个场景都从该检查点恢复后运行，
+    场景函数需接受 env 与 t0（起始步数）参数。
+    给定 stream_dir 时各场景的历史按行组流式写入 stream_dir/<名称><fmt>（columns 为列投影），
+    返回的 df 为按列惰性读取的 LazyHistory；同样要求场景函数接受 env 与 t0。多进程执行时 columns 需可 pickle（用列名列表）。
+    """
+    registry = importlib.import_module(module).SCENARIOS
+    names = list(registry) if names is None else list(names)
+    jobs = jobs or os.cpu_count() or 1
+    streams = {name: os.path.join(stream_dir, f"{name}{fmt}") if stream_dir else None for name in names}
+    results: Dict[str, Tuple[_Payload, List[Dict[str, Any]]]] = {}
+    if jobs == 1 or len(names) <= 1:
+        for name in names:
+            results[name] = _run_case(module, name, checkpoint, streams[name], columns)
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(names))) as ex:
+            futs = {ex.submit(_run_case, module, name, checkpoint, streams[name], columns): name for name in names}
+            for f in as_completed(futs):
+                results[futs[f]] = f.result()
+    return {name: (_restore(results[name][0]), results[name][1]) for name in names}
@@ -0,0 +1,196 @@
+import json
+import operator
+from collections.abc import Sequence
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# 事件表的一行（与 rule_based_batch.Event 相同）：
+#   {"target": 名称, "value": 数值, "start": 步, "end": 步(不含，默认 start+1), "every": 间隔(默认 1),
+#    "op": "add" | "set" | "max" | "min"(默认 "add"), "patient": 患者编号或 None(全部)}
+# 在 [start, end) 内每 every 步执行一次：add 为注射/输注，set 为开关切换，max/min 为下限/上限钳制。
+Event = Mapping[str, Any]
+COLUMNS = ["target", "value", "start", "end", "every", "op", "patient"]
+OPS = ("add", "set", "max", "min")
+
+
+def _set(cur, value):
+    # 规则模型的布尔开关保持 bool 类型
+    return bool(value) if isinstance(cur, bool) else value
+
+
+def _maximum(cur, value):
+    return np.maximum(cur, value) if isinstance(cur, np.ndarray) else max(cur, value)
+
+
+def _minimum(cur, value):
+    return np.minimum(cur, value) if isinstance(cur, np.ndarray) else min(cur, value)
+
+
+_FN: Dict[str, Callable[[Any, Any], Any]] = {"add": operator.add, "set": _set, "max": _maximum, "min": _minimum}
+
+
+def _missing(v: Any) -> bool:
+    return v is None or (isinstance(v, float) and np.isnan(v))
+
+
+def _row(e: Event) -> Dict[str, Any]:
+    # 规范化一行：缺省列补 None，NaN（来自 DataFrame/CSV）视为缺省
+    row = {k: (None if _missing(e.get(k)) else e.get(k)) for k in COLUMNS}
+    if row["target"] is None or row["start"] is None or row["value"] is None:
+        raise ValueError(f"Schedule event needs target/value/start: {dict(e)}")
+    row["op"] = row["op"] or "add"
+    if row["op"] not in OPS:
+        raise ValueError(f"Unknown event op: {row['op']}")
+    row["value"] = float(row["value"])
+    for k in ("start", "end", "every", "patient"):
+        if row[k] is not None:
+            row[k] = int(row[k])
+    return row
+
+
+class Schedule(Sequence):
+    """声明式注入计划：有序的事件表，替代逐步调用的 inject(env, t) 闭包。
+
+    可序列化（to_json/to_frame），可 pickle（进程池场景），可直接传给 rule_based_batch.run_batch_simulation；
+    其余 runner 通过 as_inject 编译为 Plan。同一步内的操作按行顺序执行。
+    """
+
+    def __init__(self, events: Union[pd.DataFrame, Iterable[Event]] = ()):
+        rows = events.to_dict("records") if isinstance(events, pd.DataFrame) else events
+        self.events: List[Dict[str, Any]] = [_row(e) for e in rows]
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def __getitem__(self, i):
+        return self.events[i]
+
+    def __repr__(self) -> str:
+        # 稳定的文本表示，checkpoint.warmup_key 以此区分不同计划
+        return f"Schedule({self.to_json()})"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Schedule) and self.events == other.events
+
+    # --- 构造 ---
+    def add(self, target: str, value: float, start: int, end: int = None, every: int = None,
+            op: str = "add", patient: int = None) -> "Schedule":
+        self.events.append(_row({"target": target, "value": value, "start": start, "end": end,
+                                 "every": every, "op": op, "patient": patient}))
+        return self
+
+    def bolus(self, target: str, amount: float, at: int, every: int = None, until: int = None,
+              patient: int = None) -> "Schedule":
+        """在 at 步一次性加入 amount；给定 every 时每 every 步重复，直到 until（不含）。"""
+        end = until if every is not None else None
+        return self.add(target, amount, at, end, every, "add", patient)
+
+    def infusion(self, target: str, rate: float, start: int, end: int, patient: int = None) -> "Schedule":
+        """在 [start, end) 内每步加入 rate。"""
+        return self.add(target, rate, start, end, None, "add", patient)
+
+    def set(self, target: str, value: float, at: int = 0, patient: int = None) -> "Schedule":
+        """在 at 步把 target 设为 value 并保持（模型不改写的开关/参数）。"""
+        return self.add(target, value, at, None, None, "set", patient)
+
+    def window(self, target: str, start: int, end: int, on: float = 1.0, off: float = 0.0,
+               patient: int = None) -> "Schedule":
+        """[start, end) 内 target 为 on，end 起恢复 off（如餐后窗口 is_postprandial）。"""
+        return self.set(target, on, start, patient).set(target, off, end, patient)
+
+    def floor(self, target: str, value: float, start: int, end: int, patient: int = None) -> "Schedule":
+        """[start, end) 内每步把 target 钳制到不低于 value。"""
+        return self.add(target, value, start, end, None, "max", patient)
+
+    def ceiling(self, target: str, value: float, start: int, end: int, patient: int = None) -> "Schedule":
+        """[start, end) 内每步把 target 钳制到不高于 value。"""
+        return self.add(target, value, start, end, None, "min", patient)
+
+    # --- 序列化 ---
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.events, columns=COLUMNS)
+
+    def to_json(self, path: str = None) -> str:
+        text = json.dumps(self.events, ensure_ascii=False)
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    @classmethod
+    def from_json(cls, text_or_path: str) -> "Schedule":
+        text = text_or_path
+        if not text_or_path.lstrip().startswith("["):
+            with open(text_or_path, "r", encoding="utf-8") as f:
+                text = f.read()
+        return cls(json.loads(text))
+
+    # --- 编译 ---
+    def compile(self, env: Any, minutes: int, patient: int = None) -> "Plan":
+        """按 env 解析目标（参数 / 信号 / 代谢物），展开为 {步: [操作, ...]}，只有存在事件的步才有条目。
+
+        env 为批量环境（有属性 n）时，指定了 patient 的行只作用于该患者；标量环境下这些行只在
+        compile(..., patient=该编号) 时生效。
+        """
+        n = getattr(env, "n", None)
+        queue: Dict[int, List[Tuple]] = {}
+        for e in self.events:
+            mask = None
+            if e["patient"] is not None:
+                if n is None:
+                    if e["patient"] != patient:
+                        continue
+                else:
+                    mask = np.zeros(n, dtype=bool)
+                    mask[e["patient"]] = True
+            get, put = _accessors(env, e["target"])
+            end = e["start"] + 1 if e["end"] is None else e["end"]
+            op = (_FN[e["op"]], get, put, e["target"], e["value"], mask)
+            for t in range(e["start"], min(end, minutes), e["every"] or 1):
+                queue.setdefault(t, []).append(op)
+        return Plan(queue, self)
+
+
+def _accessors(env: Any, name: str) -> Tuple[Callable, Callable]:
+    # 与 sweep._apply 相同的解析顺序：参数 > 信号 > 代谢物
+    for kind, attr in (("Parameter", "parameter"), ("Signal", "signal"), ("Metabolite", "metabolite")):
+        index = getattr(env, f"{attr}_index", None)
+        names = index if index is not None else getattr(env, f"{attr}s", None)
+        if names is not None and name in names:
+            return getattr(type(env), f"get{kind}"), getattr(type(env), f"set{kind}")
+    raise KeyError(f"Unknown schedule target: {name}")
+
+
+class Plan:
+    """编译后的计划：作为 inject(env, t) 调用时只在有事件的步执行写入，其余步只做一次字典查找。"""
+
+    def __init__(self, queue: Dict[int, List[Tuple]], schedule: Schedule):
+        self.queue = queue
+        self.schedule = schedule
+
+    @property
+    def steps(self) -> List[int]:
+        """有事件的步（升序）。"""
+        return sorted(self.queue)
+
+    def __call__(self, env: Any, t: int) -> None:
+        ops = self.queue.get(t)
+        if ops is None:
+            return
+        for fn, get, put, name, value, mask in ops:
+            cur = get(env, name)
+            new = fn(cur, value)
+            put(env, name, new if mask is None else np.where(mask, new, cur))
+
+    def __repr__(self) -> str:
+        return f"Plan({self.schedule.to_json()})"
+
+
+def as_inject(inject: Union[Schedule, Callable[[Any, int], None], None], env: Any, minutes: int,
+              patient: int = None) -> Optional[Callable[[Any, int], None]]:
+    """runner 入口：Schedule 编译为 Plan，普通 inject 回调原样返回。"""
+    if isinstance(inject, Schedule):
+        return inject.compile(env, minutes, patient)
+    return inject
@@ -1,115 +1,271 @@
+import threading
 import numpy as np
-from typing import Dict, Any
-from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import pandas as pd
+from history import HistoryRecorder, HistorySink, HistoryView, open_sink
+from symbols import SlotView, SymbolTable
+
+
+# 默认初值；其名称顺序即 SYMBOLS 中的槽位顺序（也是历史记录的列顺序）
+_DEFAULT_METABOLITES = {
+    # --- 糖代谢 (mmol/L) ---
+    "glucose": 5.0,            # 正常空腹血糖 3.9-6.1 mmol/L
+    "glycogen": 400.0,         # 肝糖原储备，约 100-120g，此处设定为储备浓度单位
+    "pyruvate": 0.1,           # 丙酮酸正常水平较低 (0.05-0.2)
+    "lactate": 1.0,            # 正常乳酸 < 2.0 mmol/L
+
+    # --- 脂代谢 (mmol/L) ---
+    "fatty_acid": 0.5,         # 游离脂肪酸 0.2-0.6 mmol/L
+    "triglycerides": 1.2,      # 甘油三酯 < 1.7 mmol/L
+    "glycerol": 0.1,           # 甘油正常水平
+    "cholesterol": 4.5,        # 总胆固醇 3.1-5.2 mmol/L
+    "bile_acid": 0.005,        # 血清胆汁酸极低，主要在胆囊循环
+
+    # --- 蛋白质与氮代谢 (mmol/L) ---
+    "amino_acid": 2.5,         # 总氨基酸水平
+    "ammonia": 0.03,           # 血氨极低 (0.01-0.06)，高了会中毒
+    "urea": 5.0,               # 尿素氮 2.5-7.1 mmol/L
+    "albumin": 0.6,            # 约 40g/L，换算摩尔浓度约为 0.6 mmol/L
+    "clotting_factor": 1.0,    # 相对活性单位
+
+    # --- 能量与辅酶 (肝细胞内估计浓度 mmol/L) ---
+    "atp": 3.0,                # 胞内 ATP 浓度 2-5 mmol/L
+    "adp": 0.5,                # ATP/ADP 比例通常维持在 5-10
+    "nad_plus": 0.5,           # 辅酶池总浓度在 0.5-1.0 左右
+    "nadh": 0.05,              # 正常态 NAD+/NADH 比例约为 10:1
+    "nadph": 0.3,              # 主要用于合成，浓度较稳定
+    "acetyl_coa": 0.01,        # 关键中间产物，流转极快，浓度极低
+    "ketone_body": 0.1,        # 非饥饿状态极低
+
+    # --- 氧化还原与解毒 (mmol/L) ---
+    "gsh": 5.0,                # 还原型谷胱甘肽是肝脏主打，浓度较高
+    "udpga": 0.5,              # 葡萄糖醛酸供体
+    "paps": 0.1,               # 硫酸化供体
+    "indirect_bilirubin": 0.01,# 正常总胆红素 < 0.02
+    "direct_bilirubin": 0.002,
+    "oxygen": 5.0,             # 肝静脉/组织供氧水平 (动脉为 13, 组织约 5)
+
+    # --- 辅酶再生原料 (μmol/L 级别，设为 mmol 匹配单位) ---
+    "nicotinamide": 0.05,      # 烟酰胺 (Salvage途径原料)
+    "niacin": 0.02,            # 烟酸
+    "tryptophan": 0.08,        # 色氨酸 (De Novo原料)
+
+    # --- 酒精代谢相关 (初始为 0) ---
+    "ethanol": 0.0,
+    "acetaldehyde": 0.0,
+    "acetate": 0.0,
+    "phaseI_intermediates": 0.0,
+    "conjugates": 0.0,
+    "napqi": 0.0,
+
+    # --- 尿素循环中间体 (mmol/L) ---
+    "ornithine": 0.1,
+    "citrulline": 0.03,
+    "argininosuccinate": 0.01,
+    "arginine": 0.1
+}
+_DEFAULT_SIGNALS = {
+    "insulin": 0.5,
+    "glucagon": 0.5,
+    "epinephrine": 0.1,
+    "cortisol": 0.1,
+    "inflammation": 0.0
+}
+_DEFAULT_PARAMETERS = {
+    "oxygen_pressure": 100.0,
+    "pH": 7.4,
+    "temperature": 37.0,
+    "is_postprandial": False,
+    "insulin_degrading_enzyme_activity": 1.0,
+    "liver_function": 1.0,
+    "xenobiotic_load": 0.0,
+    "insulin_sensitivity": 1.0,
+    "aldh_activity": 1.0
+}
+
+# 模型加载时为每个代谢物 / 信号 / 参数分配固定槽位
+SYMBOLS = SymbolTable(_DEFAULT_METABOLITES, _DEFAULT_SIGNALS, _DEFAULT_PARAMETERS)
+MET = SYMBOLS.namespace("metabolites")
+SIG = SYMBOLS.namespace("signals")
+PAR = SYMBOLS.namespace("parameters")
+
+# 反应速率的全部名称（历史中的 rate_* 列）；流式输出历史时预先声明，使 schema 在首个行组前即完整
+RATE_NAMES = [
+    "hexokinase_or_glucokinase", "pgm_G6P_to_G1P", "udpGlucoseSynthesis", "glycogenSynthaseStep",
+    "branchingEnzymeStep", "glycogenPhosphorylaseStep", "debranchingEnzymeStep", "g1p_to_g6p",
+    "pepck_OAA_to_PEP", "g6pase_G6P_to_Glucose", "glycolysis_middle_steps", "pyruvateKinase_step",
+    "fattyAcidSynthesis", "betaOxidation", "deNovoLipogenesis", "lipidTransport", "adiposeLipolysis",
+    "aminoAcidCatabolism", "aminoAcidSynthesisTransport", "oxidativePhosphorylation", "ketogenesis",
+    "lactateFermentation", "nampt_Salvage", "deNovoNADSynthesis", "cps1_Ammonia_to_CarbamoylPhosphate",
+    "otc_CarbamoylPhosphate_to_Citrulline", "ass1_Citrulline_to_ASP_Argininosuccinate",
+    "asl_Argininosuccinate_to_Arginine_Fumarate", "arg1_Arginine_to_Urea_Ornithine", "phaseI_OxRed",
+    "phaseII_Conjugation", "bilirubinUGT", "ethanol_ADH", "acetaldehyde_ALDH", "acetate_to_acetylcoa",
+    "bileAcidSynthesis", "plasmaProteinSynthesis", "coagulationFactorSynthesis", "cytosolicATPase_load",
+]
 
 
 class MetabolicEnvironment:
+    """状态按 symbols 的槽位存放在 m / s / p 三个 float 列表中。
+
+    反应函数用预先解析的槽位直接读取（ctx.env.m[MET.glucose]）；getMetabolite 等按名称的接口与
+    metabolites / signals / parameters 三个 dict 视图保留为兼容层。写入未知名称时追加槽位。
+    """
+
+    __slots__ = ("symbols", "m", "s", "p", "recorder", "current_rates", "_shared", "_layout")
+
+    _ATTRS = {"metabolites": "m", "signals": "s", "parameters": "p"}
+
     def __init__(self):
-        self.metabolites = {
-            # --- 糖代谢 (mmol/L) ---
-            "glucose": 5.0,            # 正常空腹血糖 3.9-6.1 mmol/L
-            "glycogen": 400.0,         # 肝糖原储备，约 100-120g，此处设定为储备浓度单位
-            "pyruvate": 0.1,           # 丙酮酸正常水平较低 (0.05-0.2)
-            "lactate": 1.0,            # 正常乳酸 < 2.0 mmol/L
-
-            # --- 脂代谢 (mmol/L) ---
-            "fatty_acid": 0.5,         # 游离脂肪酸 0.2-0.6 mmol/L
-            "triglycerides": 1.2,      # 甘油三酯 < 1.7 mmol/L
-            "glycerol": 0.1,           # 甘油正常水平
-            "cholesterol": 4.5,        # 总胆固醇 3.1-5.2 mmol/L
-            "bile_acid": 0.005,        # 血清胆汁酸极低，主要在胆囊循环
-
-            # --- 蛋白质与氮代谢 (mmol/L) ---
-            "amino_acid": 2.5,         # 总氨基酸水平
-            "ammonia": 0.03,           # 血氨极低 (0.01-0.06)，高了会中毒
-            "urea": 5.0,               # 尿素氮 2.5-7.1 mmol/L
-            "albumin": 0.6,            # 约 40g/L，换算摩尔浓度约为 0.6 mmol/L
-            "clotting_factor": 1.0,    # 相对活性单位
-
-            # --- 能量与辅酶 (肝细胞内估计浓度 mmol/L) ---
-            "atp": 3.0,                # 胞内 ATP 浓度 2-5 mmol/L
-            "adp": 0.5,                # ATP/ADP 比例通常维持在 5-10
-            "nad_plus": 0.5,           # 辅酶池总浓度在 0.5-1.0 左右
-            "nadh": 0.05,              # 正常态 NAD+/NADH 比例约为 10:1
-            "nadph": 0.3,              # 主要用于合成，浓度较稳定
-            "acetyl_coa": 0.01,        # 关键中间产物，流转极快，浓度极低
-            "ketone_body": 0.1,        # 非饥饿状态极低
-
-            # --- 氧化还原与解毒 (mmol/L) ---
-            "gsh": 5.0,                # 还原型谷胱甘肽是肝脏主打，浓度较高
-            "udpga": 0.5,              # 葡萄糖醛酸供体
-            "paps": 0.1,               # 硫酸化供体
-            "indirect_bilirubin": 0.01,# 正常总胆红素 < 0.02
-            "direct_bilirubin": 0.002,
-            "oxygen": 5.0,             # 肝静脉/组织供氧水平 (动脉为 13, 组织约 5)
-
-            # --- 辅酶再生原料 (μmol/L 级别，设为 mmol 匹配单位) ---
-            "nicotinamide": 0.05,      # 烟酰胺 (Salvage途径原料)
-            "niacin": 0.02,            # 烟酸
-            "tryptophan": 0.08,        # 色氨酸 (De Novo原料)
-
-            # --- 酒精代谢相关 (初始为 0) ---
-            "ethanol": 0.0,
-            "acetaldehyde": 0.0,
-            "acetate": 0.0,
-            "phaseI_intermediates": 0.0,
-            "conjugates": 0.0,
-            "napqi": 0.0,
-
-            # --- 尿素循环中间体 (mmol/L) ---
-            "ornithine": 0.1,
-            "citrulline": 0.03,
-            "argininosuccinate": 0.01,
-            "arginine": 0.1
-        }
-        self.signals = {
-            "insulin": 0.5,
-            "glucagon": 0.5,
-            "epinephrine": 0.1,
-            "cortisol": 0.1,
-            "inflammation": 0.0
-        }
-        self.parameters = {
-            "oxygen_pressure": 100.0,
-            "pH": 7.4,
-            "temperature": 37.0,
-            "is_postprandial": False,
-            "insulin_degrading_enzyme_activity": 1.0,
-            "liver_function": 1.0,
-            "xenobiotic_load": 0.0,
-            "insulin_sensitivity": 1.0,
-            "aldh_activity": 1.0
-        }
-        self.history = []
+        self.symbols = SYMBOLS
+        self.m = [float(v) for v in _DEFAULT_METABOLITES.values()]
+        self.s = [float(v) for v in _DEFAULT_SIGNALS.values()]
+        self.p = [float(v) for v in _DEFAULT_PARAMETERS.values()]
+        self.recorder = HistoryRecorder()
         self.current_rates = {}
+        # 为 True 时有 ResourcePool 正引用本环境的槽位列表：经 set*/writeOutputs 写入前先换成副本
+        self._shared = False
+        self._layout = None
+
+    @property
+    def metabolites(self) -> SlotView:
+        return SlotView(self, "metabolites", "m")
+
+    @metabolites.setter
+    def metabolites(self, values: Dict[str, float]) -> None:
+        self.load("metabolites", values)
+
+    @property
+    def signals(self) -> SlotView:
+        return SlotView(self, "signals", "s")
+
+    @signals.setter
+    def signals(self, values: Dict[str, float]) -> None:
+        self.load("signals", values)
+
+    @property
+    def parameters(self) -> SlotView:
+        return SlotView(self, "parameters", "p")
+
+    @parameters.setter
+    def parameters(self, values: Dict[str, float]) -> None:
+        self.load("parameters", values)
+
+    @property
+    def history(self) -> HistoryView:
+        return HistoryView(self.recorder)
+
+    @history.setter
+    def history(self, records) -> None:
+        self.recorder = HistoryRecorder(len(records))
+        for r in records:
+            self.recorder.append(r)
+
+    def reserve_history(self, steps: int) -> None:
+        self.recorder.reserve(steps)
+
+    def stream_history(self, sink: Union[str, HistorySink], row_group: int = 4096, columns=None, **options) -> None:
+        """把历史按行组流式写入 sink（路径按扩展名选择格式），columns 为写出时的列投影。
+
+        options 传给 sink，例如 .mmap 的 dtype=np.float32 / dt / start。运行结束后调用 recorder.close() 写出剩余行。
+        """
+        if isinstance(sink, str):
+            sink = open_sink(sink, **options)
+        self.recorder.declare(list(self.symbols.names) + ["rate_" + n for n in RATE_NAMES] + ["time"])
+        self.recorder.stream(sink, row_group, columns)
+
+    def to_frame(self, copy: bool = True) -> pd.DataFrame:
+        return self.recorder.to_frame(copy)
 
     def update_history(self, t):
-        rate_fields = {f"rate_{k}": float(v) for k, v in self.current_rates.items()}
-        record = {**self.metabolites, **self.signals, **self.parameters, **rate_fields, "time": t}
-        self.history.append(record)
+        recorder, names = self.recorder, self.symbols.names
+        layout = self._layout
+        if layout is None or layout[0] is not recorder or layout[1] is not names:
+            layout = self._layout = (recorder, names, recorder.layout(names))
+        recorder.append_values(layout[2], self.m + self.s + self.p, (
+            ("rate_", self.current_rates),
+            ("", {"time": t}),
+        ))
         self.current_rates.clear()
 
+    def unshare(self) -> None:
+        """写时复制：让仍引用旧列表的快照保持不变，本环境改用副本。"""
+        self.m = list(self.m)
+        self.s = list(self.s)
+        self.p = list(self.p)
+        self._shared = False
+
+    def store(self, kind: str, name: str, value: float) -> None:
+        """按名称写入一个槽位（value 须已是 float）；名称不存在时追加槽位。"""
+        if self._shared:
+            self.unshare()
+        values = getattr(self, self._ATTRS[kind])
+        i = getattr(self.symbols, kind).get(name)
+        if i is None:
+            self.symbols = self.symbols.extended(kind, name)
+            values.append(value)
+        else:
+            values[i] = value
+
+    def load(self, kind: str, values: Dict[str, float]) -> None:
+        """整体替换一类状态：表中已有而 values 未给出的槽位置 0.0。"""
+        if self._shared:
+            self.unshare()
+        index = getattr(self.symbols, kind)
+        current = [0.0] * len(index)
+        setattr(self, self._ATTRS[kind], current)
+        for k, v in values.items():
+            i = index.get(k)
+            if i is None:
+                self.store(kind, k, float(v))
+                index = getattr(self.symbols, kind)
+            else:
+                current[i] = float(v)
+
     def getMetabolite(self, name: str, compartment: str = None) -> float:
-        return float(self.metabolites.get(name, 0.0))
+        i = self.symbols.metabolites.get(name)
+        return 0.0 if i is None else self.m[i]
 
     def setMetabolite(self, name: str, value: float, compartment: str = None) -> None:
-        self.metabolites[name] = float(max(value, 0.0))
+        i = self.symbols.metabolites.get(name)
+        if i is None or self._shared:
+            self.store("metabolites", name, float(max(value, 0.0)))
+        else:
+            self.m[i] = float(max(value, 0.0))
 
     def getSignal(self, name: str) -> float:
-        return float(self.signals.get(name, 0.0))
+        i = self.symbols.signals.get(name)
+        return 0.0 if i is None else self.s[i]
 
     def setSignal(self, name: str, value: float) -> None:
-        self.signals[name] = float(max(value, 0.0))
+        i = self.symbols.signals.get(name)
+        if i is None or self._shared:
+            self.store("signals", name, float(max(value, 0.0)))
+        else:
+            self.s[i] = float(max(value, 0.0))
 
     def getParameter(self, name: str) -> float:
-        return float(self.parameters.get(name, 0.0))
+        i = self.symbols.parameters.get(name)
+        return 0.0 if i is None else self.p[i]
 
     def setParameter(self, name: str, value: float) -> None:
-        self.parameters[name] = float(value)
+        i = self.symbols.parameters.get(name)
+        if i is None or self._shared:
+            self.store("parameters", name, float(value))
+        else:
+            self.p[i] = float(value)
 
     def writeOutputs(self, outputs: Dict[str, float]) -> None:
+        if self._shared:
+            self.unshare()
+        index, m = self.symbols.metabolites, self.m
         for k, v in outputs.items():
-            self.metabolites[k] = float(max(self.metabolites.get(k, 0.0) + float(v), 0.0))
+            i = index.get(k)
+            if i is None:
+                self.store("metabolites", k, float(max(0.0 + float(v), 0.0)))
+                index = self.symbols.metabolites
+            else:
+                m[i] = float(max(m[i] + float(v), 0.0))
     
     def recordRate(self, name: str, rate: float) -> None:
         self.current_rates[name] = float(rate)
@@ -134,53 +290,117 @@ class Ctx:
         self.env.writeOutputs(outputs)
         self.last_outputs = outputs
 
-class ResourcePool:
-    def __init__(self, env: MetabolicEnvironment):
-        self.snapshot_metabolites = dict(env.metabolites)
-        self.snapshot_signals = dict(env.signals)
-        self.snapshot_parameters = dict(env.parameters)
-        self.outputs: Dict[str, float] = {}
-        self.signal_updates: Dict[str, float] = {}
+class _TaskBuffer:
+    """单个任务私有的增量缓冲：代谢物增量按调用顺序记录，信号/速率后写覆盖前写。"""
+
+    __slots__ = ("deltas", "signals", "rates")
+
+    def __init__(self):
+        self.deltas: List[Tuple[str, float]] = []
+        self.signals: Dict[str, float] = {}
         self.rates: Dict[str, float] = {}
-        self.lock = None
-        import threading
-        self.lock = threading.Lock()
+
+
+class _Binding(threading.local):
+    buffer: Optional[_TaskBuffer] = None
+
+
+class ResourcePool:
+    """一步内的快照与增量汇总。
+
+    快照直接引用 env 的槽位列表（不复制）；reset() 时把 env 标记为共享，在 drain() 之前
+    经 env 的 set*/writeOutputs 写入会先让 env 换用副本（写时复制），快照内容保持不变。
+    每个任务通过 bind(i) 绑定自己的缓冲区（线程局部），写入无需加锁；未绑定的写入
+    （任务开始前的信号编排等）进入根缓冲区。drain() 按 根 → 任务 0, 1, ... 的固定顺序
+    逐条回放增量，因此结果与调度无关，且与逐条累加的串行结果逐位一致。
+    """
+
+    def __init__(self, env: MetabolicEnvironment = None):
+        self._root = _TaskBuffer()
+        self._tasks: Dict[int, _TaskBuffer] = {}
+        self._local = _Binding()
+        self.env = None
+        self.symbols = SYMBOLS
+        self.snapshot_m: List[float] = []
+        self.snapshot_s: List[float] = []
+        self.snapshot_p: List[float] = []
+        if env is not None:
+            self.reset(env)
+
+    def reset(self, env: MetabolicEnvironment) -> None:
+        """以 env 的当前状态开始新的一步（池可跨步复用）。"""
+        self.env = env
+        self.symbols = env.symbols
+        self.snapshot_m, self.snapshot_s, self.snapshot_p = env.m, env.s, env.p
+        env._shared = True
+
+    def release(self) -> None:
+        """结束共享：此后 env 可直接原地写入。"""
+        if self.env is not None:
+            self.env._shared = False
+            self.env = None
+
+    def bind(self, task: Optional[int]) -> None:
+        """把当前线程的后续写入定向到第 task 个任务的缓冲区；None 恢复为根缓冲区。"""
+        if task is None:
+            self._local.buffer = None
+            return
+        buf = self._tasks.get(task)
+        if buf is None:
+            buf = self._tasks[task] = _TaskBuffer()
+        self._local.buffer = buf
+
+    def _buffer(self) -> _TaskBuffer:
+        return self._local.buffer or self._root
 
     def write_output(self, outputs: Dict[str, float]) -> None:
-        with self.lock:
-            for k, v in outputs.items():
-                self.outputs[k] = self.outputs.get(k, 0.0) + float(v)
+        # 记录 (名称, 值) 对，float 转换推迟到 drain
+        self._buffer().deltas.extend(outputs.items())
 
     def set_signal(self, name: str, value: float) -> None:
-        with self.lock:
-            self.signal_updates[name] = float(max(value, 0.0))
+        self._buffer().signals[name] = float(max(value, 0.0))
 
     def set_metabolite_abs(self, name: str, new_value: float) -> None:
-        base = float(self.snapshot_metabolites.get(name, 0.0))
-        delta = float(max(new_value, 0.0)) - base
-        with self.lock:
-            self.outputs[name] = self.outputs.get(name, 0.0) + delta
-    
+        i = self.symbols.metabolites.get(name)
+        base = 0.0 if i is None else self.snapshot_m[i]
+        self._buffer().deltas.append((name, float(max(new_value, 0.0)) - base))
+
     def record_rate(self, name: str, rate: float) -> None:
-        with self.lock:
-            self.rates[name] = float(rate)
+        self._buffer().rates[name] = float(rate)
 
     def drain(self) -> Dict[str, Dict[str, Any]]:
-        with self.lock:
-            out = {"metabolites": dict(self.outputs), "signals": dict(self.signal_updates), "rates": dict(self.rates)}
-            self.outputs.clear()
-            self.signal_updates.clear()
-            self.rates.clear()
-            return out
+        outputs: Dict[str, float] = {}
+        signals: Dict[str, float] = {}
+        rates: Dict[str, float] = {}
+        for buf in [self._root] + [self._tasks[i] for i in sorted(self._tasks)]:
+            for k, v in buf.deltas:
+                outputs[k] = outputs.get(k, 0.0) + float(v)
+            signals.update(buf.signals)
+            rates.update(buf.rates)
+            # 原地清空：已绑定的线程仍可继续写入
+            buf.deltas.clear()
+            buf.signals.clear()
+            buf.rates.clear()
+        self.release()
+        return {"metabolites": outputs, "signals": signals, "rates": rates}
 
 class ResourceEnv(MetabolicEnvironment):
+    # 只包装资源池的快照，不构造默认环境（不调用 MetabolicEnvironment.__init__）
+    __slots__ = ("pool",)
+
     def __init__(self, pool: ResourcePool):
-        super().__init__()
         self.pool = pool
-        self.metabolites = pool.snapshot_metabolites
-        self.signals = pool.snapshot_signals
-        self.parameters = pool.snapshot_parameters
-        self.history = []
+        self.recorder = None
+        self.current_rates = {}
+        self._shared = False
+        self._layout = None
+        self.refresh()
+
+    def refresh(self) -> None:
+        """资源池 reset() 后重新指向新的快照。"""
+        pool = self.pool
+        self.symbols = pool.symbols
+        self.m, self.s, self.p = pool.snapshot_m, pool.snapshot_s, pool.snapshot_p
 
     def update_history(self, t):
         pass
@@ -191,6 +411,12 @@ class ResourceEnv(MetabolicEnvironment):
     def setSignal(self, name: str, value: float) -> None:
         self.pool.set_signal(name, float(value))
 
+    def setParameter(self, name: str, value: float) -> None:
+        # 参数写入只在本步内可见：首次写入时复制快照的参数列表，不回写 env
+        if self.p is self.pool.snapshot_p:
+            self.p = list(self.p)
+        MetabolicEnvironment.setParameter(self, name, value)
+
     def writeOutputs(self, outputs: Dict[str, float]) -> None:
         self.pool.write_output(outputs)
     
@@ -199,10 +425,10 @@ class ResourceEnv(MetabolicEnvironment):
 
 
 def hexokinase_or_glucokinase(ctx: Ctx) -> Dict[str, float]:
-    insulin = ctx.env.getSignal("insulin")
-    ins_sens = ctx.env.getParameter("insulin_sensitivity")
-    glucose = ctx.env.getMetabolite("glucose")
-    atp = ctx.env.getMetabolite("atp")
+    insulin = ctx.env.s[SIG.insulin]
+    ins_sens = ctx.env.p[PAR.insulin_sensitivity]
+    glucose = ctx.env.m[MET.glucose]
+    atp = ctx.env.m[MET.atp]
     rate = ctx.rate_modifier * max(0.0, min(glucose, atp)) * (0.01 + 0.05 * insulin * ins_sens)
     ctx.env.setMetabolite("glucose", glucose - rate)
     ctx.env.setMetabolite("atp", atp - rate * 0.2)
@@ -210,42 +436,42 @@ def hexokinase_or_glucokinase(ctx: Ctx) -> Dict[str, float]:
     return {"glycogen": 0.0}
 
 def pgm_G6P_to_G1P(ctx: Ctx) -> Dict[str, float]:
-    g6p = min(ctx.env.getMetabolite("glucose"), 2.0)
+    g6p = min(ctx.env.m[MET.glucose], 2.0)
     ctx.env.recordRate("pgm_G6P_to_G1P", g6p)
     return {"glucose": -g6p, "glycogen": 0.0}
 
 def udpGlucoseSynthesis(ctx: Ctx) -> Dict[str, float]:
-    atp = ctx.env.getMetabolite("atp")
-    glucose = ctx.env.getMetabolite("glucose")
+    atp = ctx.env.m[MET.atp]
+    glucose = ctx.env.m[MET.glucose]
     rate = ctx.rate_modifier * min(glucose, atp * 0.5) * 0.02
     ctx.env.recordRate("udpGlucoseSynthesis", rate)
     return {"glucose": -rate, "atp": -rate * 0.2}
 
 def glycogenSynthaseStep(ctx: Ctx) -> Dict[str, float]:
-    insulin = ctx.env.getSignal("insulin")
-    ins_sens = ctx.env.getParameter("insulin_sensitivity")
-    glucose = ctx.env.getMetabolite("glucose")
-    atp = ctx.env.getMetabolite("atp")
+    insulin = ctx.env.s[SIG.insulin]
+    ins_sens = ctx.env.p[PAR.insulin_sensitivity]
+    glucose = ctx.env.m[MET.glucose]
+    atp = ctx.env.m[MET.atp]
     rate = ctx.rate_modifier * (0.01 + 0.05 * insulin * ins_sens) * min(glucose, atp)
     ctx.env.recordRate("glycogenSynthaseStep", rate)
     return {"glucose": -rate, "glycogen": rate, "atp": -rate * 0.1, "adp": rate * 0.1}
 
 def branchingEnzymeStep(ctx: Ctx) -> Dict[str, float]:
-    glycogen = ctx.env.getMetabolite("glycogen")
+    glycogen = ctx.env.m[MET.glycogen]
     rate = ctx.rate_modifier * min(glycogen, 1.0) * 0.01
     ctx.env.recordRate("branchingEnzymeStep", rate)
     return {"glycogen": rate * 0.0}
 
 def glycogenPhosphorylaseStep(ctx: Ctx) -> Dict[str, float]:
-    glucagon = ctx.env.getSignal("glucagon")
-    ep = ctx.env.getSignal("epinephrine")
-    glycogen = ctx.env.getMetabolite("glycogen")
+    glucagon = ctx.env.s[SIG.glucagon]
+    ep = ctx.env.s[SIG.epinephrine]
+    glycogen = ctx.env.m[MET.glycogen]
     rate = ctx.rate_modifier * (0.02 + 0.04 * glucagon + 0.08 * ep) * glycogen
     ctx.env.recordRate("glycogenPhosphorylaseStep", rate)
     return {"glycogen": -rate, "glucose": rate}
 
 def debranchingEnzymeStep(ctx: Ctx) -> Dict[str, float]:
-    glycogen = ctx.env.getMetabolite("glycogen")
+    glycogen = ctx.env.m[MET.glycogen]
     rate = ctx.rate_modifier * min(glycogen, 1.0) * 0.01
     ctx.env.recordRate("debranchingEnzymeStep", rate)
     return {"glycogen": -rate * 0.1, "glucose": rate * 0.1}
@@ -256,7 +482,7 @@ def g1p_to_g6p(ctx: Ctx) -> Dict[str, float]:
     return {"glucose": 0.0}
 
 def pepck_OAA_to_PEP(ctx: Ctx) -> Dict[str, float]:
-    atp = ctx.env.getMetabolite("atp")
+    atp = ctx.env.m[MET.atp]
     rate = ctx.rate_modifier * min(atp, 2.0) * 0.02
     ctx.env.recordRate("pepck_OAA_to_PEP", rate)
     return {"atp": -rate}
@@ -267,10 +493,10 @@ def g6pase_G6P_to_Glucose(ctx: Ctx) -> Dict[str, float]:
     return {"glucose": 0.0}
 
 def glycolysis_middle_steps(ctx: Ctx) -> Dict[str, float]:
-    glucose = ctx.env.getMetabolite("glucose")
-    nad_plus = ctx.env.getMetabolite("nad_plus")
-    adp = ctx.env.getMetabolite("adp")
-    o2 = ctx.env.getMetabolite("oxygen")
+    glucose = ctx.env.m[MET.glucose]
+    nad_plus = ctx.env.m[MET.nad_plus]
+    adp = ctx.env.m[MET.adp]
+    o2 = ctx.env.m[MET.oxygen]
     rate = ctx.rate_modifier * min(glucose, nad_plus * 0.5, adp * 0.5) * 0.05
     lact_frac = 0.8 if o2 < 50.0 else 0.5
     ctx.env.recordRate("glycolysis_middle_steps", rate)
@@ -282,22 +508,22 @@ def pyruvateKinase_step(ctx: Ctx) -> Dict[str, float]:
     return {"atp": 0.0}
 
 def fattyAcidSynthesis(ctx: Ctx) -> Dict[str, float]:
-    insulin = ctx.env.getSignal("insulin")
-    ins_sens = ctx.env.getParameter("insulin_sensitivity")
-    acetyl = ctx.env.getMetabolite("acetyl_coa")
-    nadph = ctx.env.getMetabolite("nadph")
-    atp = ctx.env.getMetabolite("atp")
+    insulin = ctx.env.s[SIG.insulin]
+    ins_sens = ctx.env.p[PAR.insulin_sensitivity]
+    acetyl = ctx.env.m[MET.acetyl_coa]
+    nadph = ctx.env.m[MET.nadph]
+    atp = ctx.env.m[MET.atp]
     rate = ctx.rate_modifier * (0.01 + 0.05 * insulin * ins_sens) * min(acetyl, nadph * 0.5, atp * 0.5)
     ctx.env.recordRate("fattyAcidSynthesis", rate)
     return {"acetyl_coa": -rate, "fatty_acid": rate, "nadph": -rate * 0.5, "atp": -rate * 0.2}
 
 def betaOxidation(ctx: Ctx) -> Dict[str, float]:
-    glucagon = ctx.env.getSignal("glucagon")
-    ep = ctx.env.getSignal("epinephrine")
-    fa = ctx.env.getMetabolite("fatty_acid")
-    nad_plus = ctx.env.getMetabolite("nad_plus")
-    etoh = ctx.env.getMetabolite("ethanol")
-    nadh = ctx.env.getMetabolite("nadh")
+    glucagon = ctx.env.s[SIG.glucagon]
+    ep = ctx.env.s[SIG.epinephrine]
+    fa = ctx.env.m[MET.fatty_acid]
+    nad_plus = ctx.env.m[MET.nad_plus]
+    etoh = ctx.env.m[MET.ethanol]
+    nadh = ctx.env.m[MET.nadh]
     alcohol_inhibition = 0.6 if (etoh > 0.5) else 1.0
     rate = ctx.rate_modifier * alcohol_inhibition * (0.3 + 0.4 * max(glucagon, ep)) * min(fa, nad_plus)
     if fa > 40.0:
@@ -308,28 +534,28 @@ def betaOxidation(ctx: Ctx) -> Dict[str, float]:
     return {"fatty_acid": -rate, "acetyl_coa": rate, "nadh": rate, "nad_plus": -rate, "atp": rate * 0.5}
 
 def deNovoLipogenesis(ctx: Ctx) -> Dict[str, float]:
-    insulin = ctx.env.getSignal("insulin")
-    ins_sens = ctx.env.getParameter("insulin_sensitivity")
-    glucose = ctx.env.getMetabolite("glucose")
-    atp = ctx.env.getMetabolite("atp")
-    nadph = ctx.env.getMetabolite("nadph")
+    insulin = ctx.env.s[SIG.insulin]
+    ins_sens = ctx.env.p[PAR.insulin_sensitivity]
+    glucose = ctx.env.m[MET.glucose]
+    atp = ctx.env.m[MET.atp]
+    nadph = ctx.env.m[MET.nadph]
     excess = max(0.0, (glucose - 100.0) / 100.0)
     rate = ctx.rate_modifier * (0.02 + 0.08 * insulin * ins_sens) * excess * min(glucose, atp * 0.5, nadph * 0.5)
     ctx.env.recordRate("deNovoLipogenesis", rate)
     return {"glucose": -rate, "fatty_acid": rate, "atp": -rate * 0.2, "nadph": -rate * 0.5}
 
 def lipidTransport(ctx: Ctx) -> Dict[str, float]:
-    insulin = ctx.env.getSignal("insulin")
-    ins_sens = ctx.env.getParameter("insulin_sensitivity")
-    fa = ctx.env.getMetabolite("fatty_acid")
+    insulin = ctx.env.s[SIG.insulin]
+    ins_sens = ctx.env.p[PAR.insulin_sensitivity]
+    fa = ctx.env.m[MET.fatty_acid]
     rate = ctx.rate_modifier * (0.01 + 0.05 * insulin * ins_sens) * min(fa, 5.0)
     ctx.env.recordRate("lipidTransport", rate)
     return {"fatty_acid": -rate * 0.7, "triglycerides": rate}
 
 def adiposeLipolysis(ctx: Ctx) -> Dict[str, float]:
-    insulin = ctx.env.getSignal("insulin")
-    glucagon = ctx.env.getSignal("glucagon")
-    ep = ctx.env.getSignal("epinephrine")
+    insulin = ctx.env.s[SIG.insulin]
+    glucagon = ctx.env.s[SIG.glucagon]
+    ep = ctx.env.s[SIG.epinephrine]
     drive = max(glucagon - insulin, 0.0) + ep * 1.0
     low_ins_boost = 0.5 if insulin < 0.2 else 0.0
     rate = ctx.rate_modifier * (0.02 + 0.05 * (drive + low_ins_boost)) * 3.0
@@ -337,36 +563,36 @@ def adiposeLipolysis(ctx: Ctx) -> Dict[str, float]:
     return {"fatty_acid": rate * 0.8, "glycerol": rate * 0.2}
 
 def aminoAcidCatabolism(ctx: Ctx) -> Dict[str, float]:
-    aa = ctx.env.getMetabolite("amino_acid")
-    atp = ctx.env.getMetabolite("atp")
-    cort = ctx.env.getSignal("cortisol")
-    post = 1.0 if bool(ctx.env.getParameter("is_postprandial")) else 0.0
+    aa = ctx.env.m[MET.amino_acid]
+    atp = ctx.env.m[MET.atp]
+    cort = ctx.env.s[SIG.cortisol]
+    post = 1.0 if bool(ctx.env.p[PAR.is_postprandial]) else 0.0
     rate = ctx.rate_modifier * (1.0 + 0.3 * post + 0.3 * cort) * min(max(aa - 20.0, 0.0), atp) * 0.05
     ctx.env.recordRate("aminoAcidCatabolism", rate)
     return {"amino_acid": -rate, "ammonia": rate, "atp": -rate * 0.1}
 
 def aminoAcidSynthesisTransport(ctx: Ctx) -> Dict[str, float]:
-    aa = ctx.env.getMetabolite("amino_acid")
-    atp = ctx.env.getMetabolite("atp")
+    aa = ctx.env.m[MET.amino_acid]
+    atp = ctx.env.m[MET.atp]
     rate = ctx.rate_modifier * min(aa, atp) * 0.02
     ctx.env.recordRate("aminoAcidSynthesisTransport", rate)
     return {"amino_acid": -rate, "albumin": rate * 0.6, "clotting_factor": rate * 0.4, "atp": -rate * 0.2}
 
 def oxidativePhosphorylation(ctx: Ctx) -> Dict[str, float]:
-    nadh = ctx.env.getMetabolite("nadh")
-    oxygen = ctx.env.getMetabolite("oxygen")
-    adp = ctx.env.getMetabolite("adp")
+    nadh = ctx.env.m[MET.nadh]
+    oxygen = ctx.env.m[MET.oxygen]
+    adp = ctx.env.m[MET.adp]
     rate = ctx.rate_modifier * min(nadh, oxygen * 0.2, max(adp, 1.0)) * 0.6
     ctx.env.recordRate("oxidativePhosphorylation", rate)
     return {"nadh": -rate, "nad_plus": rate, "oxygen": -rate * 0.5, "atp": rate, "adp": -rate}
 
 def ketogenesis(ctx: Ctx) -> Dict[str, float]:
-    glucose = ctx.env.getMetabolite("glucose")
-    acetyl = ctx.env.getMetabolite("acetyl_coa")
-    glucagon = ctx.env.getSignal("glucagon")
-    insulin = ctx.env.getSignal("insulin")
+    glucose = ctx.env.m[MET.glucose]
+    acetyl = ctx.env.m[MET.acetyl_coa]
+    glucagon = ctx.env.s[SIG.glucagon]
+    insulin = ctx.env.s[SIG.insulin]
     low_ins_gain = max(0.0, 1.0 - insulin)
-    post = 1.0 if bool(ctx.env.getParameter("is_postprandial")) else 0.0
+    post = 1.0 if bool(ctx.env.p[PAR.is_postprandial]) else 0.0
     post_clamp = 0.3 if post > 0.0 else 1.0
     rate = ctx.rate_modifier * post_clamp * (0.1 + 0.15 * glucagon + 0.12 * low_ins_gain) * max(0.0, (70.0 - glucose) / 70.0) * min(acetyl, 5.0)
     rate = max(min(rate, 0.25), 0.05)
@@ -374,10 +600,10 @@ def ketogenesis(ctx: Ctx) -> Dict[str, float]:
     return {"acetyl_coa": -rate, "ketone_body": rate}
 
 def lactateFermentation(ctx: Ctx) -> Dict[str, float]:
-    pyr = ctx.env.getMetabolite("pyruvate")
-    nadh = ctx.env.getMetabolite("nadh")
-    nadp = ctx.env.getMetabolite("nad_plus")
-    oxygen = ctx.env.getMetabolite("oxygen")
+    pyr = ctx.env.m[MET.pyruvate]
+    nadh = ctx.env.m[MET.nadh]
+    nadp = ctx.env.m[MET.nad_plus]
+    oxygen = ctx.env.m[MET.oxygen]
     deficit = 1.0 if (nadp < 15.0 or (nadh / (nadp + 1e-6)) > 2.0) else 0.0
     hypox = 1.0 if oxygen < 40.0 else 0.0
     trig = max(deficit, hypox)
@@ -386,49 +612,49 @@ def lactateFermentation(ctx: Ctx) -> Dict[str, float]:
     return {"pyruvate": -rate, "lactate": rate, "nadh": -rate, "nad_plus": rate}
 
 def nampt_Salvage(ctx: Ctx) -> Dict[str, float]:
-    nam = ctx.env.getMetabolite("nicotinamide")
-    atp = ctx.env.getMetabolite("atp")
-    liver_fn = ctx.env.getParameter("liver_function")
+    nam = ctx.env.m[MET.nicotinamide]
+    atp = ctx.env.m[MET.atp]
+    liver_fn = ctx.env.p[PAR.liver_function]
     rate = ctx.rate_modifier * min(nam, atp * 0.3) * 0.06 * liver_fn
     ctx.env.recordRate("nampt_Salvage", rate)
     return {"nicotinamide": -rate, "nad_plus": rate, "atp": -rate * 0.2}
 
 def deNovoNADSynthesis(ctx: Ctx) -> Dict[str, float]:
-    nia = ctx.env.getMetabolite("niacin")
-    trp = ctx.env.getMetabolite("tryptophan")
-    atp = ctx.env.getMetabolite("atp")
-    liver_fn = ctx.env.getParameter("liver_function")
+    nia = ctx.env.m[MET.niacin]
+    trp = ctx.env.m[MET.tryptophan]
+    atp = ctx.env.m[MET.atp]
+    liver_fn = ctx.env.p[PAR.liver_function]
     precursor = min(nia + trp * 0.5, atp * 0.3)
     rate = ctx.rate_modifier * precursor * 0.03 * liver_fn
     ctx.env.recordRate("deNovoNADSynthesis", rate)
     return {"niacin": -rate * 0.5, "tryptophan": -rate, "nad_plus": rate, "atp": -rate * 0.2}
 
 def cps1_Ammonia_to_CarbamoylPhosphate(ctx: Ctx) -> Dict[str, float]:
-    nh3 = ctx.env.getMetabolite("ammonia")
-    atp = ctx.env.getMetabolite("atp")
-    post = 1.0 if bool(ctx.env.getParameter("is_postprandial")) else 0.0
+    nh3 = ctx.env.m[MET.ammonia]
+    atp = ctx.env.m[MET.atp]
+    post = 1.0 if bool(ctx.env.p[PAR.is_postprandial]) else 0.0
     rate = ctx.rate_modifier * (1.0 + 0.5 * post) * min(nh3, atp * 0.5) * 0.3
     ctx.env.recordRate("cps1_Ammonia_to_CarbamoylPhosphate", rate)
     return {"ammonia": -rate, "atp": -rate * 0.5, "citrulline": rate}
 
 def otc_CarbamoylPhosphate_to_Citrulline(ctx: Ctx) -> Dict[str, float]:
-    cit = ctx.env.getMetabolite("citrulline")
-    orn = ctx.env.getMetabolite("ornithine")
-    post = 1.0 if bool(ctx.env.getParameter("is_postprandial")) else 0.0
+    cit = ctx.env.m[MET.citrulline]
+    orn = ctx.env.m[MET.ornithine]
+    post = 1.0 if bool(ctx.env.p[PAR.is_postprandial]) else 0.0
     rate = ctx.rate_modifier * (1.0 + 0.5 * post) * min(cit, orn) * 0.3
     ctx.env.recordRate("otc_CarbamoylPhosphate_to_Citrulline", rate)
     return {"citrulline": -rate, "argininosuccinate": rate}
 
 def ass1_Citrulline_to_ASP_Argininosuccinate(ctx: Ctx) -> Dict[str, float]:
-    arg_succ = ctx.env.getMetabolite("argininosuccinate")
-    post = 1.0 if bool(ctx.env.getParameter("is_postprandial")) else 0.0
+    arg_succ = ctx.env.m[MET.argininosuccinate]
+    post = 1.0 if bool(ctx.env.p[PAR.is_postprandial]) else 0.0
     rate = ctx.rate_modifier * (1.0 + 0.3 * post) * min(arg_succ, 5.0) * 0.2
     ctx.env.recordRate("ass1_Citrulline_to_ASP_Argininosuccinate", rate)
     return {"argininosuccinate": -rate, "arginine": rate}
 
 def asl_Argininosuccinate_to_Arginine_Fumarate(ctx: Ctx) -> Dict[str, float]:
-    arg = ctx.env.getMetabolite("arginine")
-    post = 1.0 if bool(ctx.env.getParameter("is_postprandial")) else 0.0
+    arg = ctx.env.m[MET.arginine]
+    post = 1.0 if bool(ctx.env.p[PAR.is_postprandial]) else 0.0
     rate = ctx.rate_modifier * (1.0 + 0.3 * post) * min(arg, 5.0) * 0.2
     ctx.env.recordRate("asl_Argininosuccinate_to_Arginine_Fumarate", rate)
     return {"arginine": -rate, "urea": rate, "ornithine": rate * 0.5}
@@ -439,20 +665,20 @@ def arg1_Arginine_to_Urea_Ornithine(ctx: Ctx) -> Dict[str, float]:
     return {"urea": 0.0}
 
 def phaseI_OxRed(ctx: Ctx) -> Dict[str, float]:
-    xen = ctx.env.getParameter("xenobiotic_load")
-    nadph = ctx.env.getMetabolite("nadph")
-    liver_fn = ctx.env.getParameter("liver_function")
+    xen = ctx.env.p[PAR.xenobiotic_load]
+    nadph = ctx.env.m[MET.nadph]
+    liver_fn = ctx.env.p[PAR.liver_function]
     rate = ctx.rate_modifier * min(xen, nadph) * 0.1 * liver_fn
     ctx.env.recordRate("phaseI_OxRed", rate)
     return {"phaseI_intermediates": rate, "nadph": -rate}
 
 def phaseII_Conjugation(ctx: Ctx) -> Dict[str, float]:
-    inter = ctx.env.getMetabolite("phaseI_intermediates")
-    liver_fn = ctx.env.getParameter("liver_function")
-    conj = ctx.env.getMetabolite("conjugates")
-    udpga = ctx.env.getMetabolite("udpga")
-    paps = ctx.env.getMetabolite("paps")
-    gsh = ctx.env.getMetabolite("gsh")
+    inter = ctx.env.m[MET.phaseI_intermediates]
+    liver_fn = ctx.env.p[PAR.liver_function]
+    conj = ctx.env.m[MET.conjugates]
+    udpga = ctx.env.m[MET.udpga]
+    paps = ctx.env.m[MET.paps]
+    gsh = ctx.env.m[MET.gsh]
     cof = max(0.0, min(udpga + paps + gsh, inter + 1.0))
     rate = ctx.rate_modifier * inter * 0.1 * (liver_fn ** 2) * (0.5 + 0.5 * min(cof / 10.0, 1.0))
     clear = ctx.rate_modifier * conj * 0.05 * max(liver_fn - 0.5, 0.0)
@@ -466,17 +692,17 @@ def phaseII_Conjugation(ctx: Ctx) -> Dict[str, float]:
     }
 
 def bilirubinUGT(ctx: Ctx) -> Dict[str, float]:
-    ib = ctx.env.getMetabolite("indirect_bilirubin")
-    udpga = ctx.env.getMetabolite("udpga")
-    liver_fn = ctx.env.getParameter("liver_function")
+    ib = ctx.env.m[MET.indirect_bilirubin]
+    udpga = ctx.env.m[MET.udpga]
+    liver_fn = ctx.env.p[PAR.liver_function]
     rate = ctx.rate_modifier * min(ib, udpga * 0.5) * 0.05 * liver_fn
     ctx.env.recordRate("bilirubinUGT", rate)
     return {"indirect_bilirubin": -rate, "direct_bilirubin": rate, "udpga": -rate * 0.5}
 
 def ethanol_ADH(ctx: Ctx) -> Dict[str, float]:
-    etoh = ctx.env.getMetabolite("ethanol")
-    nadp = ctx.env.getMetabolite("nad_plus")
-    liver_fn = ctx.env.getParameter("liver_function")
+    etoh = ctx.env.m[MET.ethanol]
+    nadp = ctx.env.m[MET.nad_plus]
+    liver_fn = ctx.env.p[PAR.liver_function]
     substrate_saturation = min(etoh / 1.0, 1.0)
     v_max = 0.5 * liver_fn
     cofactor_limit = min(1.0, nadp / 5.0)
@@ -485,10 +711,10 @@ def ethanol_ADH(ctx: Ctx) -> Dict[str, float]:
     return {"ethanol": -rate, "acetaldehyde": rate, "nadh": rate * 0.8, "nad_plus": -rate * 0.8}
 
 def acetaldehyde_ALDH(ctx: Ctx) -> Dict[str, float]:
-    acald = ctx.env.getMetabolite("acetaldehyde")
-    nadp = ctx.env.getMetabolite("nad_plus")
-    liver_fn = ctx.env.getParameter("liver_function")
-    aldh_act = ctx.env.getParameter("aldh_activity")
+    acald = ctx.env.m[MET.acetaldehyde]
+    nadp = ctx.env.m[MET.nad_plus]
+    liver_fn = ctx.env.p[PAR.liver_function]
+    aldh_act = ctx.env.p[PAR.aldh_activity]
     substrate_saturation = min(acald / 1.0, 1.0)
     v_max = 0.4 * liver_fn * aldh_act
     cofactor_limit = min(1.0, nadp / 5.0)
@@ -497,29 +723,29 @@ def acetaldehyde_ALDH(ctx: Ctx) -> Dict[str, float]:
     return {"acetaldehyde": -rate, "acetate": rate, "nadh": rate * 0.8, "nad_plus": -rate * 0.8}
 
 def acetate_to_acetylcoa(ctx: Ctx) -> Dict[str, float]:
-    ac = ctx.env.getMetabolite("acetate")
-    atp = ctx.env.getMetabolite("atp")
+    ac = ctx.env.m[MET.acetate]
+    atp = ctx.env.m[MET.atp]
     rate = ctx.rate_modifier * min(ac, atp * 0.5) * 0.02
     ctx.env.recordRate("acetate_to_acetylcoa", rate)
     return {"acetate": -rate, "acetyl_coa": rate, "atp": -rate * 0.2}
 
 def bileAcidSynthesis(ctx: Ctx) -> Dict[str, float]:
-    chol = ctx.env.getMetabolite("cholesterol")
+    chol = ctx.env.m[MET.cholesterol]
     rate = ctx.rate_modifier * min(chol, 5.0) * 0.02
     ctx.env.recordRate("bileAcidSynthesis", rate)
     return {"cholesterol": -rate, "bile_acid": rate}
 
 def plasmaProteinSynthesis(ctx: Ctx) -> Dict[str, float]:
-    aa = ctx.env.getMetabolite("amino_acid")
-    atp = ctx.env.getMetabolite("atp")
-    post = 1.0 if bool(ctx.env.getParameter("is_postprandial")) else 0.0
+    aa = ctx.env.m[MET.amino_acid]
+    atp = ctx.env.m[MET.atp]
+    post = 1.0 if bool(ctx.env.p[PAR.is_postprandial]) else 0.0
     rate = ctx.rate_modifier * (1.0 + 0.5 * post) * min(aa, atp) * 0.03
     ctx.env.recordRate("plasmaProteinSynthesis", rate)
     return {"amino_acid": -rate, "albumin": rate, "atp": -rate * 0.2}
 
 def coagulationFactorSynthesis(ctx: Ctx) -> Dict[str, float]:
-    aa = ctx.env.getMetabolite("amino_acid")
-    atp = ctx.env.getMetabolite("atp")
+    aa = ctx.env.m[MET.amino_acid]
+    atp = ctx.env.m[MET.atp]
     rate = ctx.rate_modifier * min(aa, atp) * 0.01
     ctx.env.recordRate("coagulationFactorSynthesis", rate)
     return {"amino_acid": -rate, "clotting_factor": rate, "atp": -rate * 0.1}
@@ -548,19 +774,19 @@ def orchestrateGlycogenBreakdown(ctx: Ctx) -> Dict[str, float]:
     return outputs
 
 def orchestrateGluconeogenesis(ctx: Ctx) -> Dict[str, float]:
-    lact = ctx.env.getMetabolite("lactate")
-    glyc = ctx.env.getMetabolite("glycerol")
-    aa = ctx.env.getMetabolite("amino_acid")
-    atp = ctx.env.getMetabolite("atp")
-    glucagon = ctx.env.getSignal("glucagon")
-    etoh = ctx.env.getMetabolite("ethanol")
-    nadh = ctx.env.getMetabolite("nadh")
-    nadp = ctx.env.getMetabolite("nad_plus")
-    infl = ctx.env.getSignal("inflammation")
-    cort = ctx.env.getSignal("cortisol")
+    lact = ctx.env.m[MET.lactate]
+    glyc = ctx.env.m[MET.glycerol]
+    aa = ctx.env.m[MET.amino_acid]
+    atp = ctx.env.m[MET.atp]
+    glucagon = ctx.env.s[SIG.glucagon]
+    etoh = ctx.env.m[MET.ethanol]
+    nadh = ctx.env.m[MET.nadh]
+    nadp = ctx.env.m[MET.nad_plus]
+    infl = ctx.env.s[SIG.inflammation]
+    cort = ctx.env.s[SIG.cortisol]
     alcohol_inhibition = 0.5 if (etoh > 0.5) else 1.0
     stress_gain = 1.0 + 0.7 * cort + 0.7 * infl
-    post = 1.0 if bool(ctx.env.getParameter("is_postprandial")) else 0.0
+    post = 1.0 if bool(ctx.env.p[PAR.is_postprandial]) else 0.0
     post_clamp = 0.7 if post > 0.0 else 1.0
     rate = ctx.rate_modifier * post_clamp * alcohol_inhibition * stress_gain * (0.02 + 0.05 * glucagon) * min(lact + glyc + aa, atp * 0.5)
     outputs = {"glucose": rate, "lactate": -rate * 0.4, "glycerol": -rate * 0.3, "amino_acid": -rate * 0.3, "atp": -rate * 0.2}
@@ -579,11 +805,11 @@ def orchestrateGlycolysis(ctx: Ctx) -> Dict[str, float]:
     return outputs
 
 def orchestrateLipidMetabolism(ctx: Ctx) -> Dict[str, float]:
-    insulin = ctx.env.getSignal("insulin")
-    glucagon = ctx.env.getSignal("glucagon")
-    triglycerides = ctx.env.getMetabolite("triglycerides")
-    fatty_acid = ctx.env.getMetabolite("fatty_acid")
-    post = bool(ctx.env.getParameter("is_postprandial"))
+    insulin = ctx.env.s[SIG.insulin]
+    glucagon = ctx.env.s[SIG.glucagon]
+    triglycerides = ctx.env.m[MET.triglycerides]
+    fatty_acid = ctx.env.m[MET.fatty_acid]
+    post = bool(ctx.env.p[PAR.is_postprandial])
     initial_triglycerides = 80.0  # 初始甘油三酯浓度
     
     outputs = {}
@@ -651,7 +877,7 @@ def orchestrateAminoAcidMetabolism(ctx: Ctx) -> Dict[str, float]:
     return outputs
 
 def orchestrateEnergyHomeostasis(ctx: Ctx) -> Dict[str, float]:
-    glucose = ctx.env.getMetabolite("glucose")
+    glucose = ctx.env.m[MET.glucose]
     if glucose < 70.0:
         o = ketogenesis(ctx)
         ctx.write(o)
@@ -672,7 +898,7 @@ def orchestrateNADHomeostasis(ctx: Ctx) -> Dict[str, float]:
     return outputs
 
 def cytosolicATPase_load(ctx: Ctx) -> Dict[str, float]:
-    atp = ctx.env.getMetabolite("atp")
+    atp = ctx.env.m[MET.atp]
     # rate = ctx.rate_modifier * min(atp, 50.0) * 0.03
     # 原代码 min(atp, 50.0) 在生理单位下永远等于 atp，导致消耗过快
     rate = ctx.rate_modifier * min(atp, 2.0) * 0.03
@@ -741,10 +967,10 @@ def orchestrateNADHomeostasis(ctx: Ctx) -> Dict[str, float]:
     return outputs
 
 def applyEnergyDeficitPolicies(ctx: Ctx) -> None:
-    atp = ctx.env.getMetabolite("atp")
-    nadh = ctx.env.getMetabolite("nadh")
-    nadp = ctx.env.getMetabolite("nad_plus")
-    etoh = ctx.env.getMetabolite("ethanol")
+    atp = ctx.env.m[MET.atp]
+    nadh = ctx.env.m[MET.nadh]
+    nadp = ctx.env.m[MET.nad_plus]
+    etoh = ctx.env.m[MET.ethanol]
     # if atp < 30.0:
     #     ctx.applyAction("downscale_rates", 0.3)
     # else:
@@ -762,8 +988,8 @@ def applyEnergyDeficitPolicies(ctx: Ctx) -> None:
         ctx.applyAction("downscale_rates", ctx.rate_modifier * 0.8)
 
 def hormoneSignalTransduction(ctx: Ctx) -> Dict[str, float]:
-    glucose = ctx.env.getMetabolite("glucose")
-    post = 1.0 if bool(ctx.env.getParameter("is_postprandial")) else 0.0
+    glucose = ctx.env.m[MET.glucose]
+    post = 1.0 if bool(ctx.env.p[PAR.is_postprandial]) else 0.0
     # insulin = (2.0 / (1.0 + np.exp(-0.08 * (glucose - 95.0)))) * (1.0 + 0.5 * post)
     # glucagon = (1.2 / (1.0 + np.exp(0.12 * (glucose - 90.0)))) * (1.0 - 0.6 * post)
     # 将 95.0 改为生理中值 5.0 (mmol/L)
@@ -774,13 +1000,13 @@ def hormoneSignalTransduction(ctx: Ctx) -> Dict[str, float]:
     return {}
 
 def neuralSignalIntegration(ctx: Ctx) -> Dict[str, float]:
-    ep = ctx.env.getSignal("epinephrine")
+    ep = ctx.env.s[SIG.epinephrine]
     ep = min(max(ep, 0.05), 2.0)
     ctx.env.setSignal("epinephrine", ep)
     return {}
 
 def immuneSignalInteraction(ctx: Ctx) -> Dict[str, float]:
-    infl = ctx.env.getSignal("inflammation")
+    infl = ctx.env.s[SIG.inflammation]
     infl = max(infl - 0.001, 0.0)
     ctx.env.setSignal("inflammation", infl)
     sens = max(0.5, 1.0 - 0.5 * infl)
@@ -788,8 +1014,8 @@ def immuneSignalInteraction(ctx: Ctx) -> Dict[str, float]:
     return {}
 
 def degradeInsulin(ctx: Ctx) -> Dict[str, float]:
-    ide = ctx.env.getParameter("insulin_degrading_enzyme_activity")
-    ins = ctx.env.getSignal("insulin")
+    ide = ctx.env.p[PAR.insulin_degrading_enzyme_activity]
+    ins = ctx.env.s[SIG.insulin]
     # 增加降解速率，使其与IDE活性更相关
     degradation_rate = 0.02 * ide * ins
     ins = max(ins - degradation_rate, 0.0)
@@ -797,30 +1023,135 @@ def degradeInsulin(ctx: Ctx) -> Dict[str, float]:
     return {}
 
 def degradeGlucagon(ctx: Ctx) -> Dict[str, float]:
-    gl = ctx.env.getSignal("glucagon")
+    gl = ctx.env.s[SIG.glucagon]
     gl = max(gl - 0.01, 0.0)
     ctx.env.setSignal("glucagon", gl)
     return {}
 
 def inactivateCatecholamines(ctx: Ctx) -> Dict[str, float]:
-    ep = ctx.env.getSignal("epinephrine")
+    ep = ctx.env.s[SIG.epinephrine]
     ep = max(ep - 0.01, 0.0)
     ctx.env.setSignal("epinephrine", ep)
     return {}
 
+def _run_task_isolated(fn: Callable[[Ctx], Any], symbols: SymbolTable, m: List[float], s: List[float], p: List[float], rate_modifier: float) -> Dict[str, Dict[str, Any]]:
+    # 子进程内执行单个编排任务：基于快照重建私有资源池，返回该任务的增量
+    env = MetabolicEnvironment()
+    env.symbols = symbols
+    env.m, env.s, env.p = m, s, p
+    pool = ResourcePool(env)
+    rctx = Ctx(ResourceEnv(pool))
+    rctx.rate_modifier = rate_modifier
+    fn(rctx)
+    return pool.drain()
+
+
+def _run_task_bound(pool: ResourcePool, i: int, fn: Callable[[Ctx], Any], rctx: Ctx) -> Any:
+    pool.bind(i)
+    return fn(rctx)
+
+
+class SerialBackend:
+    """按任务列表顺序在当前线程执行（默认后端，结果确定）。"""
+
+    def run(self, tasks: List[Callable[[Ctx], Any]], rctx: Ctx) -> None:
+        # 串行时调用顺序即任务顺序，直接写入根缓冲区即可，无需绑定
+        for fn in tasks:
+            fn(rctx)
+
+    def close(self) -> None:
+        pass
+
+
+class ThreadBackend:
+    """长驻线程池：整个模拟过程复用同一个 ThreadPoolExecutor。"""
+
+    def __init__(self, max_workers: int = None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def run(self, tasks: List[Callable[[Ctx], Any]], rctx: Ctx) -> None:
+        futs = [self.executor.submit(_run_task_bound, rctx.env.pool, i, fn, rctx) for i, fn in enumerate(tasks)]
+        for f in futs:
+            _ = f.result()
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+class ProcessBackend:
+    """长驻进程池：每个任务在子进程中基于快照执行，增量按任务顺序合并回资源池。"""
+
+    def __init__(self, max_workers: int = None):
+        self.executor = ProcessPoolExecutor(max_workers=max_workers)
+
+    def run(self, tasks: List[Callable[[Ctx], Any]], rctx: Ctx) -> None:
+        env = rctx.env
+        futs = [
+            self.executor.submit(_run_task_isolated, fn, env.symbols, env.m, env.s, env.p, rctx.rate_modifier)
+            for fn in tasks
+        ]
+        for i, f in enumerate(futs):
+            drained = f.result()
+            env.pool.bind(i)
+            env.pool.write_output(drained["metabolites"])
+            for s, v in drained["signals"].items():
+                env.pool.set_signal(s, v)
+            for k, v in drained["rates"].items():
+                env.pool.record_rate(k, v)
+        env.pool.bind(None)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+BACKENDS = {
+    "serial": SerialBackend,
+    "thread": ThreadBackend,
+    "process": ProcessBackend,
+}
+
+
+def make_backend(backend: Union[str, Any] = "serial", max_workers: int = None):
+    if not isinstance(backend, str):
+        return backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown execution backend: {backend!r} (expected one of {sorted(BACKENDS)})")
+    if backend == "serial":
+        return SerialBackend()
+    return BACKENDS[backend](max_workers=max_workers)
+
+
 class LiverMetabolismSystem:
-    def __init__(self, env: MetabolicEnvironment):
+    def __init__(self, env: MetabolicEnvironment, backend: Union[str, Any] = "serial", max_workers: int = None):
         self.env = env
         self.ctx = Ctx(env)
-
-    def step(self, t: int):
-        pool = ResourcePool(self.env)
-        renv = ResourceEnv(pool)
-        rctx = Ctx(renv)
+        self.backend = make_backend(backend, max_workers)
+        # 每步复用同一组资源池 / 快照环境 / 上下文
+        self._pool = ResourcePool()
+        self._renv = ResourceEnv(self._pool)
+        self._rctx = Ctx(self._renv)
+
+    def close(self) -> None:
+        self.backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def evaluate(self) -> Dict[str, Dict[str, Any]]:
+        """基于当前环境求一步的增量，不写回环境：{"metabolites", "signals", "rates"}。"""
+        pool = self._pool
+        pool.reset(self.env)
+        self._renv.refresh()
+        rctx = self._rctx
+        rctx.rate_modifier = 1.0
+        rctx.last_outputs = {}
         orchestrateSystemSignals(rctx)
         applyEnergyDeficitPolicies(rctx)
-        insulin = rctx.env.getSignal("insulin")
-        glucagon = rctx.env.getSignal("glucagon")
+        insulin = rctx.env.s[SIG.insulin]
+        glucagon = rctx.env.s[SIG.glucagon]
         glyco_task = orchestrateGlycogenSynthesis if insulin > glucagon else orchestrateGlycogenBreakdown
         tasks = [
             orchestrateNADHomeostasis,
@@ -836,11 +1167,11 @@ class LiverMetabolismSystem:
             orchestrateDetoxification,
             orchestrateNADHomeostasis,
         ]
-        with ThreadPoolExecutor(max_workers=len(tasks)) as ex:
-            futs = [ex.submit(fn, rctx) for fn in tasks]
-            for f in futs:
-                _ = f.result()
-        drained = pool.drain()
+        self.backend.run(tasks, rctx)
+        return pool.drain()
+
+    def step(self, t: int):
+        drained = self.evaluate()
         self.env.writeOutputs(drained["metabolites"])
         for s, v in drained["signals"].items():
             self.env.setSignal(s, v)
@@ -0,0 +1,206 @@
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.integrate import BDF, DOP853, LSODA, RK23, RK45, OdeSolution, Radau
+
+from batch import BatchLiverMetabolismSystem, BatchMetabolicEnvironment
+from schedule import as_inject
+from simulate import LiverMetabolismSystem, MetabolicEnvironment
+
+# solve_ivp 的方法名 -> 公开的求解器类
+METHODS: Dict[str, type] = {"BDF": BDF, "Radau": Radau, "LSODA": LSODA, "RK45": RK45, "RK23": RK23, "DOP853": DOP853}
+
+
+class LiverODE:
+    """连续时间形式的肝脏模型：把定步长引擎的每步增量 G(x) = x_{n+1} - x_n 作为导数 dx/dt = G(x)。
+
+    时间单位为“步”，定步长引擎即步长为 1 的显式 Euler；run_ode 求的是该连续模型的收敛解，而非定步长轨迹。
+    状态向量为 代谢物 + 信号，参数在两次注入之间为常数（取自 env.parameters）。
+    RHS 用标量引擎求值；Jacobian 用批量引擎一次性求出 n+1 个扰动状态的差分。
+    """
+
+    def __init__(self, env: MetabolicEnvironment):
+        self.env = env
+        self.system = LiverMetabolismSystem(env)
+        self.metabolite_names = list(env.metabolites)
+        self.signal_names = list(env.signals)
+        self.parameter_names = list(env.parameters)
+        self.n_m = len(self.metabolite_names)
+        self.size = self.n_m + len(self.signal_names)
+        self.index = {k: i for i, k in enumerate(self.metabolite_names)}
+        self.index.update({k: self.n_m + i for i, k in enumerate(self.signal_names)})
+        self.batch = BatchMetabolicEnvironment(self.size + 1, env)
+        self.batch_system = BatchLiverMetabolismSystem(self.batch)
+        self.nfev = 0
+        self.njev = 0
+
+    def pack(self) -> np.ndarray:
+        env = self.env
+        return np.array(env.m[:self.n_m] + env.s[:self.size - self.n_m])
+
+    def unpack(self, y: np.ndarray) -> None:
+        # 直接写槽位列表（顺序即 metabolite_names / signal_names）
+        values = y.tolist()
+        self.env.m[:self.n_m] = values[:self.n_m]
+        self.env.s[:self.size - self.n_m] = values[self.n_m:]
+
+    def parameters(self) -> np.ndarray:
+        p = self.env.parameters
+        return np.array([float(p[k]) for k in self.parameter_names])
+
+    def rhs(self, t: float, y: np.ndarray) -> np.ndarray:
+        self.nfev += 1
+        self.unpack(y)
+        drained = self.system.evaluate()
+        g = np.zeros(self.size)
+        for k, v in drained["metabolites"].items():
+            i = self.index.get(k)
+            if i is not None:
+                g[i] = max(y[i] + v, 0.0) - y[i]
+        for k, v in drained["signals"].items():
+            i = self.index[k]
+            g[i] = v - y[i]
+        return g
+
+    def batch_tendency(self, Y: np.ndarray, P: np.ndarray) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """N 个状态 Y (N, size)、参数 P (N 或 1, k_p) 下的增量 (N, size) 与速率。"""
+        if len(Y) != self.batch.n:
+            self.batch = BatchMetabolicEnvironment(len(Y), self.env)
+            self.batch_system = BatchLiverMetabolismSystem(self.batch)
+        self.batch.metabolites[:] = Y[:, :self.n_m]
+        self.batch.signals[:] = Y[:, self.n_m:]
+        self.batch.parameters[:] = P
+        dm, ds, rates = self.batch_system.tendency()
+        return np.hstack([dm, ds]), rates
+
+    def jac(self, t: float, y: np.ndarray) -> np.ndarray:
+        # 前向差分：第 0 行为基准状态，第 j+1 行扰动第 j 个分量
+        self.njev += 1
+        h = 1e-7 * np.maximum(np.abs(y), 1.0)
+        Y = np.tile(y, (self.size + 1, 1))
+        Y[np.arange(1, self.size + 1), np.arange(self.size)] += h
+        G, _ = self.batch_tendency(Y, self.parameters())
+        return ((G[1:] - G[0]) / h[:, None]).T
+
+
+def _inject_changes(env: MetabolicEnvironment, inject: Callable[[MetabolicEnvironment, int], None], k: int) -> bool:
+    before = (list(env.m), list(env.s), list(env.p))
+    inject(env, k)
+    return (env.m, env.s, env.p) != before
+
+
+def _unit_steps(model: LiverODE, y: np.ndarray, t: int, end: int, steps: int, inject) -> Tuple[List[int], List[np.ndarray], np.ndarray]:
+    # 以模型原生的单位步长推进（与定步长引擎相同的更新），直到 end 或首个改变状态的注入
+    ts, ys = [t], [y]
+    while t < end:
+        y = y + model.rhs(t, y)
+        t += 1
+        ts.append(t)
+        ys.append(y)
+        if inject and t < steps:
+            model.unpack(y)
+            if _inject_changes(model.env, inject, t):
+                y = model.pack()
+                break
+    return ts, ys, y
+
+
+def _integrate(model: LiverODE, t: int, end: int, y: np.ndarray, method: str, rtol: float, atol: float, min_step: float):
+    """从 t 积分到 end；最近 20 步平均步长低于 min_step 视为卡在不连续面上，提前返回。
+
+    返回 (稠密解, 到达时间, 是否完成)。
+    """
+    kwargs = {"jac": model.jac} if method in ("BDF", "Radau", "LSODA") else {}
+    if method not in METHODS:
+        raise ValueError(f"Unknown ODE method: {method} (choose from {', '.join(METHODS)})")
+    solver = METHODS[method](model.rhs, t, y, end, rtol=rtol, atol=atol, **kwargs)
+    ts, pieces = [t], []
+    while solver.status == "running":
+        if solver.step() is not None:
+            break
+        ts.append(solver.t)
+        pieces.append(solver.dense_output())
+        if len(ts) > 20 and ts[-1] - ts[-21] < 20 * min_step:
+            break
+    sol = OdeSolution(ts, pieces) if pieces else None
+    return sol, ts[-1], solver.status == "finished"
+
+
+def run_ode(
+    env: MetabolicEnvironment,
+    steps: int,
+    inject: Callable[[MetabolicEnvironment, int], None] = None,
+    sample_every: float = 1.0,
+    steps_per_hour: float = 60.0,
+    method: str = "BDF",
+    rtol: float = 1e-4,
+    atol: float = 1e-6,
+    chunk: int = 240,
+    min_step: float = 1e-6,
+    fallback: int = 30,
+) -> pd.DataFrame:
+    """用刚性求解器积分 steps 步，返回与 env.to_frame() 同名列的 DataFrame。
+
+    用途是精度参考：给出定步长引擎（步长为 1 的 Euler）所离散的连续模型的收敛解，用于衡量离散误差或按任意分辨率采样。
+    它不是加速后端——增量求值次数多于步数，餐食场景（24 h / 7 天）与空腹长程下都比定步长引擎慢 2–5 倍；
+    要以更少的求值近似定步长引擎，用 adaptive.run_adaptive。
+
+    inject(env, k) 与定步长 runner 一样在每个整数步 k 被调用：积分按 chunk 步分段推进，
+    用稠密输出逐步探测 inject 是否改变状态/参数，在首个改变处截断并从注入后的状态重新积分。
+    分支阈值处来回切换（滑模，如甘油三酯 > 128 的输出分支）会使求解器步长塌缩（平均步长低于 min_step 步），
+    此时退回单位步长推进 fallback 步（或到下一次注入），再恢复刚性积分。
+    输出行取在 t = sample_every, 2*sample_every, ... 步处（time 列为 t / steps_per_hour 小时），
+    定步长引擎第 i 行对应 t = i + 1。
+    """
+    model = LiverODE(env)
+    inject = as_inject(inject, env, steps)
+    if inject:
+        inject(env, 0)
+    y = model.pack()
+    t = 0
+    grid = np.arange(1, int(np.floor(steps / sample_every)) + 1) * sample_every
+    states: List[np.ndarray] = []
+    params: List[np.ndarray] = []
+    model.fallback_steps = 0
+
+    def sample(fn, lo: float, hi: float, p: np.ndarray) -> None:
+        sel = grid[(grid > lo) & (grid <= hi)]
+        if len(sel):
+            states.append(fn(sel))
+            params.append(np.tile(p, (len(sel), 1)))
+
+    while t < steps:
+        end = min(t + chunk, steps)
+        p = model.parameters()
+        sol, t_end, success = _integrate(model, t, end, y, method, rtol, atol, min_step)
+        reached = end if success else max(int(np.floor(t_end)), t)
+        stop, y_next = reached, (sol(reached) if reached > t else y)
+        if inject:
+            for k in range(t + 1, reached + 1 if reached < steps else reached):
+                model.unpack(sol(k))
+                if _inject_changes(env, inject, k):
+                    stop, y_next = k, model.pack()
+                    break
+        if stop > t:
+            sample(lambda sel: sol(sel).T, t, stop, p)
+        if not success and stop == reached:
+            ts, ys, y_next = _unit_steps(model, y_next, reached, min(reached + fallback, steps), steps, inject)
+            ys = np.array(ys)
+            sample(lambda sel: np.column_stack([np.interp(sel, ts, ys[:, i]) for i in range(model.size)]), ts[0], ts[-1], p)
+            model.fallback_steps += ts[-1] - ts[0]
+            stop = ts[-1]
+        t, y = stop, y_next
+    model.unpack(y)
+    Y = np.vstack(states) if states else np.empty((0, model.size))
+    P = np.vstack(params) if params else np.empty((0, len(model.parameter_names)))
+    _, rates = model.batch_tendency(Y, P) if len(Y) else (None, {})
+    columns = {k: Y[:, i] for i, k in enumerate(model.metabolite_names + model.signal_names)}
+    columns.update({k: P[:, i] for i, k in enumerate(model.parameter_names)})
+    columns.update({f"rate_{k}": v for k, v in rates.items() if not np.isnan(v).all()})
+    columns["time"] = grid[:len(Y)] / steps_per_hour
+    df = pd.DataFrame(columns)
+    df.attrs["nfev"] = model.nfev
+    df.attrs["njev"] = model.njev
+    df.attrs["fallback_steps"] = model.fallback_steps
+    return df
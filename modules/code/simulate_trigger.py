@@ -1,101 +1,264 @@
+import operator
 import simulate as sim
-from typing import Dict, Any, Callable, List, Tuple
+from typing import Dict, Any, Callable, List, Tuple, Union
+import numpy as np
 import pandas as pd
+from events import EventLog
+from schedule import Schedule, as_inject
 
 
 class TriggerCtx(sim.Ctx):
-    def __init__(self, env: sim.MetabolicEnvironment):
-        super().__init__(env)
-        self.step_events: List[Dict[str, Any]] = []
+    """触发式系统的反应上下文；每步的触发事件记录在 EventLog 中。"""
 
-    def record_event(self, name: str, status: str, detail: Dict[str, Any] = None) -> None:
-        self.step_events.append({"name": name, "status": status, "detail": detail or {}})
 
+class _Var:
+    """状态变量引用（可为两变量之差），比较运算生成阈值原子 (变量, 比较符, 常数)。"""
 
-def _glucose_stable(c: TriggerCtx) -> bool:
-    g = c.env.getMetabolite("glucose")
-    ins = c.env.getSignal("insulin")
-    glg = c.env.getSignal("glucagon")
-    return (85.0 <= g <= 110.0) and (abs(ins - glg) < 0.2)
+    def __init__(self, kind: str, name: str, minus: "_Var" = None):
+        self.kind = kind
+        self.name = name
+        self.minus = minus
 
+    def __sub__(self, other: "_Var") -> "_Var":
+        return _Var(self.kind, self.name, other)
 
-def _glucose_severely_low(c: TriggerCtx) -> bool:
-    return c.env.getMetabolite("glucose") < 65.0
+    def _atom(self, op: str, other) -> Tuple["_Var", str, float]:
+        # a op b 写成 (a - b) op 0：浮点减法在 a != b 时结果非零且符号正确，判定与直接比较一致
+        if isinstance(other, _Var):
+            return (_Var(self.kind, self.name, other), op, 0.0)
+        return (self, op, float(other))
+
+    def __lt__(self, other): return self._atom("<", other)
+    def __le__(self, other): return self._atom("<=", other)
+    def __gt__(self, other): return self._atom(">", other)
+    def __ge__(self, other): return self._atom(">=", other)
+
+
+def M(name: str) -> _Var:
+    return _Var("metabolites", name)
+
+
+def S(name: str) -> _Var:
+    return _Var("signals", name)
+
+
+def P(name: str) -> _Var:
+    return _Var("parameters", name)
+
+
+def any_of(*atoms: Tuple[_Var, str, float]) -> List[Tuple[_Var, str, float]]:
+    return list(atoms)
+
+
+# 谓词 = 子句列表（与），子句 = 原子或 any_of(...)（或）；NEVER 表示恒为假，整条反应跳过
+NEVER = None
+
+# 原 _glucose_stable 取反：not (85 <= g <= 110 and |insulin - glucagon| < 0.2)
+_GLUCOSE_UNSTABLE = any_of(
+    M("glucose") < 85.0,
+    M("glucose") > 110.0,
+    S("insulin") - S("glucagon") >= 0.2,
+    S("insulin") - S("glucagon") <= -0.2,
+)
+_GLUCOSE_SEVERELY_LOW = M("glucose") < 65.0
+
+REACTIONS: List[Tuple[str, Callable[[TriggerCtx], Dict[str, float]], Any]] = [
+    ("hexokinase_or_glucokinase", sim.hexokinase_or_glucokinase, [M("glucose") > 0.1, M("atp") > 0.1]),
+    ("pgm_G6P_to_G1P", sim.pgm_G6P_to_G1P, [M("glucose") > 1.0]),
+    ("udpGlucoseSynthesis", sim.udpGlucoseSynthesis, [M("glucose") > 0.5, M("atp") > 0.5]),
+    ("glycogenSynthaseStep", sim.glycogenSynthaseStep, [_GLUCOSE_UNSTABLE, S("insulin") > S("glucagon"), M("glucose") > 1.0, M("atp") > 0.5]),
+    ("branchingEnzymeStep", sim.branchingEnzymeStep, [M("glycogen") > 10.0]),
+    ("glycogenPhosphorylaseStep", sim.glycogenPhosphorylaseStep, [_GLUCOSE_UNSTABLE, any_of(S("glucagon") > S("insulin"), S("epinephrine") > 0.1), M("glycogen") > 10.0]),
+    ("debranchingEnzymeStep", sim.debranchingEnzymeStep, [M("glycogen") > 10.0]),
+    ("g1p_to_g6p", sim.g1p_to_g6p, NEVER),
+    ("pepck_OAA_to_PEP", sim.pepck_OAA_to_PEP, [M("atp") > 0.5]),
+    ("g6pase_G6P_to_Glucose", sim.g6pase_G6P_to_Glucose, NEVER),
+    ("glycolysis_middle_steps", sim.glycolysis_middle_steps, [M("glucose") > 1.0, M("nad_plus") > 0.5, M("adp") > 0.5]),
+    ("pyruvateKinase_step", sim.pyruvateKinase_step, NEVER),
+    ("fattyAcidSynthesis", sim.fattyAcidSynthesis, [S("insulin") > S("glucagon"), M("acetyl_coa") > 1.0, M("nadph") > 0.5, M("atp") > 0.5]),
+    ("betaOxidation", sim.betaOxidation, [_GLUCOSE_SEVERELY_LOW, M("fatty_acid") > 5.0, M("nad_plus") > 1.0]),
+    ("deNovoLipogenesis", sim.deNovoLipogenesis, [M("glucose") > 100.0, S("insulin") >= S("glucagon")]),
+    ("lipidTransport", sim.lipidTransport, [S("insulin") > S("glucagon"), M("fatty_acid") > 1.0]),
+    ("adiposeLipolysis", sim.adiposeLipolysis, [any_of(S("glucagon") > S("insulin"), S("epinephrine") > 0.2)]),
+    ("aminoAcidCatabolism", sim.aminoAcidCatabolism, [M("amino_acid") > 20.0, M("atp") > 0.5]),
+    ("aminoAcidSynthesisTransport", sim.aminoAcidSynthesisTransport, [M("amino_acid") > 10.0, M("atp") > 0.5]),
+    ("oxidativePhosphorylation", sim.oxidativePhosphorylation, [M("nadh") > 0.5, M("oxygen") > 10.0, M("adp") >= 1.0]),
+    ("ketogenesis", sim.ketogenesis, [M("glucose") < 70.0, S("glucagon") >= S("insulin")]),
+    ("cps1_Ammonia_to_CarbamoylPhosphate", sim.cps1_Ammonia_to_CarbamoylPhosphate, [M("ammonia") > 0.5, M("atp") > 0.5]),
+    ("otc_CarbamoylPhosphate_to_Citrulline", sim.otc_CarbamoylPhosphate_to_Citrulline, [M("citrulline") > 0.0, M("ornithine") > 0.0]),
+    ("ass1_Citrulline_to_ASP_Argininosuccinate", sim.ass1_Citrulline_to_ASP_Argininosuccinate, [M("argininosuccinate") > 0.1]),
+    ("asl_Argininosuccinate_to_Arginine_Fumarate", sim.asl_Argininosuccinate_to_Arginine_Fumarate, [M("arginine") > 0.1]),
+    ("arg1_Arginine_to_Urea_Ornithine", sim.arg1_Arginine_to_Urea_Ornithine, [M("arginine") > 0.1]),
+    ("phaseI_OxRed", sim.phaseI_OxRed, [P("xenobiotic_load") > 0.1, M("nadph") > 0.5, P("liver_function") > 0.2]),
+    ("phaseII_Conjugation", sim.phaseII_Conjugation, [M("phaseI_intermediates") > 0.1, P("liver_function") > 0.2, any_of(M("udpga") > 1.0, M("paps") > 1.0, M("gsh") > 1.0)]),
+    ("bilirubinUGT", sim.bilirubinUGT, [M("indirect_bilirubin") > 0.1, M("udpga") > 0.5, P("liver_function") > 0.2]),
+    ("ethanol_ADH", sim.ethanol_ADH, [M("ethanol") > 0.1, M("nad_plus") > 0.5, P("liver_function") > 0.2]),
+    ("acetaldehyde_ALDH", sim.acetaldehyde_ALDH, [M("acetaldehyde") > 0.1, M("nad_plus") > 0.5, P("liver_function") > 0.2]),
+    ("acetate_to_acetylcoa", sim.acetate_to_acetylcoa, [M("acetate") > 0.1, M("atp") > 0.5]),
+    ("bileAcidSynthesis", sim.bileAcidSynthesis, [M("cholesterol") > 1.0]),
+    ("plasmaProteinSynthesis", sim.plasmaProteinSynthesis, [M("amino_acid") > 10.0, M("atp") > 0.5]),
+    ("coagulationFactorSynthesis", sim.coagulationFactorSynthesis, [M("amino_acid") > 10.0, M("atp") > 0.5]),
+    ("cytosolicATPase_load", sim.cytosolicATPase_load, [M("atp") > 1.0]),
+]
+
+# 反应函数内部直接改写环境（setMetabolite），其后的谓词需基于新状态重新求值
+STATE_MUTATING = {"hexokinase_or_glucokinase"}
+
+_OPS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+_GETTERS = {"metabolites": "getMetabolite", "signals": "getSignal", "parameters": "getParameter"}
+
+
+def _clauses(spec) -> List[List[Tuple[_Var, str, float]]]:
+    return [c if isinstance(c, list) else [c] for c in spec]
+
+
+def _scalar_predicate(spec) -> Callable[[TriggerCtx], bool]:
+    if spec is NEVER:
+        return lambda c: False
+    clauses = _clauses(spec)
+
+    def value(c: TriggerCtx, v: _Var) -> float:
+        x = getattr(c.env, _GETTERS[v.kind])(v.name)
+        return x if v.minus is None else x - getattr(c.env, _GETTERS[v.minus.kind])(v.minus.name)
+
+    return lambda c: all(any(_OPS[op](value(c, v), k) for v, op, k in clause) for clause in clauses)
 
 
 def _reaction_list() -> List[Tuple[str, Callable[[TriggerCtx], Dict[str, float]], Callable[[TriggerCtx], bool]]]:
-    return [
-        ("hexokinase_or_glucokinase", sim.hexokinase_or_glucokinase, lambda c: min(c.env.getMetabolite("glucose"), c.env.getMetabolite("atp")) > 0.1),
-        ("pgm_G6P_to_G1P", sim.pgm_G6P_to_G1P, lambda c: c.env.getMetabolite("glucose") > 1.0),
-        ("udpGlucoseSynthesis", sim.udpGlucoseSynthesis, lambda c: c.env.getMetabolite("glucose") > 0.5 and c.env.getMetabolite("atp") > 0.5),
-        ("glycogenSynthaseStep", sim.glycogenSynthaseStep, lambda c: (not _glucose_stable(c)) and c.env.getSignal("insulin") > c.env.getSignal("glucagon") and c.env.getMetabolite("glucose") > 1.0 and c.env.getMetabolite("atp") > 0.5),
-        ("branchingEnzymeStep", sim.branchingEnzymeStep, lambda c: c.env.getMetabolite("glycogen") > 10.0),
-        ("glycogenPhosphorylaseStep", sim.glycogenPhosphorylaseStep, lambda c: (not _glucose_stable(c)) and (c.env.getSignal("glucagon") > c.env.getSignal("insulin") or c.env.getSignal("epinephrine") > 0.1) and c.env.getMetabolite("glycogen") > 10.0),
-        ("debranchingEnzymeStep", sim.debranchingEnzymeStep, lambda c: c.env.getMetabolite("glycogen") > 10.0),
-        ("g1p_to_g6p", sim.g1p_to_g6p, lambda c: False),
-        ("pepck_OAA_to_PEP", sim.pepck_OAA_to_PEP, lambda c: c.env.getMetabolite("atp") > 0.5),
-        ("g6pase_G6P_to_Glucose", sim.g6pase_G6P_to_Glucose, lambda c: False),
-        ("glycolysis_middle_steps", sim.glycolysis_middle_steps, lambda c: c.env.getMetabolite("glucose") > 1.0 and c.env.getMetabolite("nad_plus") > 0.5 and c.env.getMetabolite("adp") > 0.5),
-        ("pyruvateKinase_step", sim.pyruvateKinase_step, lambda c: False),
-        ("fattyAcidSynthesis", sim.fattyAcidSynthesis, lambda c: c.env.getSignal("insulin") > c.env.getSignal("glucagon") and c.env.getMetabolite("acetyl_coa") > 1.0 and c.env.getMetabolite("nadph") > 0.5 and c.env.getMetabolite("atp") > 0.5),
-        ("betaOxidation", sim.betaOxidation, lambda c: _glucose_severely_low(c) and c.env.getMetabolite("fatty_acid") > 5.0 and c.env.getMetabolite("nad_plus") > 1.0),
-        ("deNovoLipogenesis", sim.deNovoLipogenesis, lambda c: c.env.getMetabolite("glucose") > 100.0 and c.env.getSignal("insulin") >= c.env.getSignal("glucagon")),
-        ("lipidTransport", sim.lipidTransport, lambda c: c.env.getSignal("insulin") > c.env.getSignal("glucagon") and c.env.getMetabolite("fatty_acid") > 1.0),
-        ("adiposeLipolysis", sim.adiposeLipolysis, lambda c: c.env.getSignal("glucagon") > c.env.getSignal("insulin") or c.env.getSignal("epinephrine") > 0.2),
-        ("aminoAcidCatabolism", sim.aminoAcidCatabolism, lambda c: c.env.getMetabolite("amino_acid") > 20.0 and c.env.getMetabolite("atp") > 0.5),
-        ("aminoAcidSynthesisTransport", sim.aminoAcidSynthesisTransport, lambda c: c.env.getMetabolite("amino_acid") > 10.0 and c.env.getMetabolite("atp") > 0.5),
-        ("oxidativePhosphorylation", sim.oxidativePhosphorylation, lambda c: c.env.getMetabolite("nadh") > 0.5 and c.env.getMetabolite("oxygen") > 10.0 and c.env.getMetabolite("adp") >= 1.0),
-        ("ketogenesis", sim.ketogenesis, lambda c: c.env.getMetabolite("glucose") < 70.0 and c.env.getSignal("glucagon") >= c.env.getSignal("insulin")),
-        ("cps1_Ammonia_to_CarbamoylPhosphate", sim.cps1_Ammonia_to_CarbamoylPhosphate, lambda c: c.env.getMetabolite("ammonia") > 0.5 and c.env.getMetabolite("atp") > 0.5),
-        ("otc_CarbamoylPhosphate_to_Citrulline", sim.otc_CarbamoylPhosphate_to_Citrulline, lambda c: c.env.getMetabolite("citrulline") > 0.0 and c.env.getMetabolite("ornithine") > 0.0),
-        ("ass1_Citrulline_to_ASP_Argininosuccinate", sim.ass1_Citrulline_to_ASP_Argininosuccinate, lambda c: c.env.getMetabolite("argininosuccinate") > 0.1),
-        ("asl_Argininosuccinate_to_Arginine_Fumarate", sim.asl_Argininosuccinate_to_Arginine_Fumarate, lambda c: c.env.getMetabolite("arginine") > 0.1),
-        ("arg1_Arginine_to_Urea_Ornithine", sim.arg1_Arginine_to_Urea_Ornithine, lambda c: c.env.getMetabolite("arginine") > 0.1),
-        ("phaseI_OxRed", sim.phaseI_OxRed, lambda c: c.env.getParameter("xenobiotic_load") > 0.1 and c.env.getMetabolite("nadph") > 0.5 and c.env.getParameter("liver_function") > 0.2),
-        ("phaseII_Conjugation", sim.phaseII_Conjugation, lambda c: c.env.getMetabolite("phaseI_intermediates") > 0.1 and c.env.getParameter("liver_function") > 0.2 and (c.env.getMetabolite("udpga") > 1.0 or c.env.getMetabolite("paps") > 1.0 or c.env.getMetabolite("gsh") > 1.0)),
-        ("bilirubinUGT", sim.bilirubinUGT, lambda c: c.env.getMetabolite("indirect_bilirubin") > 0.1 and c.env.getMetabolite("udpga") > 0.5 and c.env.getParameter("liver_function") > 0.2),
-        ("ethanol_ADH", sim.ethanol_ADH, lambda c: c.env.getMetabolite("ethanol") > 0.1 and c.env.getMetabolite("nad_plus") > 0.5 and c.env.getParameter("liver_function") > 0.2),
-        ("acetaldehyde_ALDH", sim.acetaldehyde_ALDH, lambda c: c.env.getMetabolite("acetaldehyde") > 0.1 and c.env.getMetabolite("nad_plus") > 0.5 and c.env.getParameter("liver_function") > 0.2),
-        ("acetate_to_acetylcoa", sim.acetate_to_acetylcoa, lambda c: c.env.getMetabolite("acetate") > 0.1 and c.env.getMetabolite("atp") > 0.5),
-        ("bileAcidSynthesis", sim.bileAcidSynthesis, lambda c: c.env.getMetabolite("cholesterol") > 1.0),
-        ("plasmaProteinSynthesis", sim.plasmaProteinSynthesis, lambda c: c.env.getMetabolite("amino_acid") > 10.0 and c.env.getMetabolite("atp") > 0.5),
-        ("coagulationFactorSynthesis", sim.coagulationFactorSynthesis, lambda c: c.env.getMetabolite("amino_acid") > 10.0 and c.env.getMetabolite("atp") > 0.5),
-        ("cytosolicATPase_load", sim.cytosolicATPase_load, lambda c: c.env.getMetabolite("atp") > 1.0),
-    ]
+    # 兼容旧接口：逐条标量求值的 (名称, 反应函数, 谓词)
+    return [(name, fn, _scalar_predicate(spec)) for name, fn, spec in REACTIONS]
+
+
+class CompiledPredicates:
+    """把 REACTIONS 的谓词编译为索引数组，对状态向量一次性求出全部反应的触发掩码。
+
+    原子 (x[a] - x[b]) op c 统一改写为 sgn * ((x[a] - x[b]) - c) > thr：> 与 >= 取 sgn=+1，< 与 <= 取 -1；
+    严格比较 thr=0，非严格比较 thr=-最小次正规数（两者之间没有其他浮点数，判定与原比较完全一致）。
+    原子按子句、子句按反应连续排列，分别用 logical_or/logical_and.reduceat 归约；恒假反应不参与求值。
+    """
+
+    _KINDS = ("metabolites", "signals", "parameters")
+
+    def __init__(self, reactions=REACTIONS):
+        self.names = [name for name, _, _ in reactions]
+        live = [i for i, (_, _, spec) in enumerate(reactions) if spec is not NEVER]
+        atoms = [(i, j, v, op, k) for i in live for j, clause in enumerate(_clauses(reactions[i][2])) for v, op, k in clause]
+        used = {(u.kind, u.name) for _, _, v, _, _ in atoms for u in (v, v.minus) if u is not None}
+        # 状态向量按 kind 分组排列，每组用一次 itemgetter 从环境的槽位列表取值；末尾固定为 0.0，供单变量原子的 x[b] 使用
+        self.keys = [(kind, name) for kind in self._KINDS for name in sorted(n for k, n in used if k == kind)]
+        self._symbols = None
+        self._getters = None
+        slot = {key: i for i, key in enumerate(self.keys)}
+        zero = len(self.keys)
+        self.a = np.array([slot[(v.kind, v.name)] for _, _, v, _, _ in atoms], dtype=np.intp)
+        self.b = np.array([zero if v.minus is None else slot[(v.minus.kind, v.minus.name)] for _, _, v, _, _ in atoms], dtype=np.intp)
+        self.c = np.array([k for _, _, _, _, k in atoms], dtype=float)
+        self.sgn = np.array([1.0 if op in (">", ">=") else -1.0 for _, _, _, op, _ in atoms])
+        tiny = np.nextafter(0.0, 1.0)
+        self.thr = np.array([-tiny if op in (">=", "<=") else 0.0 for _, _, _, op, _ in atoms])
+        self.clause_starts = np.array([n for n, at in enumerate(atoms) if n == 0 or at[:2] != atoms[n - 1][:2]], dtype=np.intp)
+        clause_reaction = [atoms[n][0] for n in self.clause_starts]
+        self.reaction_starts = np.array([n for n, r in enumerate(clause_reaction) if n == 0 or r != clause_reaction[n - 1]], dtype=np.intp)
+        self.live = np.array(live, dtype=np.intp)
+        self._x = np.zeros(zero + 1)
+        self._mask = np.zeros(len(self.names), dtype=bool)
+
+    def _bind(self, symbols) -> None:
+        # 按环境的符号表把变量名解析为槽位；有变量不在表中时退回逐项按名称读取（缺失项按 0.0）
+        self._symbols = symbols
+        self._getters = []
+        for kind in self._KINDS:
+            names = [n for k, n in self.keys if k == kind]
+            index = getattr(symbols, kind)
+            if any(n not in index for n in names):
+                self._getters = None
+                return
+            if names:
+                slots = [index[n] for n in names]
+                getter = operator.itemgetter(*slots) if len(slots) > 1 else (lambda v, i=slots[0]: (v[i],))
+                self._getters.append((sim.MetabolicEnvironment._ATTRS[kind], getter))
+
+    def state(self, env: sim.MetabolicEnvironment) -> np.ndarray:
+        if env.symbols is not self._symbols:
+            self._bind(env.symbols)
+        if self._getters is None:
+            values = [getattr(env, kind).get(name, 0.0) for kind, name in self.keys]
+        else:
+            values = ()
+            for attr, getter in self._getters:
+                values += getter(getattr(env, attr))
+        x = self._x
+        x[:-1] = values
+        return x
+
+    def evaluate(self, x: np.ndarray) -> np.ndarray:
+        hit = self.sgn * ((x[self.a] - x[self.b]) - self.c) > self.thr
+        clause_ok = np.logical_or.reduceat(hit, self.clause_starts)
+        mask = self._mask.copy()
+        mask[self.live] = np.logical_and.reduceat(clause_ok, self.reaction_starts)
+        return mask
 
 
 class LiverMetabolismSystemTrigger:
-    def __init__(self, env: sim.MetabolicEnvironment):
+    def __init__(self, env: sim.MetabolicEnvironment, compiled: bool = True):
         self.env = env
         self.ctx = TriggerCtx(env)
-        self.events_history: List[Dict[str, Any]] = []
+        self.compiled = compiled
+        # 反应表与谓词只在构造时编译一次
+        self.reactions = [(name, fn, name in STATE_MUTATING) for name, fn, _ in REACTIONS]
+        self.predicates = CompiledPredicates(REACTIONS)
+        self.events_history = EventLog([name for name, _, _ in REACTIONS])
+
+    def _trigger_mask(self) -> List[bool]:
+        return self.predicates.evaluate(self.predicates.state(self.env)).tolist()
 
     def step(self, t: int):
-        self.ctx.step_events = []
         sim.orchestrateSystemSignals(self.ctx)
         sim.applyEnergyDeficitPolicies(self.ctx)
-        reactions = _reaction_list()
+        fired = self._step_compiled() if self.compiled else self._step_reference()
+        self.events_history.append(t, fired)
+        self.env.update_history(t)
+
+    def _step_compiled(self) -> List[bool]:
+        mask = self._trigger_mask()
+        fired: List[bool] = []
+        outputs: Dict[str, float] = {}
+        for i, (name, fn, mutating) in enumerate(self.reactions):
+            ok = mask[i]
+            fired.append(ok)
+            if ok:
+                res = fn(self.ctx)
+                for k, v in res.items():
+                    outputs[k] = outputs.get(k, 0.0) + float(v)
+                if mutating:
+                    mask = self._trigger_mask()
+        self.env.writeOutputs(outputs)
+        return fired
+
+    def _step_reference(self) -> List[bool]:
+        # 逐条标量求值谓词（每步重建反应表），用于对照与基准
+        fired: List[bool] = []
         outputs: Dict[str, float] = {}
-        for name, fn, pred in reactions:
+        for name, fn, pred in _reaction_list():
             ok = bool(pred(self.ctx))
+            fired.append(ok)
             if ok:
                 res = fn(self.ctx)
                 for k, v in res.items():
                     outputs[k] = outputs.get(k, 0.0) + float(v)
-                self.ctx.record_event(name, "triggered", {})
-            else:
-                self.ctx.record_event(name, "stopped", {})
         self.env.writeOutputs(outputs)
-        self.events_history.append({"time": t, "events": list(self.ctx.step_events)})
-        self.env.update_history(t)
+        return fired
 
 
-def run_with_trigger(env: sim.MetabolicEnvironment, minutes: int, inject: Callable[[sim.MetabolicEnvironment, int], None] = None) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+def run_with_trigger(env: sim.MetabolicEnvironment, minutes: int, inject: Union[Schedule, Callable[[sim.MetabolicEnvironment, int], None]] = None) -> Tuple[pd.DataFrame, EventLog]:
     sys = LiverMetabolismSystemTrigger(env)
+    inject = as_inject(inject, env, minutes)
+    env.reserve_history(minutes)
+    sys.events_history.reserve(minutes)
     for tt in range(minutes):
         hour = tt / 60.0
         if inject:
             inject(env, tt)
         sys.step(hour)
-    df = pd.DataFrame(env.history)
+    df = env.to_frame()
     return df, sys.events_history
@@ -1,105 +1,115 @@
 import pandas as pd
 import numpy as np
+from history import load_results
+
+def _smooth(data):
+    # 5 点居中滑动平均（与 Series.rolling(window=5, center=True, min_periods=1).mean() 逐位一致），各列一次完成
+    return pd.DataFrame(data, copy=False).rolling(window=5, center=True, min_periods=1).mean().to_numpy()
+
+
+def analyze_trends(data, time, threshold=0.02):
+    """
+    analyze_trend 的多列版本：data 为 (时间点, 列) 数组，返回每列的分段列表。
+    平滑、极值点检测和趋势判定对所有列一次完成；阈值合并只遍历各列的极值点。
+    """
+    data = np.asarray(data, dtype=float)
+    time = np.asarray(time)
+    n, ncols = data.shape
+    if n < 2:
+        return [[] for _ in range(ncols)]
+
+    # 1. 平滑处理以减少噪声
+    smoothed = _smooth(data)
+
+    # 2. 寻找局部极值点 (拐点)：diff(sign(diff(x))) 非零处，按列排序；NaN 也算作变化点
+    sign_diffs = np.diff(np.sign(np.diff(smoothed, axis=0)), axis=0)
+    cols, rows = np.nonzero((sign_diffs != 0).T)
+    bounds = np.searchsorted(cols, np.arange(ncols + 1))
+
+    # 3. 过滤微小的波动：变化幅度小于总体范围的 threshold 的段与后一段合并
+    frame = pd.DataFrame(data, copy=False)
+    data_range = (frame.max() - frame.min()).to_numpy()
+
+    results = []
+    for j in range(ncols):
+        if data_range[j] == 0:
+            results.append([{
+                "start_time": time[0],
+                "end_time": time[-1],
+                "start_val": data[0, j],
+                "end_val": data[-1, j],
+                "trend": "平稳"
+            }])
+            continue
+        indices = [0] + (rows[bounds[j]:bounds[j + 1]] + 1).tolist() + [n - 1]
+        levels = smoothed[indices, j].tolist()
+        limit = data_range[j] * threshold
+        kept = [0]
+        last = levels[0]
+        for i in range(1, len(indices) - 1):
+            if abs(levels[i] - last) > limit:
+                kept.append(indices[i])
+                last = levels[i]
+        kept.append(n - 1)
+
+        # 4. 生成分段描述
+        kept = np.array(kept)
+        vals = data[kept, j]
+        diff = vals[1:] - vals[:-1]
+        trends = np.where(diff > data_range[j] * 0.01, "上升", np.where(diff < -data_range[j] * 0.01, "下降", "平稳"))
+        times = time[kept]
+        results.append([{
+            "start_time": times[i],
+            "end_time": times[i + 1],
+            "start_val": vals[i],
+            "end_val": vals[i + 1],
+            "trend": str(trends[i])
+        } for i in range(len(kept) - 1)])
+
+    return results
+
 
 def analyze_trend(series, time, threshold=0.02):
     """
     分析时间序列的趋势。
     返回分段列表，每一段包含起始时间、结束时间、起始值、结束值和趋势类型。
     """
-    if len(series) < 2:
-        return []
+    return analyze_trends(np.asarray(series, dtype=float)[:, None], time, threshold)[0]
 
-    # 1. 平滑处理以减少噪声
-    smoothed = series.rolling(window=5, center=True, min_periods=1).mean()
-    
-    # 2. 寻找局部极值点 (拐点)
-    # diff(sign(diff(x))) 在峰值为 -2, 谷值为 +2
-    diffs = np.diff(smoothed)
-    signs = np.sign(diffs)
-    sign_diffs = np.diff(signs)
-    
-    # 找出符号变化的点 (索引需要+1因为做了两次diff)
-    extrema_indices = np.where(sign_diffs != 0)[0] + 1
-    
-    # 总是包含起点和终点
-    indices = [0] + list(extrema_indices) + [len(series)-1]
-    indices = sorted(list(set(indices)))
-    
-    # 3. 过滤微小的波动
-    # 如果某段的变化幅度小于总体范围的 threshold，则尝试合并
-    data_range = series.max() - series.min()
-    if data_range == 0:
-         return [{
-            "start_time": time.iloc[0],
-            "end_time": time.iloc[-1],
-            "start_val": series.iloc[0],
-            "end_val": series.iloc[-1],
-            "trend": "平稳"
-        }]
-
-    filtered_indices = [indices[0]]
-    for i in range(1, len(indices)):
-        prev_idx = filtered_indices[-1]
-        curr_idx = indices[i]
-        
-        # 检查这一段的幅度
-        val_diff = abs(smoothed.iloc[curr_idx] - smoothed.iloc[prev_idx])
-        
-        # 如果是最后一点，或者变化幅度足够大
-        if i == len(indices) - 1 or val_diff > data_range * threshold:
-            filtered_indices.append(curr_idx)
-    
-    # 4. 生成分段描述
-    segments = []
-    for i in range(len(filtered_indices) - 1):
-        start_idx = filtered_indices[i]
-        end_idx = filtered_indices[i+1]
-        
-        start_val = series.iloc[start_idx]
-        end_val = series.iloc[end_idx]
-        
-        diff = end_val - start_val
-        
-        # 定义趋势
-        if diff > data_range * 0.01:
-            trend = "上升"
-        elif diff < -data_range * 0.01:
-            trend = "下降"
-        else:
-            trend = "平稳"
-            
-        segments.append({
-            "start_time": time.iloc[start_idx],
-            "end_time": time.iloc[end_idx],
-            "start_val": start_val,
-            "end_val": end_val,
-            "trend": trend
-        })
-        
-    return segments
 
-def summarize_metabolism(csv_path, output_path='metabolite_summary_train_cases.md'):
-    df = pd.read_csv(csv_path)
-    summary = []
-    
+def _load(results, columns=None):
+    # 汇总输入 -> (列名, (时间点, 列) 数组, 时间轴)；'scenario' 和 'time' 不参与汇总
+    if isinstance(results, np.ndarray):
+        names = list(columns) if columns is not None else [f"col_{j}" for j in range(results.shape[1])]
+        df = pd.DataFrame(results, columns=names, copy=False)
+    elif isinstance(results, pd.DataFrame):
+        df = results
+    elif str(results).lower().endswith('.csv'):
+        # CSV 沿用原解析方式
+        df = pd.read_csv(results)
+    else:
+        # .mmap 等历史文件由 load_results 零拷贝打开
+        df = load_results(str(results))
+
     # 确定时间轴
     if 'time' in df.columns:
-        time_col = df['time']
+        time_col = df['time'].to_numpy()
     else:
-        time_col = pd.Series(range(len(df)))
-        
-    for col in df.columns:
-        if col in ['scenario', 'time']: continue
-        
-        # 基础统计
-        start_val = df[col].iloc[0]
-        end_val = df[col].iloc[-1]
-        max_val = df[col].max()
-        min_val = df[col].min()
-        
-        # 趋势分析
-        segments = analyze_trend(df[col], time_col)
-        
+        time_col = np.arange(len(df))
+    names = [c for c in df.columns if c not in ['scenario', 'time']]
+    return names, df[names].to_numpy(dtype=float), time_col
+
+
+def _format_summary(names, start_vals, end_vals, min_vals, max_vals, trends):
+    # 各列的 Markdown 段落（概览 / 详细趋势 / 关键转折点），段落之间空一行
+    summary = []
+    for j, col in enumerate(names):
+        start_val = start_vals[j]
+        end_val = end_vals[j]
+        max_val = max_vals[j]
+        min_val = min_vals[j]
+        segments = trends[j]
+
         # 构建描述
         col_summary = f"### {col}\n"
         col_summary += f"- 概览: 起始 {start_val:.2f}, 结束 {end_val:.2f}, 范围 [{min_val:.2f}, {max_val:.2f}]\n"
@@ -107,7 +117,6 @@ def summarize_metabolism(csv_path, output_path='metabolite_summary_train_cases.m
         if segments:
             col_summary += f"- 详细趋势:\n"
             for i, seg in enumerate(segments):
-                change = seg['end_val'] - seg['start_val']
                 col_summary += f"  {i+1}. 时间 {seg['start_time']:.2f} -> {seg['end_time']:.2f}: {seg['trend']} (从 {seg['start_val']:.2f} 到 {seg['end_val']:.2f})\n"
             
             # 关键转折点
@@ -121,9 +130,22 @@ def summarize_metabolism(csv_path, output_path='metabolite_summary_train_cases.m
                         col_summary += f"  - 时间 {t_point:.2f}: 趋势由 {prev_trend} 转变为 {next_trend}\n"
         
         summary.append(col_summary)
+    return "\n".join(summary)
+
+
+def summarize_metabolism(csv_path, output_path='metabolite_summary_train_cases.md', columns=None):
+    """
+    生成各列的 Markdown 趋势摘要。csv_path 可以是结果文件路径（CSV 或 .mmap 等历史文件）、
+    DataFrame，或 (时间点, 列) 数组（columns 给出列名，含 'time' 列时作为时间轴）。
+    """
+    names, data, time_col = _load(csv_path, columns)
+    trends = analyze_trends(data, time_col)
+
+    # 基础统计
+    frame = pd.DataFrame(data, copy=False)
+    summary = _format_summary(names, data[0], data[-1], frame.min().to_numpy(), frame.max().to_numpy(), trends)
 
     # 保存到Markdown文件
-    summary = "\n".join(summary)
     print(summary)
     with open(output_path, 'w', encoding='utf-8') as f:
         f.write(summary)
@@ -131,6 +153,248 @@ def summarize_metabolism(csv_path, output_path='metabolite_summary_train_cases.m
     return summary
 
 
+class TrendSummarizer:
+    """
+    在线趋势摘要：随模拟逐步更新，任意时刻 trends() / markdown() 给出的结果与对已记录的全部历史调用
+    analyze_trends / summarize_metabolism 相同。
+
+    每步只更新各列（向量化）的滑动窗口状态（与 pandas rolling 均值相同的补偿求和，结果逐位一致）、
+    最近 5 个原始值和已确定的极值点；不保留完整历史，内存随极值点个数增长。
+    阈值依赖整列的范围，因此合并在输出时进行，范围不变时从上次的位置继续。
+
+    作为记录器观察者使用：TrendSummarizer().attach(env.recorder)；columns 为 None 时跟随记录器的列
+    （跳过 'time' / 'scenario'），时间轴取 'time' 列。
+    """
+
+    def __init__(self, columns=None, threshold=0.02):
+        self.threshold = threshold
+        self.names = []
+        self.n = 0
+        self._follow = columns is None
+        self._source = None
+        k = 0
+        self._ring = np.empty((5, k))       # 最近 5 个原始值（下标 % 5）
+        self._times = [None] * 5
+        self._sum = np.empty(k)
+        self._comp_add = np.empty(k)
+        self._comp_remove = np.empty(k)
+        self._nobs = np.empty(k, dtype=np.int64)
+        self._neg = np.empty(k, dtype=np.int64)
+        self._same = np.empty(k, dtype=np.int64)
+        self._prev_value = np.empty(k)
+        self._smoothed = np.empty((2, k))   # 最近两个已确定的平滑值（下标 % 2）
+        self._level0 = np.empty(k)          # s[0]
+        self._sign = np.empty(k)
+        self._start = np.empty(k)
+        self._max = np.empty(k)
+        self._min = np.empty(k)
+        self._time0 = None
+        self._candidates = []               # 每列：已确定的极值点 (下标, 时间, 原始值, 平滑值)
+        self._merged = []                   # 每列：阈值合并的进度 (阈值, 已处理的极值点数, 保留的点, 最后保留的平滑值)
+        if columns is not None:
+            self._grow(list(columns))
+
+    def _grow(self, names):
+        # 新增列：视为此前各步均为 NaN
+        k = len(names)
+        nan = np.full(k, np.nan)
+        zero = np.zeros(k, dtype=np.int64)
+        self.names += names
+        self._ring = np.concatenate([self._ring, np.full((5, k), np.nan)], axis=1)
+        self._sum = np.concatenate([self._sum, np.zeros(k)])
+        self._comp_add = np.concatenate([self._comp_add, np.zeros(k)])
+        self._comp_remove = np.concatenate([self._comp_remove, np.zeros(k)])
+        self._nobs = np.concatenate([self._nobs, zero])
+        self._neg = np.concatenate([self._neg, zero])
+        self._same = np.concatenate([self._same, zero])
+        self._prev_value = np.concatenate([self._prev_value, nan])
+        self._smoothed = np.concatenate([self._smoothed, np.full((2, k), np.nan)], axis=1)
+        self._level0 = np.concatenate([self._level0, nan])
+        self._sign = np.concatenate([self._sign, nan])
+        self._start = np.concatenate([self._start, nan])
+        self._max = np.concatenate([self._max, nan])
+        self._min = np.concatenate([self._min, nan])
+        self._candidates += [[] for _ in range(k)]
+        self._merged += [None] * k
+
+    # --- 逐步更新 ---
+    def attach(self, recorder):
+        """注册为 HistoryRecorder 的观察者，此后每记录一行更新一次。"""
+        self._source = None
+        recorder.add_observer(self)
+        return self
+
+    def __call__(self, recorder, row):
+        source = self._source
+        if source is None or source[0] != len(recorder.columns):
+            if self._follow:
+                known = set(self.names)
+                self._grow([c for c in recorder.columns if c not in known and c not in ['scenario', 'time']])
+            idx = np.array([recorder.index.get(c, -1) for c in self.names], dtype=np.intp)
+            source = self._source = (len(recorder.columns), idx, idx >= 0, recorder.index.get('time'))
+        _, idx, have, time_idx = source
+        data = recorder.row_array(row)
+        if have.all():
+            values = data[idx]
+        else:
+            values = np.full(len(idx), np.nan)
+            values[have] = data[idx[have]]
+        self.update(values, self.n if time_idx is None else data[time_idx])
+
+    def update(self, values, time):
+        """记录一步：values 与 names 对齐的各列取值，time 为该步的时间。"""
+        x = np.array(values, dtype=float)
+        k = self.n
+        slot = k % 5
+        if k == 0:
+            self._time0 = time
+            self._start = x.copy()
+            self._prev_value = x.copy()
+        elif k >= 5:
+            self._remove(self._sum, self._comp_remove, self._nobs, self._neg, self._ring[slot])
+        self._ring[slot] = x
+        self._times[slot] = time
+        self._add(x)
+        self._max = np.fmax(self._max, x)
+        self._min = np.fmin(self._min, x)
+        self.n = k + 1
+        if k >= 2:
+            self._commit(k - 2)
+
+    @staticmethod
+    def _remove(total, comp, nobs, neg, x):
+        valid = x == x
+        y = -x - comp
+        t = total + y
+        np.copyto(comp, t - total - y, where=valid)
+        np.copyto(total, t, where=valid)
+        nobs -= valid
+        neg -= valid & np.signbit(x)
+
+    def _add(self, x):
+        valid = x == x
+        y = x - self._comp_add
+        t = self._sum + y
+        np.copyto(self._comp_add, t - self._sum - y, where=valid)
+        np.copyto(self._sum, t, where=valid)
+        self._nobs += valid
+        self._neg += valid & np.signbit(x)
+        self._same = np.where(valid, np.where(x == self._prev_value, self._same + 1, 1), self._same)
+        np.copyto(self._prev_value, x, where=valid)
+
+    def _mean(self, total, nobs, neg):
+        # 与 pandas 的窗口均值一致：窗口内值全相同时取该值，全为非负（非正）时结果不为负（正）
+        valid = nobs > 0
+        result = np.full(len(total), np.nan)
+        np.divide(total, nobs, out=result, where=valid)
+        np.copyto(result, 0.0, where=((neg == 0) & (result < 0)) | ((neg == nobs) & (result > 0)))
+        np.copyto(result, self._prev_value, where=valid & (self._same >= nobs))
+        return result
+
+    def _commit(self, i):
+        # 窗口 i 的右端已到达，平滑值 s[i] 确定；若 s[i-1] 处斜率符号改变则记为极值点
+        level = self._mean(self._sum, self._nobs, self._neg)
+        prev = self._smoothed[(i - 1) % 2]
+        self._smoothed[i % 2] = level
+        if i == 0:
+            self._level0 = level
+            return
+        sign = np.sign(level - prev)
+        if i >= 2:
+            j = i - 1
+            raw, t = self._ring[j % 5], self._times[j % 5]
+            for c in np.flatnonzero(((sign - self._sign) != 0) & (prev == prev)).tolist():
+                self._candidates[c].append((j, t, raw[c], prev[c]))
+        self._sign = sign
+
+    # --- 输出 ---
+    def _tail(self):
+        # 尚未确定的末尾平滑值（截断窗口）及其中的极值点：返回 (s[0], {列: [(下标, 时间, 原始值, 平滑值)]})
+        # s[0] 在 n >= 3 时已确定
+        n = self.n
+        first = max(n - 2, 0)
+        total, comp = self._sum.copy(), self._comp_remove.copy()
+        nobs, neg = self._nobs.copy(), self._neg.copy()
+        levels = [self._smoothed[i % 2] for i in range(max(n - 4, 0), first)]
+        for i in range(first, n):
+            if i >= 3:
+                self._remove(total, comp, nobs, neg, self._ring[(i - 3) % 5])
+            levels.append(self._mean(total, nobs, neg))
+        lo = max(n - 4, 0)
+        level0 = self._level0 if n >= 3 else levels[0]
+        tail = {}
+        if len(levels) >= 3:
+            levels = np.array(levels)
+            flagged = np.diff(np.sign(np.diff(levels, axis=0)), axis=0) != 0
+            for r, c in zip(*np.nonzero(flagged)):
+                j = lo + 1 + int(r)
+                if j >= max(n - 3, 1) and levels[r + 1, c] == levels[r + 1, c]:
+                    tail.setdefault(int(c), []).append((j, self._times[j % 5], self._ring[j % 5, c], levels[r + 1, c]))
+        return level0, tail
+
+    def trends(self):
+        """各列的分段列表（与 analyze_trends 对当前已记录历史的结果相同）。"""
+        n = self.n
+        if n < 2:
+            return [[] for _ in self.names]
+        level0, tail = self._tail()
+        data_range = self._max - self._min
+        t_last, x_last = self._times[(n - 1) % 5], self._ring[(n - 1) % 5]
+        results = []
+        for c in range(len(self.names)):
+            rng = data_range[c]
+            first = (0, self._time0, self._start[c])
+            last = (n - 1, t_last, x_last[c])
+            if rng == 0:
+                results.append([{"start_time": first[1], "end_time": last[1], "start_val": first[2],
+                                 "end_val": last[2], "trend": "平稳"}])
+                continue
+            limit = rng * self.threshold
+            merged = self._merged[c]
+            if merged is None or merged[0] != limit or n < 3:
+                merged = (limit, 0, [first], level0[c])
+            _, pos, kept, level = merged
+            candidates = self._candidates[c]
+            kept = list(kept)
+            for j, t, raw, lv in candidates[pos:]:
+                if abs(lv - level) > limit:
+                    kept.append((j, t, raw))
+                    level = lv
+            if n >= 3:
+                self._merged[c] = (limit, len(candidates), kept, level)
+            kept = list(kept)
+            for j, t, raw, lv in tail.get(c, ()):
+                if abs(lv - level) > limit:
+                    kept.append((j, t, raw))
+                    level = lv
+            kept.append(last)
+            segments = []
+            for a, b in zip(kept[:-1], kept[1:]):
+                diff = b[2] - a[2]
+                if diff > rng * 0.01:
+                    trend = "上升"
+                elif diff < -rng * 0.01:
+                    trend = "下降"
+                else:
+                    trend = "平稳"
+                segments.append({"start_time": a[1], "end_time": b[1], "start_val": a[2], "end_val": b[2], "trend": trend})
+            results.append(segments)
+        return results
+
+    def markdown(self):
+        """当前的 Markdown 摘要（与 summarize_metabolism 的输出相同）。"""
+        if self.n == 0:
+            return ""
+        end = self._ring[(self.n - 1) % 5]
+        return _format_summary(self.names, self._start, end, self._min, self._max, self.trends())
+
+    def write(self, output_path):
+        summary = self.markdown()
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(summary)
+        return summary
+
+
 if __name__ == "__main__":
     csv_path = "../results/simulation_result_train_cases.csv"
     txt_path = "../results/metabolite_summary_train_cases.md"
@@ -0,0 +1,225 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import product
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from batch import BatchMetabolicEnvironment, run_batch
+from schedule import as_inject
+from simulate import LiverMetabolismSystem, MetabolicEnvironment
+
+# 每步 1 分钟，指标中的时间以小时计
+DT = 1.0 / 60.0
+
+
+# --- 试验设计：每行一个参数组合，列为参数（或初始信号/代谢物）名 ---
+def grid(**levels: Sequence[float]) -> pd.DataFrame:
+    """全因子网格：grid(liver_function=[0.5, 1.0], aldh_activity=[0.2, 1.0]) -> 4 行。"""
+    names = list(levels)
+    rows = list(product(*(list(levels[k]) for k in names)))
+    return pd.DataFrame(rows, columns=names, dtype=np.float64)
+
+
+def latin_hypercube(n: int, seed: int = None, **bounds: Tuple[float, float]) -> pd.DataFrame:
+    """拉丁超立方抽样：每个参数的 [lo, hi] 等分为 n 层，每层恰好取一个点。"""
+    rng = np.random.default_rng(seed)
+    cols = {}
+    for name, (lo, hi) in bounds.items():
+        u = (rng.permutation(n) + rng.random(n)) / n
+        cols[name] = lo + u * (hi - lo)
+    return pd.DataFrame(cols, columns=list(bounds))
+
+
+# --- 标量指标 ---
+class Metric:
+    """把若干历史列归约为每次运行一个标量。
+
+    fn(h, dt) 中 h[列] 为 (steps, N) 数组（N 为同批运行数），dt 为步长（小时），返回长度 N 的数组。
+    自定义指标直接 Metric(["glucose"], fn)；进程池执行时 fn 需可 pickle（模块级函数或其 partial）。
+    """
+
+    def __init__(self, columns: Sequence[str], fn: Callable[[Dict[str, np.ndarray], float], np.ndarray]):
+        self.columns = list(columns)
+        self.fn = fn
+
+    def __call__(self, h: Dict[str, np.ndarray], dt: float) -> np.ndarray:
+        return self.fn(h, dt)
+
+
+def _peak(column: str, h: Dict[str, np.ndarray], dt: float) -> np.ndarray:
+    return np.nanmax(h[column], axis=0)
+
+
+def _trough(column: str, h: Dict[str, np.ndarray], dt: float) -> np.ndarray:
+    return np.nanmin(h[column], axis=0)
+
+
+def _final(column: str, h: Dict[str, np.ndarray], dt: float) -> np.ndarray:
+    return h[column][-1]
+
+
+def _auc(column: str, h: Dict[str, np.ndarray], dt: float) -> np.ndarray:
+    return np.trapezoid(h[column], dx=dt, axis=0)
+
+
+def _time_above(column: str, threshold: float, h: Dict[str, np.ndarray], dt: float) -> np.ndarray:
+    return (h[column] > threshold).sum(axis=0) * dt
+
+
+def peak(column: str) -> Metric:
+    return Metric([column], partial(_peak, column))
+
+
+def trough(column: str) -> Metric:
+    return Metric([column], partial(_trough, column))
+
+
+def final(column: str) -> Metric:
+    return Metric([column], partial(_final, column))
+
+
+def auc(column: str) -> Metric:
+    """曲线下面积（梯形法，单位 浓度·小时）。"""
+    return Metric([column], partial(_auc, column))
+
+
+def time_above(column: str, threshold: float) -> Metric:
+    """column 高于 threshold 的累计时长（小时）。"""
+    return Metric([column], partial(_time_above, column, threshold))
+
+
+# --- 执行 ---
+def _apply(env: Union[MetabolicEnvironment, BatchMetabolicEnvironment], name: str, value) -> None:
+    # 设计中的列按名称落到参数 / 信号 / 代谢物（后两者作为初始值）
+    if isinstance(env, BatchMetabolicEnvironment):
+        parameters, signals, metabolites = env.parameter_names, env.signal_names, env.metabolite_names
+    else:
+        parameters, signals, metabolites = env.parameters, env.signals, env.metabolites
+    if name in parameters:
+        env.setParameter(name, value)
+    elif name in signals:
+        env.setSignal(name, value)
+    elif name in metabolites:
+        env.setMetabolite(name, value)
+    else:
+        raise KeyError(f"Unknown sweep factor: {name}")
+
+
+def _reduce(h: Dict[str, np.ndarray], metrics: Dict[str, Metric]) -> Dict[str, np.ndarray]:
+    return {name: np.asarray(m(h, DT), dtype=np.float64) for name, m in metrics.items()}
+
+
+def _run_chunk(design: pd.DataFrame, metrics: Dict[str, Metric], minutes: int, inject, keep_history: bool,
+               base: MetabolicEnvironment = None) -> Tuple[Dict[str, np.ndarray], List[pd.DataFrame]]:
+    # 批量模式：一批设计点作为 BatchMetabolicEnvironment 的 N 个"患者"同时推进
+    env = BatchMetabolicEnvironment(len(design), base)
+    for name in design.columns:
+        _apply(env, name, design[name].to_numpy(dtype=np.float64))
+    columns = None
+    if not keep_history:
+        # 只记录指标用到的列
+        columns = list(dict.fromkeys(c for m in metrics.values() for c in m.columns)) + ["time"]
+    arr = run_batch(env, minutes, inject, columns=columns)
+    h = {c: arr[:, :, j] for j, c in enumerate(env.history_columns)}
+    frames = [env.to_frame(i) for i in range(env.n)] if keep_history else []
+    return _reduce(h, metrics), frames
+
+
+def _run_point(values: Dict[str, float], metrics: Dict[str, Metric], minutes: int, inject, keep_history: bool,
+               base: MetabolicEnvironment = None) -> Tuple[Dict[str, np.ndarray], List[pd.DataFrame]]:
+    # 进程模式：单个设计点用标量 MetabolicEnvironment 运行
+    env = MetabolicEnvironment()
+    if base is not None:
+        # 与 BatchMetabolicEnvironment(n, base) 一致：只取 base 的当前状态，不带历史
+        env.metabolites, env.signals, env.parameters = dict(base.metabolites), dict(base.signals), dict(base.parameters)
+    for name, value in values.items():
+        _apply(env, name, float(value))
+    system = LiverMetabolismSystem(env)
+    inject = as_inject(inject, env, minutes)
+    env.reserve_history(minutes)
+    for tt in range(minutes):
+        if inject:
+            inject(env, tt)
+        system.step(tt / 60.0)
+    df = env.to_frame()
+    h = {c: df[c].to_numpy(dtype=np.float64)[:, None] for m in metrics.values() for c in m.columns}
+    return _reduce(h, metrics), [df.copy()] if keep_history else []
+
+
+def run_sweep(design: pd.DataFrame, metrics: Dict[str, Metric], minutes: int, inject: Callable[[Any, int], None] = None,
+              mode: str = "batch", jobs: int = 1, batch_size: int = 256, keep_history: bool = False,
+              base: MetabolicEnvironment = None) -> Union[pd.DataFrame, Tuple[pd.DataFrame, List[pd.DataFrame]]]:
+    """对 design 的每一行运行 minutes 分钟，返回 设计列 + 指标列 的表（行顺序同 design）。
+
+    mode="batch" 时每 batch_size 个设计点组成一个批量环境同时推进（inject 收到 BatchMetabolicEnvironment，
+    需用 np.maximum/np.minimum，也可传入 schedule.Schedule）；mode="process" 时每个设计点单独用标量模型运行。jobs > 1 时
+    批次/设计点提交到进程池，此时 inject 与自定义指标需可 pickle。
+    默认只保留指标用到的历史列；keep_history=True 时额外返回每次运行的完整历史 DataFrame 列表。
+    注意模型每步开始时由 inflammation 重算 insulin_sensitivity，直接扫描它没有效果，应改扫初始 inflammation。
+    """
+    if mode not in ("batch", "process"):
+        raise ValueError(f"Unknown sweep mode: {mode}")
+    design = design.reset_index(drop=True)
+    if mode == "batch":
+        fn = _run_chunk
+        units = [design.iloc[i:i + batch_size] for i in range(0, len(design), batch_size)]
+    else:
+        fn = _run_point
+        units = [row for row in design.to_dict("records")]
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(units) <= 1:
+        outs = [fn(u, metrics, minutes, inject, keep_history, base) for u in units]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(units))) as ex:
+            futs = [ex.submit(fn, u, metrics, minutes, inject, keep_history, base) for u in units]
+            outs = [f.result() for f in futs]
+    table = design.copy()
+    for name in metrics:
+        table[name] = np.concatenate([o[0][name] for o in outs])
+    if keep_history:
+        return table, [df for o in outs for df in o[1]]
+    return table
+
+
+_METRICS = {"peak": peak, "trough": trough, "final": final, "auc": auc, "above": time_above}
+
+
+def _parse_metric(spec: str) -> Tuple[str, Metric]:
+    # "peak:glucose" / "auc:ketone_body" / "above:ammonia:0.1"
+    kind, column, *rest = spec.split(":")
+    args = [float(v) for v in rest]
+    return "_".join([kind, column] + rest), _METRICS[kind](column, *args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="环境参数扫描：网格 / 拉丁超立方设计，输出每次运行的标量指标表")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2,...", help="网格因子（可重复）")
+    parser.add_argument("--lhs", action="append", default=[], metavar="NAME=LO:HI", help="拉丁超立方因子（可重复）")
+    parser.add_argument("--samples", type=int, default=32, help="拉丁超立方样本数")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--minutes", type=int, default=360)
+    parser.add_argument("--metric", action="append", default=[], metavar="KIND:COLUMN[:THRESHOLD]",
+                        help=f"指标（可重复），KIND 取 {', '.join(_METRICS)}")
+    parser.add_argument("--mode", default="batch", choices=["batch", "process"])
+    parser.add_argument("--jobs", type=int, default=1, help="并行进程数（0 为 CPU 核数）")
+    parser.add_argument("--out", default="../results/sweep.csv", help="输出表（.csv 或 .parquet）")
+    args = parser.parse_args()
+    if bool(args.grid) == bool(args.lhs):
+        parser.error("需要且只能给定 --grid 或 --lhs 之一")
+    if args.grid:
+        design = grid(**{k: [float(v) for v in vs.split(",")] for k, vs in (g.split("=", 1) for g in args.grid)})
+    else:
+        design = latin_hypercube(args.samples, args.seed,
+                                 **{k: tuple(float(v) for v in r.split(":")) for k, r in (s.split("=", 1) for s in args.lhs)})
+    metrics = dict(_parse_metric(s) for s in (args.metric or ["peak:glucose", "auc:ketone_body", "above:ammonia:0.1"]))
+    table = run_sweep(design, metrics, args.minutes, mode=args.mode, jobs=args.jobs or None)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    if args.out.endswith(".parquet"):
+        table.to_parquet(args.out, index=False)
+    else:
+        table.to_csv(args.out, index=False)
+    print(table.to_string(index=False))
@@ -0,0 +1,74 @@
+from collections.abc import MutableMapping
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+
+class SymbolTable:
+    """名称 → 整数槽位：metabolites / signals / parameters 各自从 0 连续编号。
+
+    在模型加载时建立，只追加不删除，已解析的槽位始终有效。向表中追加新名称时返回新表，
+    原表（可能被其他环境共享）保持不变。
+    """
+
+    KINDS = ("metabolites", "signals", "parameters")
+
+    def __init__(self, metabolites: Iterable[str] = (), signals: Iterable[str] = (), parameters: Iterable[str] = ()):
+        self.metabolites: Dict[str, int] = {n: i for i, n in enumerate(metabolites)}
+        self.signals: Dict[str, int] = {n: i for i, n in enumerate(signals)}
+        self.parameters: Dict[str, int] = {n: i for i, n in enumerate(parameters)}
+        # 按 代谢物 → 信号 → 参数 排列的全部名称（历史记录的定长列）
+        self.names: Tuple[str, ...] = tuple(self.metabolites) + tuple(self.signals) + tuple(self.parameters)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, SymbolTable) and all(getattr(self, k) == getattr(other, k) for k in self.KINDS)
+
+    def extended(self, kind: str, name: str) -> "SymbolTable":
+        names = {k: list(getattr(self, k)) for k in self.KINDS}
+        names[kind].append(name)
+        return SymbolTable(**names)
+
+    def namespace(self, kind: str) -> SimpleNamespace:
+        """槽位命名空间，供反应函数预先解析下标：MET = SYMBOLS.namespace("metabolites"); env.m[MET.glucose]。"""
+        return SimpleNamespace(**getattr(self, kind))
+
+
+class SlotView(MutableMapping):
+    """环境中一类状态的 dict 视图（兼容 env.metabolites[...] 等旧写法），读写直接落在槽位列表上。
+
+    写入经由环境完成（写时复制、未知名称追加槽位）；槽位固定，不支持删除。
+    """
+
+    __slots__ = ("env", "kind", "attr")
+
+    def __init__(self, env: Any, kind: str, attr: str):
+        self.env = env
+        self.kind = kind
+        self.attr = attr
+
+    def __getitem__(self, name: str) -> float:
+        return getattr(self.env, self.attr)[getattr(self.env.symbols, self.kind)[name]]
+
+    def get(self, name: str, default: Any = None) -> Any:
+        i = getattr(self.env.symbols, self.kind).get(name)
+        return default if i is None else getattr(self.env, self.attr)[i]
+
+    def __setitem__(self, name: str, value: float) -> None:
+        self.env.store(self.kind, name, float(value))
+
+    def __delitem__(self, name: str) -> None:
+        raise TypeError(f"{self.kind} slots are fixed and cannot be deleted")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(getattr(self.env.symbols, self.kind))
+
+    def __len__(self) -> int:
+        return len(getattr(self.env.symbols, self.kind))
+
+    def __contains__(self, name: object) -> bool:
+        return name in getattr(self.env.symbols, self.kind)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple
+import ill_cases
+from batch import BatchMetabolicEnvironment, run_batch
+from schedule import Schedule
+from simulate import MetabolicEnvironment
+
+
+def _scenario(case) -> Tuple[MetabolicEnvironment, int, Schedule]:
+    # 截获病例对 ill_cases._run 的调用：得到设置好参数的环境、时长与注入计划，不实际推进
+    captured = {}
+
+    def capture(env, minutes, inject=None, t0=0):
+        captured.update(env=env, minutes=minutes, inject=inject)
+        return pd.DataFrame(), []
+
+    run, ill_cases._run = ill_cases._run, capture
+    try:
+        case()
+    finally:
+        ill_cases._run = run
+    return captured["env"], captured["minutes"], captured["inject"]
+
+
+def _max_abs_diff(scalar: pd.DataFrame, batched: pd.DataFrame) -> float:
+    # 逐行逐列比较（NaN 位置须一致，未触发的反应速率两边都是 NaN）
+    a = scalar.to_numpy(dtype=float)
+    b = batched[list(scalar.columns)].to_numpy(dtype=float)
+    if a.shape != b.shape or not np.array_equal(np.isnan(a), np.isnan(b)):
+        return float("inf")
+    return float(np.nanmax(np.abs(a - b), initial=0.0))
+
+
+def test_batch_matches_scalar_ill_cases() -> Dict[str, float]:
+    # 同一时长的病例放进同一个批次，各自的注入计划按 patient 编号作用于对应患者
+    groups: Dict[int, List[str]] = {}
+    scenarios = {}
+    for name, case in ill_cases.SCENARIOS.items():
+        scenarios[name] = _scenario(case)
+        groups.setdefault(scenarios[name][1], []).append(name)
+
+    metrics: Dict[str, float] = {}
+    for minutes, names in groups.items():
+        envs = [scenarios[name][0] for name in names]
+        batch_env = BatchMetabolicEnvironment.from_environments(envs)
+        schedule = Schedule([{**e, "patient": i} for i, name in enumerate(names) for e in scenarios[name][2]])
+        run_batch(batch_env, minutes, schedule)
+        for i, name in enumerate(names):
+            scalar, _ = ill_cases.SCENARIOS[name]()
+            metrics[f"{name}_identical"] = float(_max_abs_diff(scalar, batch_env.to_frame(i)) == 0.0)
+    return metrics
+
+
+if __name__ == "__main__":
+    results = test_batch_matches_scalar_ill_cases()
+    for name, val in results.items():
+        print(f"  - {name}: {'PASS' if val == 1.0 else 'FAIL'}")
+    print(f"Summary: {sum(v == 1.0 for v in results.values())}/{len(results)} Checks Passed")
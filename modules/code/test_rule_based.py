@@ -1,33 +1,28 @@
 import os
+import numpy as np
 import pandas as pd
+import plotting
 import matplotlib.pyplot as plt
 from typing import Dict, List
 from rule_based import MetabolicEnvironment, run_simulation
+from rule_based_batch import BatchRuleBasedEnvironment, run_batch_simulation
+from schedule import Schedule
 
 
-def _plot(df: pd.DataFrame, columns: List[str], title: str, outfile: str) -> None:
-    try:
-        plt.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans', 'Arial']
-    except:
-        pass
-    plt.rcParams['axes.unicode_minus'] = False
-    plt.figure(figsize=(12, 7))
+def _plot(df: pd.DataFrame, columns: List[str], title: str, outfile: str) -> str:
+    fig, ax = plotting.figure(1, 1, figsize=(12, 7))
     available = [c for c in columns if c in df.columns]
     cmap = plt.get_cmap("tab20")
     for i, col in enumerate(available):
         val = df[col]
         m = val.max() if val.max() != 0 else 1.0
-        plt.plot(df["time"], val / m, label=col, linewidth=2, color=cmap(i % cmap.N))
-    plt.xlabel("时间 (小时)")
-    plt.ylabel("归一化浓度/水平")
-    plt.title(title)
+        plotting.line(ax, df["time"], val / m, label=col, linewidth=2, color=cmap(i % cmap.N))
+    ax.set_xlabel("时间 (小时)")
+    ax.set_ylabel("归一化浓度/水平")
+    ax.set_title(title)
     if len(available) > 0:
-        plt.legend(loc="best", fontsize=9, ncol=2)
-    outdir = os.path.dirname(outfile) or "."
-    os.makedirs(outdir, exist_ok=True)
-    plt.tight_layout()
-    plt.savefig(outfile, bbox_inches="tight")
-    plt.close()
+        ax.legend(loc="best", fontsize=9, ncol=2)
+    return plotting.save(fig, outfile)
 
 
 def test_insulin_degradation_detailed() -> Dict[str, float]:
@@ -375,9 +370,56 @@ def test_lipid_constraints_detailed() -> Dict[str, float]:
     }
 
 
+def test_batch_matches_scalar_overlapping_events() -> Dict[str, float]:
+    # 同一步作用于同一目标的多行事件：批量引擎须与标量 Plan 一样逐行写入、逐行截断
+    schedule = (Schedule()
+                .bolus("glucose", 100.0, 5).bolus("glucose", -100.0, 5)
+                .bolus("glucose", 2.0, 20).ceiling("glucose", 6.0, 20, 21).bolus("glucose", 1.0, 20)
+                .window("is_postprandial", 30, 60).set("is_postprandial", 0.0, 40)
+                .bolus("ethanol", 4.0, 10, patient=1).bolus("ethanol", 1.0, 10)
+                .floor("nad_plus", 0.5, 0, 90, patient=0).infusion("nad_plus", -0.2, 0, 90))
+    minutes = 90
+    activity = [1.0, 0.3]
+    env = BatchRuleBasedEnvironment.from_parameters(len(activity), liver_function=activity)
+    run_batch_simulation(env, minutes=minutes, events=schedule)
+    metrics: Dict[str, float] = {}
+    for i, value in enumerate(activity):
+        scalar_env = MetabolicEnvironment()
+        scalar_env.setParameter("liver_function", value)
+        scalar = run_simulation(scalar_env, minutes=minutes, inject=schedule.compile(scalar_env, minutes, patient=i))
+        batched = env.to_frame(i)
+        columns = [c for c in batched.columns if c in scalar.columns]
+        metrics[f"patient_{i}_identical"] = float(np.array_equal(
+            scalar[columns].to_numpy(dtype=float), batched[columns].to_numpy(dtype=float), equal_nan=True))
+    return metrics
+
+
+def test_batch_insulin_degradation() -> Dict[str, float]:
+    # 高 / 低 IDE 两个环境放在同一批里推进，逐行与标量引擎一致
+    activity = [3.0, 0.05]
+    events = [
+        {"target": "is_postprandial", "op": "set", "value": 1.0, "start": 20, "end": 50},
+        {"target": "is_postprandial", "op": "set", "value": 0.0, "start": 50},
+    ]
+    env = BatchRuleBasedEnvironment.from_parameters(len(activity), insulin_degrading_enzyme_activity=activity)
+    run_batch_simulation(env, minutes=180, events=events)
+    metrics: Dict[str, float] = {}
+    for i, value in enumerate(activity):
+        scalar_env = MetabolicEnvironment()
+        scalar_env.setParameter("insulin_degrading_enzyme_activity", value)
+        scalar = run_simulation(scalar_env, minutes=180, inject=Schedule(events))
+        batched = env.to_frame(i)
+        columns = [c for c in batched.columns if c in scalar.columns]
+        metrics[f"ide_{value:g}_identical"] = float(np.array_equal(
+            scalar[columns].to_numpy(dtype=float), batched[columns].to_numpy(dtype=float), equal_nan=True))
+    return metrics
+
+
 def run_all_detailed_tests() -> Dict[str, Dict[str, float]]:
     results: Dict[str, Dict[str, float]] = {}
     results["TC-DETAILED-INSULIN-DEG"] = test_insulin_degradation_detailed()
+    results["TC-DETAILED-BATCH-EVENTS"] = test_batch_matches_scalar_overlapping_events()
+    results["TC-DETAILED-BATCH-INSULIN-DEG"] = test_batch_insulin_degradation()
     results["TC-DETAILED-ETHANOL"] = test_ethanol_detox_detailed()
     results["TC-DETAILED-BILIRUBIN"] = test_bilirubin_conjugation_detailed()
     results["TC-DETAILED-PHASEII"] = test_phaseII_conjugation_with_cofactors_detailed()
@@ -390,6 +432,7 @@ def run_all_detailed_tests() -> Dict[str, Dict[str, float]]:
 
 def summarize_and_plot_detailed() -> str:
     results = run_all_detailed_tests()
+    plotting.close()
     summary = ["=== 基于规则的详细测试需求验证结果 ==="]
     total = 0
     passed = 0
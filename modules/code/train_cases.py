@@ -14,6 +14,7 @@ def simulate_24h() -> pd.DataFrame:
     system = LiverMetabolismSystem(env)
     start_t = 7 * UNITS_PER_HOUR
     total_units = DAY_UNITS + 1
+    env.reserve_history(total_units)
     for t in range(start_t, start_t + total_units):
         hour = (t - start_t) / UNITS_PER_HOUR
         if t == 8 * UNITS_PER_HOUR:
@@ -37,7 +38,7 @@ def simulate_24h() -> pd.DataFrame:
             is_postprandial = True
         env.setParameter("is_postprandial", is_postprandial)
         system.step(hour)
-    df = pd.DataFrame(env.history)
+    df = env.to_frame()
     df["time"] = df["time"] + 7.0
     df["time_abs"] = df["time"]
     return df
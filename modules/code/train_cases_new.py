@@ -1,18 +1,21 @@
 import os
 import pandas as pd
 import matplotlib.pyplot as plt
-from typing import Callable, Dict, List
+from typing import Callable, Dict, List, Union
+from schedule import Schedule, as_inject
 from simulate import MetabolicEnvironment, LiverMetabolismSystem
 
 
-def _run(env: MetabolicEnvironment, minutes: int, inject: Callable[[MetabolicEnvironment, int], None] = None) -> pd.DataFrame:
+def _run(env: MetabolicEnvironment, minutes: int, inject: Union[Schedule, Callable[[MetabolicEnvironment, int], None]] = None) -> pd.DataFrame:
     sys = LiverMetabolismSystem(env)
+    inject = as_inject(inject, env, minutes)
+    env.reserve_history(minutes)
     for t in range(minutes):
         hour = t / 60.0
         if inject:
             inject(env, t)
         sys.step(hour)
-    df = pd.DataFrame(env.history)
+    df = env.to_frame()
     df["time"] = df["time"]
     return df
 
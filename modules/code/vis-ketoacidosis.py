@@ -3,6 +3,8 @@ import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from history import as_frame
+from vis import animate_dashboard
 from simulate import MetabolicEnvironment, LiverMetabolismSystem
 
 def _get_series(df, col):
@@ -10,8 +12,10 @@ def _get_series(df, col):
         return df[col]
     return pd.Series(0.0, index=df.index)
 
-def generate_dka_dashboard(history_list, filename="dka_simulation.html"):
-    df = pd.DataFrame(history_list)
+def generate_dka_dashboard(history_list, filename="dka_simulation.html", mode="cursor", max_frames=300):
+    # history_list: dict 记录序列、DataFrame 或结果文件路径（.mmap 零拷贝打开）
+    # mode / max_frames: see vis.animate_dashboard (mode="grow", max_frames=None gives one growing frame per step)
+    df = as_frame(history_list)
     time_steps = df['time'].values
     
     # 1. Define nodes for DKA topology
@@ -44,115 +48,78 @@ def generate_dka_dashboard(history_list, filename="dka_simulation.html"):
         subplot_titles=("代谢通量拓扑 (颜色深浅=速率)", "关键代谢物浓度 & pH", "关键反应速率")
     )
 
-    # 3. Create Frames
-    frames = []
-    for t_idx in range(len(time_steps)):
-        current_t = time_steps[t_idx]
-        curr_df = df.iloc[t_idx]
-        
-        # Node coordinates
-        node_x = [v[0] for v in nodes.values()]
-        node_y = [v[1] for v in nodes.values()]
-        node_text = [v[2] for v in nodes.values()]
-        
-        # Color intensity based on rates
-        # Normalize arbitrarily for visualization
-        def get_val(key):
-            val = curr_df.get(key, 0.0)
-            return 0.0 if pd.isna(val) else float(val)
+    # 3. Left: topology node intensities, precomputed per step
+    node_x = [v[0] for v in nodes.values()]
+    node_y = [v[1] for v in nodes.values()]
+    node_text = [v[2] for v in nodes.values()]
 
-        colors = [
-            get_val('rate_adiposeLipolysis') * 50,
-            get_val('rate_betaOxidation') * 50,
-            get_val('rate_ketogenesis') * 100,
-            get_val('rate_oxidativePhosphorylation') * 20,
-            get_val('rate_orchestrateGluconeogenesis') * 100 
-        ]
-        
-        # Gluconeogenesis might not have a single 'rate' recorded if it's an orchestrator
-        # But simulate.py records "orchestrateGluconeogenesis" rate? 
-        # Actually orchestrateGluconeogenesis calculates a rate and writes outputs. 
-        # But wait, orchestrateGluconeogenesis in simulate.py doesn't call recordRate itself?
-        # Let's check simulate.py... 
-        # It calculates `rate = ...` then `outputs = ...`. It does NOT call `ctx.env.recordRate` for the orchestrator itself usually.
-        # But `betaOxidation` DOES record rate.
-        # `ketogenesis` DOES record rate.
-        # `adiposeLipolysis` DOES record rate.
-        # `oxidativePhosphorylation` DOES record rate.
-        # `orchestrateGluconeogenesis`:
-        # rate = ...
-        # outputs = ...
-        # It does NOT record "rate_orchestrateGluconeogenesis".
-        # However, `vis.py` uses `rate_...` keys.
-        # I should check if `orchestrateGluconeogenesis` records a rate. 
-        # Looking at simulate.py code provided:
-        # def orchestrateGluconeogenesis(ctx: Ctx) -> Dict[str, float]:
-        #     ...
-        #     rate = ...
-        #     outputs = ...
-        #     ctx.write(outputs)
-        #     return outputs
-        # It does NOT call recordRate. So 'rate_orchestrateGluconeogenesis' will be NaN/0.
-        # I'll use 'glucose' production as proxy or just 0 for now.
-        
-        history_so_far = df.iloc[:t_idx+1]
-        
-        frame = go.Frame(
-            data=[
-                # Left: Topology
-                go.Scatter(
-                    x=node_x, y=node_y, mode="markers+text",
-                    text=node_text, textposition="top center",
-                    marker=dict(size=[30+c for c in colors], color=colors,
-                                colorscale="Reds", showscale=False, cmin=0, cmax=100,
-                                line=dict(width=2, color='DarkSlateGrey'))
-                ),
-                # Middle: Concentrations
-                go.Scatter(x=history_so_far['time'], y=history_so_far['glucose'], name="Glucose", line=dict(color="royalblue")),
-                go.Scatter(x=history_so_far['time'], y=history_so_far['fatty_acid'], name="Fatty Acid", line=dict(color="orange")),
-                go.Scatter(x=history_so_far['time'], y=history_so_far['ketone_body'], name="Ketone Bodies", line=dict(color="red")),
-                go.Scatter(x=history_so_far['time'], y=history_so_far['acetyl_coa'], name="Acetyl-CoA", line=dict(color="green")),
-                go.Scatter(x=history_so_far['time'], y=history_so_far['simulated_pH'], name="Est. pH", line=dict(color="purple", dash='dot'), yaxis="y2"),
-                
-                # Right: Rates
-                go.Scatter(x=history_so_far['time'], y=_get_series(history_so_far, 'rate_adiposeLipolysis'), name="Lipolysis Rate", line=dict(color="orange")),
-                go.Scatter(x=history_so_far['time'], y=_get_series(history_so_far, 'rate_betaOxidation'), name="Beta-Ox Rate", line=dict(color="green")),
-                go.Scatter(x=history_so_far['time'], y=_get_series(history_so_far, 'rate_ketogenesis'), name="Ketogenesis Rate", line=dict(color="red")),
-            ],
-            name=str(current_t),
-            traces=[0, 1, 2, 3, 4, 5, 6, 7, 8]
+    # Color intensity based on rates
+    # Normalize arbitrarily for visualization
+    def get_vals(key):
+        return np.nan_to_num(_get_series(df, key).to_numpy(dtype=float), nan=0.0)
+
+    intensity = np.column_stack([
+        get_vals('rate_adiposeLipolysis') * 50,
+        get_vals('rate_betaOxidation') * 50,
+        get_vals('rate_ketogenesis') * 100,
+        get_vals('rate_oxidativePhosphorylation') * 20,
+        get_vals('rate_orchestrateGluconeogenesis') * 100 
+    ])
+    
+    # Gluconeogenesis might not have a single 'rate' recorded if it's an orchestrator
+    # But simulate.py records "orchestrateGluconeogenesis" rate? 
+    # Actually orchestrateGluconeogenesis calculates a rate and writes outputs. 
+    # But wait, orchestrateGluconeogenesis in simulate.py doesn't call recordRate itself?
+    # Let's check simulate.py... 
+    # It calculates `rate = ...` then `outputs = ...`. It does NOT call `ctx.env.recordRate` for the orchestrator itself usually.
+    # But `betaOxidation` DOES record rate.
+    # `ketogenesis` DOES record rate.
+    # `adiposeLipolysis` DOES record rate.
+    # `oxidativePhosphorylation` DOES record rate.
+    # `orchestrateGluconeogenesis`:
+    # rate = ...
+    # outputs = ...
+    # It does NOT record "rate_orchestrateGluconeogenesis".
+    # However, `vis.py` uses `rate_...` keys.
+    # I should check if `orchestrateGluconeogenesis` records a rate. 
+    # Looking at simulate.py code provided:
+    # def orchestrateGluconeogenesis(ctx: Ctx) -> Dict[str, float]:
+    #     ...
+    #     rate = ...
+    #     outputs = ...
+    #     ctx.write(outputs)
+    #     return outputs
+    # It does NOT call recordRate. So 'rate_orchestrateGluconeogenesis' will be NaN/0.
+    # I'll use 'glucose' production as proxy or just 0 for now.
+
+    def node_trace(i):
+        colors = intensity[i].tolist()
+        return go.Scatter(
+            x=node_x, y=node_y, mode="markers+text",
+            text=node_text, textposition="top center",
+            marker=dict(size=[30+c for c in colors], color=colors,
+                        colorscale="Reds", showscale=False, cmin=0, cmax=100,
+                        line=dict(width=2, color='DarkSlateGrey'))
         )
-        frames.append(frame)
 
-    # 4. Add Initial Traces
-    for i in range(len(frames[0].data)):
-        row = 1
-        col = 1
-        if i >= 1 and i <= 5: col = 2
-        if i >= 6: col = 3
-        fig.add_trace(frames[0].data[i], row=row, col=col)
+    # 4. Curves (full series; column 2 = concentrations and pH, column 3 = rates)
+    t = df['time']
+    lines = [
+        # Middle: Concentrations
+        (2, go.Scatter(x=t, y=df['glucose'], name="Glucose", line=dict(color="royalblue"))),
+        (2, go.Scatter(x=t, y=df['fatty_acid'], name="Fatty Acid", line=dict(color="orange"))),
+        (2, go.Scatter(x=t, y=df['ketone_body'], name="Ketone Bodies", line=dict(color="red"))),
+        (2, go.Scatter(x=t, y=df['acetyl_coa'], name="Acetyl-CoA", line=dict(color="green"))),
+        (2, go.Scatter(x=t, y=df['simulated_pH'], name="Est. pH", line=dict(color="purple", dash='dot'), yaxis="y2")),
 
-    # 5. Layout
-    fig.update_layout(
-        template="plotly_dark",
-        updatemenus=[{
-            "type": "buttons",
-            "buttons": [{
-                "label": "Play",
-                "method": "animate",
-                "args": [None, {"frame": {"duration": 50, "redraw": True}, "fromcurrent": True}]
-            }, {
-                "label": "Pause",
-                "method": "animate",
-                "args": [[None], {"frame": {"duration": 0, "redraw": True}, "mode": "immediate"}]
-            }]
-        }],
-        sliders=[{
-            "steps": [{"args": [[f.name], {"frame": {"duration": 0, "redraw": True}, "mode": "immediate"}],
-                       "label": f.name, "method": "animate"} for f in frames],
-            "currentvalue": {"prefix": "Time: "}
-        }]
-    )
+        # Right: Rates
+        (3, go.Scatter(x=t, y=_get_series(df, 'rate_adiposeLipolysis'), name="Lipolysis Rate", line=dict(color="orange"))),
+        (3, go.Scatter(x=t, y=_get_series(df, 'rate_betaOxidation'), name="Beta-Ox Rate", line=dict(color="green"))),
+        (3, go.Scatter(x=t, y=_get_series(df, 'rate_ketogenesis'), name="Ketogenesis Rate", line=dict(color="red"))),
+    ]
+
+    # 5. Frames, player and slider
+    animate_dashboard(fig, time_steps, node_trace, lines, mode, max_frames)
     
     # Secondary Y-axis for pH in middle plot
     fig.update_layout(
@@ -187,7 +154,6 @@ def generate_dka_dashboard(history_list, filename="dka_simulation.html"):
     ], axis=1).values.max()
     fig.update_yaxes(title="Rate (mmol/L/h)", range=[0, float(rate_max)*1.2 if np.isfinite(rate_max) else 1.0], row=1, col=3)
 
-    fig.frames = frames
     outdir = os.path.dirname(filename) or "."
     os.makedirs(outdir, exist_ok=True)
     fig.write_html(filename)
@@ -3,6 +3,8 @@ import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from history import as_frame
+from vis import animate_dashboard
 from simulate import MetabolicEnvironment, LiverMetabolismSystem
 
 def _get_series(df, col):
@@ -10,8 +12,10 @@ def _get_series(df, col):
         return df[col]
     return pd.Series(0.0, index=df.index)
 
-def generate_nafld_dashboard(history_list, filename="nafld_simulation.html"):
-    df = pd.DataFrame(history_list)
+def generate_nafld_dashboard(history_list, filename="nafld_simulation.html", mode="cursor", max_frames=300):
+    # history_list: dict 记录序列、DataFrame 或结果文件路径（.mmap 零拷贝打开）
+    # mode / max_frames: see vis.animate_dashboard (mode="grow", max_frames=None gives one growing frame per step)
+    df = as_frame(history_list)
     time_steps = df['time'].values
     
     # 1. Define nodes for NAFLD topology
@@ -36,90 +40,51 @@ def generate_nafld_dashboard(history_list, filename="nafld_simulation.html"):
         subplot_titles=("代谢通量拓扑 (颜色深浅=速率)", "脂质积累曲线", "关键合成速率")
     )
 
-    # 3. Create Frames
-    frames = []
-    for t_idx in range(len(time_steps)):
-        current_t = time_steps[t_idx]
-        curr_df = df.iloc[t_idx]
-        
-        # Node coordinates
-        node_x = [v[0] for v in nodes.values()]
-        node_y = [v[1] for v in nodes.values()]
-        node_text = [v[2] for v in nodes.values()]
-        
-        # Helper to avoid NaN errors
-        def get_val(key):
-            val = curr_df.get(key, 0.0)
-            return 0.0 if pd.isna(val) else float(val)
-            
-        # Color intensity
-        colors = [
-            get_val('glucose') * 2, # Glucose node intensity by concentration
-            get_val('rate_deNovoLipogenesis') * 200,
-            get_val('fatty_acid') * 20, # FA node intensity by concentration
-            get_val('rate_lipidTransport') * 100,
-            get_val('triglycerides') * 10, # TG node intensity by concentration
-            get_val('rate_betaOxidation') * 50
-        ]
-        
-        history_so_far = df.iloc[:t_idx+1]
-        
-        frame = go.Frame(
-            data=[
-                # Left: Topology
-                go.Scatter(
-                    x=node_x, y=node_y, mode="markers+text",
-                    text=node_text, textposition="top center",
-                    marker=dict(size=[30+c for c in colors], color=colors,
-                                colorscale="Reds", showscale=False, cmin=0, cmax=100,
-                                line=dict(width=2, color='DarkSlateGrey'))
-                ),
-                # Middle: Concentrations (Accumulation)
-                go.Scatter(x=history_so_far['time'], y=history_so_far['glucose'], name="Glucose", line=dict(color="royalblue")),
-                go.Scatter(x=history_so_far['time'], y=history_so_far['fatty_acid'], name="Fatty Acid", line=dict(color="orange")),
-                go.Scatter(x=history_so_far['time'], y=history_so_far['triglycerides'], name="Triglycerides", line=dict(color="brown")),
-                go.Scatter(x=history_so_far['time'], y=history_so_far['glycogen'], name="Glycogen", line=dict(color="green", dash='dot'), yaxis="y2"),
-                
-                # Right: Rates
-                go.Scatter(x=history_so_far['time'], y=_get_series(history_so_far, 'rate_deNovoLipogenesis'), name="DNL Rate", line=dict(color="red")),
-                go.Scatter(x=history_so_far['time'], y=_get_series(history_so_far, 'rate_fattyAcidSynthesis'), name="FA Synth Rate", line=dict(color="purple")),
-                go.Scatter(x=history_so_far['time'], y=_get_series(history_so_far, 'rate_lipidTransport'), name="Transport Rate", line=dict(color="blue")),
-                go.Scatter(x=history_so_far['time'], y=_get_series(history_so_far, 'rate_betaOxidation'), name="Beta-Ox Rate", line=dict(color="green")),
-            ],
-            name=str(current_t),
-            traces=[0, 1, 2, 3, 4, 5, 6, 7, 8]
+    # 3. Left: topology node intensities, precomputed per step (NaN -> 0)
+    node_x = [v[0] for v in nodes.values()]
+    node_y = [v[1] for v in nodes.values()]
+    node_text = [v[2] for v in nodes.values()]
+
+    def get_vals(key):
+        return np.nan_to_num(_get_series(df, key).to_numpy(dtype=float), nan=0.0)
+
+    intensity = np.column_stack([
+        get_vals('glucose') * 2, # Glucose node intensity by concentration
+        get_vals('rate_deNovoLipogenesis') * 200,
+        get_vals('fatty_acid') * 20, # FA node intensity by concentration
+        get_vals('rate_lipidTransport') * 100,
+        get_vals('triglycerides') * 10, # TG node intensity by concentration
+        get_vals('rate_betaOxidation') * 50
+    ])
+
+    def node_trace(i):
+        colors = intensity[i].tolist()
+        return go.Scatter(
+            x=node_x, y=node_y, mode="markers+text",
+            text=node_text, textposition="top center",
+            marker=dict(size=[30+c for c in colors], color=colors,
+                        colorscale="Reds", showscale=False, cmin=0, cmax=100,
+                        line=dict(width=2, color='DarkSlateGrey'))
         )
-        frames.append(frame)
 
-    # 4. Add Initial Traces
-    for i in range(len(frames[0].data)):
-        row = 1
-        col = 1
-        if i >= 1 and i <= 4: col = 2
-        if i >= 5: col = 3
-        fig.add_trace(frames[0].data[i], row=row, col=col)
+    # 4. Curves (full series; column 2 = concentrations, column 3 = rates)
+    t = df['time']
+    lines = [
+        # Middle: Concentrations (Accumulation)
+        (2, go.Scatter(x=t, y=df['glucose'], name="Glucose", line=dict(color="royalblue"))),
+        (2, go.Scatter(x=t, y=df['fatty_acid'], name="Fatty Acid", line=dict(color="orange"))),
+        (2, go.Scatter(x=t, y=df['triglycerides'], name="Triglycerides", line=dict(color="brown"))),
+        (2, go.Scatter(x=t, y=df['glycogen'], name="Glycogen", line=dict(color="green", dash='dot'), yaxis="y2")),
 
-    # 5. Layout
-    fig.update_layout(
-        template="plotly_dark",
-        updatemenus=[{
-            "type": "buttons",
-            "buttons": [{
-                "label": "Play",
-                "method": "animate",
-                "args": [None, {"frame": {"duration": 50, "redraw": True}, "fromcurrent": True}]
-            }, {
-                "label": "Pause",
-                "method": "animate",
-                "args": [[None], {"frame": {"duration": 0, "redraw": True}, "mode": "immediate"}]
-            }]
-        }],
-        sliders=[{
-            "steps": [{"args": [[f.name], {"frame": {"duration": 0, "redraw": True}, "mode": "immediate"}],
-                       "label": f.name, "method": "animate"} for f in frames],
-            "currentvalue": {"prefix": "Time: "}
-        }]
-    )
+        # Right: Rates
+        (3, go.Scatter(x=t, y=_get_series(df, 'rate_deNovoLipogenesis'), name="DNL Rate", line=dict(color="red"))),
+        (3, go.Scatter(x=t, y=_get_series(df, 'rate_fattyAcidSynthesis'), name="FA Synth Rate", line=dict(color="purple"))),
+        (3, go.Scatter(x=t, y=_get_series(df, 'rate_lipidTransport'), name="Transport Rate", line=dict(color="blue"))),
+        (3, go.Scatter(x=t, y=_get_series(df, 'rate_betaOxidation'), name="Beta-Ox Rate", line=dict(color="green"))),
+    ]
+
+    # 5. Frames, player and slider
+    animate_dashboard(fig, time_steps, node_trace, lines, mode, max_frames)
     
     # Secondary Y-axis for Glycogen
     fig.update_layout(
@@ -154,7 +119,6 @@ def generate_nafld_dashboard(history_list, filename="nafld_simulation.html"):
     ], axis=1).values.max()
     fig.update_yaxes(title="Rate", range=[0, float(rate_max)*1.2 if np.isfinite(rate_max) else 1.0], row=1, col=3)
 
-    fig.frames = frames
     outdir = os.path.dirname(filename) or "."
     os.makedirs(outdir, exist_ok=True)
     fig.write_html(filename)
@@ -3,6 +3,7 @@ import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from history import as_frame
 from simulate import MetabolicEnvironment, LiverMetabolismSystem
 
 def _get_series(df, col):
@@ -11,8 +12,83 @@ def _get_series(df, col):
     return pd.Series(0.0, index=df.index)
 
 
-def generate_interactive_dashboard(history_list, filename="metabolic_dynamics.html"):
-    df = pd.DataFrame(history_list)
+def _frame_indices(n, max_frames=None):
+    # 均匀抽取至多 max_frames 帧（总包含首尾两步）；None 为每步一帧
+    if max_frames is None or n <= max_frames:
+        return np.arange(n)
+    return np.unique(np.linspace(0, n - 1, max(int(max_frames), 2)).round().astype(int))
+
+
+def _axis_ref(col):
+    return "x" if col == 1 else f"x{col}"
+
+
+def animate_dashboard(fig, time_steps, node_trace, lines, mode="cursor", max_frames=300, duration=50):
+    """
+    为 1 行多列的仪表盘添加左图与曲线，并生成动画帧、播放按钮和时间滑块。
+
+    node_trace(i): 第 i 步的左图（拓扑散点），放在第 1 列；lines: [(列, go.Scatter)]，曲线为完整序列。
+    mode="cursor": 曲线只写入一次，每帧只更新左图和各曲线子图中的时间游标，HTML 大小与构建时间随步数线性增长；
+    mode="grow": 旧的显示方式，每帧携带截至该步的全部曲线（随步数平方增长）。
+    max_frames 限制动画帧数（均匀抽取），None 为每步一帧。
+    """
+    if mode not in ("cursor", "grow"):
+        raise ValueError(f"Unknown dashboard mode {mode!r} (expected 'cursor' or 'grow')")
+    time_steps = np.asarray(time_steps)
+    steps = _frame_indices(len(time_steps), max_frames)
+    cols = sorted({col for col, _ in lines})
+
+    def cursor(t):
+        return [dict(type="line", xref=_axis_ref(col), yref="paper", x0=t, x1=t, y0=0, y1=1,
+                     line=dict(color="white", width=1, dash="dot")) for col in cols]
+
+    def grown(i):
+        return [go.Scatter(trace).update(x=trace.x[:i + 1], y=trace.y[:i + 1]) for _, trace in lines]
+
+    frames = []
+    for i in steps:
+        current_t = time_steps[i]
+        if mode == "cursor":
+            frames.append(go.Frame(data=[node_trace(i)], name=str(current_t), traces=[0],
+                                   layout=dict(shapes=cursor(current_t))))
+        else:
+            frames.append(go.Frame(data=[node_trace(i)] + grown(i), name=str(current_t),
+                                   traces=list(range(len(lines) + 1))))
+
+    fig.add_trace(frames[0].data[0], row=1, col=1)
+    for j, (col, trace) in enumerate(lines):
+        fig.add_trace(trace if mode == "cursor" else frames[0].data[j + 1], row=1, col=col)
+    if mode == "cursor":
+        fig.update_layout(shapes=cursor(time_steps[steps[0]]))
+
+    fig.update_layout(
+        template="plotly_dark",
+        updatemenus=[{
+            "type": "buttons",
+            "buttons": [{
+                "label": "Play",
+                "method": "animate",
+                "args": [None, {"frame": {"duration": duration, "redraw": True}, "fromcurrent": True}]
+            }, {
+                "label": "Pause",
+                "method": "animate",
+                "args": [[None], {"frame": {"duration": 0, "redraw": True}, "mode": "immediate"}]
+            }]
+        }],
+        sliders=[{
+            "steps": [{"args": [[f.name], {"frame": {"duration": 0, "redraw": True}, "mode": "immediate"}],
+                       "label": f.name, "method": "animate"} for f in frames],
+            "currentvalue": {"prefix": "Time: "}
+        }]
+    )
+    fig.frames = frames
+    return fig
+
+
+def generate_interactive_dashboard(history_list, filename="metabolic_dynamics.html", mode="cursor", max_frames=300):
+    # history_list: dict 记录序列、DataFrame 或结果文件路径（.mmap 零拷贝打开）
+    # mode / max_frames 见 animate_dashboard；mode="grow", max_frames=None 为原先每步一帧的动画
+    df = as_frame(history_list)
     time_steps = df['time'].values
     
     # 1. 定义模块在画布上的坐标 (自定义拓扑结构)
@@ -39,91 +115,50 @@ def generate_interactive_dashboard(history_list, filename="metabolic_dynamics.ht
         subplot_titles=("反应模块激活状态 (颜色深浅=速率)", "代谢物浓度实时曲线", "乙醇代谢反应速率")
     )
 
-    # 3. 创建动画帧
-    frames = []
-    for t_idx in range(len(time_steps)):
-        current_t = time_steps[t_idx]
-        curr_df = df.iloc[t_idx]
-        
-        # --- 左图：模块散点 (拓扑模拟) ---
-        node_x = [v[0] for v in nodes.values()]
-        node_y = [v[1] for v in nodes.values()]
-        node_text = [v[2] for v in nodes.values()]
-        
-        # 计算颜色强度 (根据当前帧速率)
-        # 归一化处理，假设速率 5.0 为极值
-        colors = [
-            float(curr_df.get('act_ethanol', 0.0)) * 50,
-            float(curr_df.get('rate_acetaldehyde_ALDH', 0.0)) * 60,
-            float(curr_df.get('rate_acetate_to_acetylcoa', 0.0)) * 80,
-            float(curr_df.get('rate_hexokinase_or_glucokinase', 0.0)) * 40,
-            float(curr_df.get('act_energy', 0.0)) * 20,
-            float(curr_df.get('act_lipid', 0.0)) * 30,
-            float(curr_df.get('rate_cps1_Ammonia_to_CarbamoylPhosphate', 0.0)) * 100
-        ]
-        
-        # --- 右图：曲线同步 (显示到当前时间点的所有数据) ---
-        history_so_far = df.iloc[:t_idx+1]
-        
-        frame = go.Frame(
-            data=[
-                # 帧中的散点图 (左)
-                go.Scatter(
-                    x=node_x, y=node_y, mode="markers+text",
-                    text=node_text, textposition="top center",
-                    marker=dict(size=[30+c for c in colors], color=colors,
-                                colorscale="Reds", showscale=False, cmin=0, cmax=220,
-                                line=dict(width=2, color='DarkSlateGrey'))
-                ),
-                # 帧中的折线图 (右 - 血糖)
-                # go.Scatter(x=history_so_far['time'], y=history_so_far['glucose'], name="Glucose", line=dict(color="royalblue")),
-                # 帧中的折线图 (右 - 酒精)
-                go.Scatter(x=history_so_far['time'], y=history_so_far['ethanol'], name="Ethanol", line=dict(color="orange")),
-                # 帧中的折线图 (右 - 乙醛)
-                go.Scatter(x=history_so_far['time'], y=history_so_far['acetaldehyde'], name="Acetaldehyde", line=dict(color="red")),
-                # 帧中的折线图 (右 - 乙酸/乙酰辅酶A/NADH/NAD+)
-                go.Scatter(x=history_so_far['time'], y=_get_series(history_so_far, 'acetate'), name="Acetate", line=dict(color="brown")),
-                go.Scatter(x=history_so_far['time'], y=_get_series(history_so_far, 'acetyl_coa'), name="Acetyl-CoA", line=dict(color="green")),
-                go.Scatter(x=history_so_far['time'], y=_get_series(history_so_far, 'nadh'), name="NADH", line=dict(color="purple")),
-                go.Scatter(x=history_so_far['time'], y=_get_series(history_so_far, 'nad_plus'), name="NAD+", line=dict(color="pink")),
-                # 速率曲线 (第三列)
-                go.Scatter(x=history_so_far['time'], y=_get_series(history_so_far, 'rate_ethanol_ADH'), name="rate_ADH", line=dict(color="orange")),
-                go.Scatter(x=history_so_far['time'], y=_get_series(history_so_far, 'rate_acetaldehyde_ALDH'), name="rate_ALDH", line=dict(color="red")),
-                go.Scatter(x=history_so_far['time'], y=_get_series(history_so_far, 'rate_acetate_to_acetylcoa'), name="rate_Acetate→Acetyl-CoA", line=dict(color="brown")),
-            ],
-            name=str(current_t),
-            traces=list(range(0, 11))  # 对应初始 data 的索引
+    # 3. 左图：模块散点 (拓扑模拟)，颜色强度按各步速率（整列预先计算）
+    node_x = [v[0] for v in nodes.values()]
+    node_y = [v[1] for v in nodes.values()]
+    node_text = [v[2] for v in nodes.values()]
+    # 归一化处理，假设速率 5.0 为极值
+    intensity = np.column_stack([
+        _get_series(df, 'act_ethanol').to_numpy(dtype=float) * 50,
+        _get_series(df, 'rate_acetaldehyde_ALDH').to_numpy(dtype=float) * 60,
+        _get_series(df, 'rate_acetate_to_acetylcoa').to_numpy(dtype=float) * 80,
+        _get_series(df, 'rate_hexokinase_or_glucokinase').to_numpy(dtype=float) * 40,
+        _get_series(df, 'act_energy').to_numpy(dtype=float) * 20,
+        _get_series(df, 'act_lipid').to_numpy(dtype=float) * 30,
+        _get_series(df, 'rate_cps1_Ammonia_to_CarbamoylPhosphate').to_numpy(dtype=float) * 100,
+    ])
+
+    def node_trace(i):
+        colors = intensity[i].tolist()
+        return go.Scatter(
+            x=node_x, y=node_y, mode="markers+text",
+            text=node_text, textposition="top center",
+            marker=dict(size=[30+c for c in colors], color=colors,
+                        colorscale="Reds", showscale=False, cmin=0, cmax=220,
+                        line=dict(width=2, color='DarkSlateGrey'))
         )
-        frames.append(frame)
 
-    # 4. 添加初始状态 (第0帧)
-    fig.add_trace(frames[0].data[0], row=1, col=1)
-    for i in range(1, 7):
-        fig.add_trace(frames[0].data[i], row=1, col=2)
-    for i in range(7, 10):
-        fig.add_trace(frames[0].data[i], row=1, col=3)
+    # 4. 右图：曲线 (列, 完整序列)
+    t = df['time']
+    lines = [
+        # (2, go.Scatter(x=t, y=df['glucose'], name="Glucose", line=dict(color="royalblue"))),
+        (2, go.Scatter(x=t, y=df['ethanol'], name="Ethanol", line=dict(color="orange"))),
+        (2, go.Scatter(x=t, y=df['acetaldehyde'], name="Acetaldehyde", line=dict(color="red"))),
+        # 乙酸/乙酰辅酶A/NADH/NAD+
+        (2, go.Scatter(x=t, y=_get_series(df, 'acetate'), name="Acetate", line=dict(color="brown"))),
+        (2, go.Scatter(x=t, y=_get_series(df, 'acetyl_coa'), name="Acetyl-CoA", line=dict(color="green"))),
+        (2, go.Scatter(x=t, y=_get_series(df, 'nadh'), name="NADH", line=dict(color="purple"))),
+        (2, go.Scatter(x=t, y=_get_series(df, 'nad_plus'), name="NAD+", line=dict(color="pink"))),
+        # 速率曲线 (第三列)
+        (3, go.Scatter(x=t, y=_get_series(df, 'rate_ethanol_ADH'), name="rate_ADH", line=dict(color="orange"))),
+        (3, go.Scatter(x=t, y=_get_series(df, 'rate_acetaldehyde_ALDH'), name="rate_ALDH", line=dict(color="red"))),
+        (3, go.Scatter(x=t, y=_get_series(df, 'rate_acetate_to_acetylcoa'), name="rate_Acetate→Acetyl-CoA", line=dict(color="brown"))),
+    ]
 
-    # 5. 配置播放器 (Slider & Buttons)
-    fig.update_layout(
-        template="plotly_dark",
-        updatemenus=[{
-            "type": "buttons",
-            "buttons": [{
-                "label": "Play",
-                "method": "animate",
-                "args": [None, {"frame": {"duration": 50, "redraw": True}, "fromcurrent": True}]
-            }, {
-                "label": "Pause",
-                "method": "animate",
-                "args": [[None], {"frame": {"duration": 0, "redraw": True}, "mode": "immediate"}]
-            }]
-        }],
-        sliders=[{
-            "steps": [{"args": [[f.name], {"frame": {"duration": 0, "redraw": True}, "mode": "immediate"}],
-                       "label": f.name, "method": "animate"} for f in frames],
-            "currentvalue": {"prefix": "Time: "}
-        }]
-    )
+    # 5. 动画帧与播放器 (Slider & Buttons)
+    animate_dashboard(fig, time_steps, node_trace, lines, mode, max_frames)
 
     # 设置坐标轴范围固定，防止动画闪烁
     fig.update_xaxes(range=[0.5, 4.5], row=1, col=1, showgrid=False, zeroline=False, visible=False)
@@ -135,7 +170,6 @@ def generate_interactive_dashboard(history_list, filename="metabolic_dynamics.ht
     rate_max = pd.concat([_get_series(df, 'rate_ethanol_ADH'), _get_series(df, 'rate_acetaldehyde_ALDH'), _get_series(df, 'rate_acetate_to_acetylcoa')], axis=1).values.max()
     fig.update_yaxes(title="Rate", range=[0, float(rate_max) * 1.1 if np.isfinite(rate_max) else 1.0], row=1, col=3)
 
-    fig.frames = frames
     outdir = os.path.dirname(filename) or "."
     os.makedirs(outdir, exist_ok=True)
     fig.write_html(filename)
@@ -1,12 +1,13 @@
 import numpy as np
 import matplotlib.pyplot as plt
 from tools.reaction import *
+from tools.stoichiometry import CompiledNetwork
 
 class MetabolicSimulation:
     """
     Simulate a simplified metabolic network from modular reaction files and a metabolite pool definition.
     """
-    def __init__(self, reaction_folder: str, pool_file: str, auto_adjust=False):
+    def __init__(self, reaction_folder: str, pool_file: str, auto_adjust=False, compiled=False):
         """
         Initialize the simulation.
 
@@ -14,12 +15,16 @@ class MetabolicSimulation:
             reaction_folder (str): Folder containing reaction JSON files.
             pool_file (str): JSON file containing initial metabolite pool.
             auto_adjust (bool): Whether to automatically adjust reaction rates toward steady state.
+            compiled (bool): Whether to step the network as NumPy arrays (stoichiometry matrix)
+                instead of walking reactions in Python. Trajectories are identical.
         """
         self.reactions = load_reactions_from_folder(reaction_folder)
         self.pool = load_pool_from_yaml(pool_file)
         self.auto_adjust = auto_adjust
+        self.compiled = compiled
 
         self._ensure_pool_consistency()
+        self.network = CompiledNetwork(self.reactions, self.pool.keys()) if compiled else None
 
         # 历史记录：代谢物浓度随时间变化
         self.history = {k: [v] for k, v in self.pool.items()}
@@ -32,6 +37,10 @@ class MetabolicSimulation:
         Execute one simulation step.
         If auto_adjust=True, reaction capacities are gradually tuned to minimize concentration drift.
         """
+        if self.compiled:
+            self._simulate_step_compiled(dt)
+            return
+
         delta = {k: 0 for k in self.pool}
 
         for r in self.reactions:
@@ -73,6 +82,57 @@ class MetabolicSimulation:
         if self.auto_adjust:
             self._adjust_reaction_rates()
 
+    def _simulate_step_compiled(self, dt):
+        """Single compiled step on the pool dict; see run() for the array-only fast path."""
+        net = self.network
+        x = net.state_from_pool(self.pool)
+        capacity = np.array([r.capacity for r in self.reactions], dtype=float)
+        x, rate = self._advance(x, capacity, dt)
+        for k, v in zip(net.metabolites, x.tolist()):
+            self.pool[k] = v
+        for r, v in zip(self.reactions, rate.tolist()):
+            self.rate_history[r.name].append(v)
+        if self.auto_adjust:
+            self._adjust_reaction_rates()
+
+    def _advance(self, x, capacity, dt):
+        rate = self.network.rates(x, capacity)
+        delta = self.network.delta(rate, dt)
+        # 与逐反应循环一致：增量先后作用两次（每次截断到非负）
+        x = np.maximum(x + delta, 0.0)
+        x = np.maximum(x + delta, 0.0)
+        return x, rate
+
+    def _run_compiled(self, steps, dt):
+        net = self.network
+        x = net.state_from_pool(self.pool)
+        capacity = np.array([r.capacity for r in self.reactions], dtype=float)
+        prior = min(len(next(iter(self.rate_history.values()), [])), 4)
+        states = np.empty((steps, len(net.metabolites)))
+        rates = np.empty((prior + steps, len(self.reactions)))
+        for j, r in enumerate(self.reactions):
+            if prior:
+                rates[:prior, j] = self.rate_history[r.name][-prior:]
+
+        for t in range(steps):
+            x, rates[prior + t] = self._advance(x, capacity, dt)
+            states[t] = x
+            if self.auto_adjust:
+                recent = rates[max(prior + t - 4, 0):prior + t + 1]
+                if len(recent) >= 2:
+                    trend = np.mean(np.diff(recent, axis=0), axis=0)
+                    capacity = np.where(trend > 0.01, capacity * 0.98, np.where(trend < -0.01, capacity * 1.02, capacity))
+                capacity = np.maximum(capacity, 1e-3)
+
+        for k, column in zip(net.metabolites, states.T.tolist()):
+            self.history[k].extend(column)
+            self.pool[k] = column[-1] if column else self.pool[k]
+        for r, column, cap in zip(self.reactions, rates[prior:].T.tolist(), capacity.tolist()):
+            self.rate_history[r.name].extend(column)
+            if self.auto_adjust:
+                r.capacity = cap
+        self.time.extend(range(1, steps + 1))
+
     def _ensure_pool_consistency(self):
         """
         Ensure all metabolites that appear in reactions exist in the pool.
@@ -105,15 +165,21 @@ class MetabolicSimulation:
 
     def run(self, steps=200, dt=1.0):
         """Run the full simulation."""
+        if self.compiled:
+            self._run_compiled(steps, dt)
+            return
         for t in range(steps):
             self.simulate_step(dt)
             for k in self.pool:
                 self.history[k].append(self.pool[k])
             self.time.append(t + 1)
 
-    def plot_rates(self, save_fig_path=None, keys=None):
+    def plot_rates(self, save_fig_path=None, keys=None, show=True):
         # 反应速率可视化
-        """Plot the rate evolution of each reaction."""
+        """Plot the rate evolution of each reaction.
+
+        Headless runs pass ``show=False`` to only write ``save_fig_path``.
+        """
         if keys is None:
             keys = list(self.rate_history.keys())
 
@@ -127,10 +193,12 @@ class MetabolicSimulation:
         plt.tight_layout()
         if save_fig_path:
             plt.savefig(save_fig_path)
-        plt.show()
+        if show:
+            plt.show()
+        plt.close()
 
-    def plot(self, save_fig_path=None, keys=None):
-        """Plot concentration changes over time."""
+    def plot(self, save_fig_path=None, keys=None, show=True):
+        """Plot concentration changes over time (``show=False`` only writes ``save_fig_path``)."""
         if keys is None:
             keys = list(self.pool.keys())
 
@@ -143,7 +211,9 @@ class MetabolicSimulation:
         plt.title("Metabolic Simulation" + (" (auto-adjusted)" if self.auto_adjust else ""))
         if save_fig_path:
             plt.savefig(save_fig_path)
-        plt.show()
+        if show:
+            plt.show()
+        plt.close()
 
 
 if __name__ == "__main__":